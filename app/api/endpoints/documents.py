@@ -1,16 +1,29 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+import logging
+import os
+import tempfile
+from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile, File, Form
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.db.base import get_db
-from app.db.models import Document
-from app.schemas import DocumentCreate, DocumentUpdate, Document as DocumentSchema
+from app.db.models import Document, DocumentExtraction
+from app.db.models.document import hash_content
+from app.schemas import DocumentCreate, DocumentUpdate, Document as DocumentSchema, StoredExtraction, ReconcileReport
 from app.utils.security import get_api_key
-from app.services.vector_store import vector_store_service
+from app.services.vector_store import VectorStoreService, get_vector_store_service, document_metadata
+from app.services.ingest_pipeline import ingest_pipeline
+from app.services.document_text import UnsupportedDocumentError, detect_kind, iter_document_pages, page_separator
+from app.services.reconciler import ReconcileInProgressError, reconcile
+
+logger = logging.getLogger(__name__)
 
 # Create router
 router = APIRouter()
 
+# Bytes copied from the request body per read
+UPLOAD_READ_BYTES = 1024 * 1024
+
 @router.get("/", response_model=List[DocumentSchema])
 def get_documents(
     db: Session = Depends(get_db)
@@ -20,16 +33,36 @@ def get_documents(
     """
     return db.query(Document).all()
 
+def _find_duplicate(db: Session, content: str, exclude_id: Optional[int] = None) -> Optional[Document]:
+    """An existing document with the same content, if DEDUPLICATE_DOCUMENTS is on."""
+    if not settings.DEDUPLICATE_DOCUMENTS:
+        return None
+    query = db.query(Document).filter(Document.content_hash == hash_content(content))
+    if exclude_id is not None:
+        query = query.filter(Document.id != exclude_id)
+    return query.order_by(Document.id).first()
+
 @router.post("/", response_model=DocumentSchema, status_code=201)
 def create_document(
     document: DocumentCreate,
+    response: Response,
     db: Session = Depends(get_db),
-    api_key: str = Depends(get_api_key)
+    api_key: str = Depends(get_api_key),
+    vector_store: VectorStoreService = Depends(get_vector_store_service)
 ):
     """
     Create a new document.
     Requires API key.
+
+    If a document with the same content already exists, it is returned
+    with status 200 instead and nothing is stored or embedded again.
     """
+    duplicate = _find_duplicate(db, document.content)
+    if duplicate is not None:
+        logger.info("Document content matches existing document %s; not stored again", duplicate.id)
+        response.status_code = 200
+        return duplicate
+    
     # Create document in database
     db_document = Document(
         title=document.title,
@@ -41,13 +74,17 @@ def create_document(
     
     try:
         # Process document for vector store
-        vector_store_service.process_document(
+        vector_store.process_document(
             document_id=str(db_document.id),
             content=db_document.content,
-            metadata={"title": db_document.title}
+            metadata=document_metadata(db_document)
         )
     except Exception as e:
-        # If vector store processing fails, delete the document from database
+        # If vector store processing fails, delete any chunks stored and the document from database
+        try:
+            vector_store.delete_document(str(db_document.id))
+        except Exception:
+            logger.exception("Failed to remove chunks of failed document %s", db_document.id)
         db.delete(db_document)
         db.commit()
         raise HTTPException(
@@ -55,8 +92,149 @@ def create_document(
             detail=f"Failed to process document for vector store: {str(e)}"
         )
     
+    # Precompute extraction in the background if enabled
+    if ingest_pipeline.is_enabled(document.extract_on_ingest):
+        ingest_pipeline.enqueue(db, db_document.id)
+    
     return db_document
 
+def _spool_upload(file: UploadFile) -> str:
+    """Copy an upload to a temporary file in UPLOAD_DIR, enforcing UPLOAD_MAX_BYTES."""
+    suffix = os.path.splitext(file.filename or "")[1]
+    spool = tempfile.NamedTemporaryFile(dir=settings.UPLOAD_DIR, suffix=suffix, delete=False)
+    try:
+        with spool:
+            size = 0
+            while True:
+                block = file.file.read(UPLOAD_READ_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > settings.UPLOAD_MAX_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the {settings.UPLOAD_MAX_BYTES} byte upload limit"
+                    )
+                spool.write(block)
+    except BaseException:
+        os.unlink(spool.name)
+        raise
+    return spool.name
+
+@router.post("/upload", response_model=DocumentSchema, status_code=201)
+def upload_document(
+    response: Response,
+    file: UploadFile = File(...),
+    title: Optional[str] = Form(None),
+    extract_on_ingest: Optional[bool] = Form(None),
+    db: Session = Depends(get_db),
+    api_key: str = Depends(get_api_key),
+    vector_store: VectorStoreService = Depends(get_vector_store_service)
+):
+    """
+    Create a document from an uploaded PDF, DOCX or plain text file.
+    Requires API key.
+
+    The file is streamed to disk and its text is extracted in worker
+    processes. The text is hashed before anything is stored or embedded: if
+    it matches an existing document, that document is returned with status
+    200 instead.
+    """
+    try:
+        kind = detect_kind(file.filename, file.content_type)
+    except UnsupportedDocumentError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    
+    path = _spool_upload(file)
+    try:
+        # The document's whole text is stored, so it is held anyway; extracting it first
+        # lets a duplicate be turned away without any embedding calls
+        page_numbers, texts = [], []
+        for page_number, text in iter_document_pages(path, kind):
+            page_numbers.append(page_number)
+            texts.append(text)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to extract text from uploaded document: {str(e)}"
+        )
+    finally:
+        os.unlink(path)
+    
+    separator = page_separator(kind)
+    content = separator.join(texts)
+    # Pages are sliced back out of content as they are embedded, so only one copy of the text is held
+    page_lengths = [len(text) for text in texts]
+    del texts
+    
+    def pages():
+        offset = 0
+        for page_number, length in zip(page_numbers, page_lengths):
+            yield page_number, content[offset:offset + length]
+            offset += length + len(separator)
+    
+    duplicate = _find_duplicate(db, content)
+    if duplicate is not None:
+        logger.info("Uploaded file matches existing document %s; not stored again", duplicate.id)
+        response.status_code = 200
+        return duplicate
+    
+    db_document = Document(
+        title=title or os.path.splitext(file.filename or "")[0] or "Untitled",
+        content=content
+    )
+    db.add(db_document)
+    db.commit()
+    # Without content, which would load a second copy; it is read back when the response is built
+    db.refresh(db_document, attribute_names=["id", "title", "content_hash", "updated_at"])
+    
+    try:
+        chunk_count = vector_store.process_document_pages(
+            document_id=str(db_document.id),
+            pages=pages(),
+            metadata=document_metadata(db_document),
+            page_separator=separator
+        )
+    except Exception as e:
+        # Remove whatever was stored before the failure
+        try:
+            vector_store.delete_document(str(db_document.id))
+        except Exception:
+            logger.exception("Failed to remove chunks of failed upload %s", db_document.id)
+        db.delete(db_document)
+        db.commit()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to process uploaded document: {str(e)}"
+        )
+    
+    logger.info("Uploaded %s document %s: %d chunks", kind, db_document.id, chunk_count)
+    
+    # Precompute extraction in the background if enabled
+    if ingest_pipeline.is_enabled(extract_on_ingest):
+        ingest_pipeline.enqueue(db, db_document.id)
+    
+    return db_document
+
+@router.post("/reconcile", response_model=ReconcileReport)
+def reconcile_documents(
+    dry_run: bool = True,
+    max_reindex: Optional[int] = None,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(get_api_key),
+    vector_store: VectorStoreService = Depends(get_vector_store_service)
+):
+    """
+    Find documents missing from or stale in the vector index and orphan chunks.
+    Requires API key.
+
+    Only reports by default; pass dry_run=false to re-index and delete.
+    """
+    try:
+        return reconcile(db, vector_store, dry_run=dry_run, max_reindex=max_reindex)
+    except ReconcileInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 @router.get("/{document_id}", response_model=DocumentSchema)
 def get_document(
     document_id: int,
@@ -70,12 +248,43 @@ def get_document(
         raise HTTPException(status_code=404, detail="Document not found")
     return document
 
+@router.get("/{document_id}/extraction", response_model=StoredExtraction)
+def get_document_extraction(
+    document_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Get the precomputed extraction and FHIR resources for a document.
+    """
+    extraction = db.query(DocumentExtraction).filter(DocumentExtraction.document_id == document_id).first()
+    if extraction is None:
+        raise HTTPException(status_code=404, detail="No extraction found for document")
+    return extraction
+
+@router.post("/{document_id}/extraction", response_model=StoredExtraction, status_code=202)
+def enqueue_document_extraction(
+    document_id: int,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Queue a document for background extraction and FHIR conversion.
+    Requires API key.
+    """
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    ingest_pipeline.enqueue(db, document_id)
+    return db.query(DocumentExtraction).filter(DocumentExtraction.document_id == document_id).first()
+
 @router.put("/{document_id}", response_model=DocumentSchema)
 def update_document(
     document_id: int,
     document_update: DocumentUpdate,
     db: Session = Depends(get_db),
-    api_key: str = Depends(get_api_key)
+    api_key: str = Depends(get_api_key),
+    vector_store: VectorStoreService = Depends(get_vector_store_service)
 ):
     """
     Update a document.
@@ -85,48 +294,43 @@ def update_document(
     if db_document is None:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Store old content for rollback
-    old_title = db_document.title
-    old_content = db_document.content
-    
     # Update document fields if provided
     if document_update.title is not None:
         db_document.title = document_update.title
     if document_update.content is not None:
         db_document.content = document_update.content
     
+    # Commit first, so chunks stored by reference are hydrated from the new content
+    db.commit()
+    db.refresh(db_document)
+    
     try:
-        # Delete old embeddings
-        vector_store_service.delete_document(str(document_id))
-        
-        # Process updated document for vector store
-        vector_store_service.process_document(
+        # Overwrite the embeddings in place; chunks beyond the new count are deleted afterwards
+        vector_store.reindex_document(
             document_id=str(document_id),
             content=db_document.content,
-            metadata={"title": db_document.title}
+            metadata=document_metadata(db_document)
         )
-        
-        # Commit database changes
-        db.commit()
-        db.refresh(db_document)
-        
     except Exception as e:
-        # Rollback changes if vector store processing fails
-        db_document.title = old_title
-        db_document.content = old_content
-        db.commit()
+        # The chunks now carry a hash other than the document's, so the reconciler re-indexes it
+        logger.exception("Failed to re-index updated document %s; the reconciler will re-index it", document_id)
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to process updated document for vector store: {str(e)}"
+            detail=f"Document updated but failed to process it for vector store: {str(e)}"
         )
     
+    # Recompute extraction for the new content if enabled
+    if document_update.content is not None and ingest_pipeline.is_enabled(document_update.extract_on_ingest):
+        ingest_pipeline.enqueue(db, db_document.id)
+    
     return db_document
 
 @router.delete("/{document_id}", status_code=204)
 def delete_document(
     document_id: int,
     db: Session = Depends(get_db),
-    api_key: str = Depends(get_api_key)
+    api_key: str = Depends(get_api_key),
+    vector_store: VectorStoreService = Depends(get_vector_store_service)
 ):
     """
     Delete a document.
@@ -138,9 +342,10 @@ def delete_document(
     
     try:
         # Delete document embeddings from vector store
-        vector_store_service.delete_document(str(document_id))
+        vector_store.delete_document(str(document_id))
         
-        # Delete document from database
+        # Delete document and any precomputed extraction from database
+        ingest_pipeline.remove(db, document_id)
         db.delete(db_document)
         db.commit()
     except Exception as e:
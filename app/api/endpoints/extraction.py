@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from app.schemas.extraction import ExtractionRequest, ExtractionResponse
-from app.services.extraction_service import extraction_service
+from app.services.extraction_service import ExtractionService, get_extraction_service
+from app.services.llm.base_service import LLMServiceUnavailableError
+from app.utils.errors import retry_after_headers
 
 router = APIRouter()
 
@@ -11,9 +13,13 @@ router = APIRouter()
     summary="Extract medical entities and codes",
     description="Extract medical entities and codes from text using AI."
 )
-async def extract_medical_entities(request: ExtractionRequest) -> ExtractionResponse:
+def extract_medical_entities(
+    request: ExtractionRequest,
+    extraction_service: ExtractionService = Depends(get_extraction_service)
+) -> ExtractionResponse:
     """
-    Extract medical entities and codes from text.
+    Extract medical entities and codes from text. Runs in the threadpool
+    so concurrent requests overlap and identical ones can be coalesced.
     
     Args:
         request: ExtractionRequest containing the text to analyze
@@ -25,7 +31,13 @@ async def extract_medical_entities(request: ExtractionRequest) -> ExtractionResp
         HTTPException: If extraction fails
     """
     try:
-        return extraction_service.extract_entities(text=request.text)
+        return extraction_service.extract_entities(text=request.text, mode=request.mode)
+    except LLMServiceUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"LLM service unavailable: {str(e)}",
+            headers=retry_after_headers(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from app.schemas.fhir import ToFHIRRequest, ToFHIRResponse
-from app.services.fhir_service import fhir_service
+from app.services.fhir_service import FHIRService, get_fhir_service
+from app.services.llm.base_service import LLMServiceUnavailableError
+from app.utils.errors import retry_after_headers
 
 router = APIRouter()
 
@@ -11,10 +13,16 @@ router = APIRouter()
     summary="Convert structured data to FHIR resources",
     description="Convert extracted medical data into FHIR-compliant resources using AI."
 )
-async def convert_to_fhir(request: ToFHIRRequest) -> ToFHIRResponse:
+def convert_to_fhir(
+    request: ToFHIRRequest,
+    fhir_service: FHIRService = Depends(get_fhir_service)
+) -> ToFHIRResponse:
     """
     Convert structured medical data to FHIR resources.
     
+    A sync endpoint, run in the threadpool: the LLM scheduler blocks while
+    waiting for rate-limit capacity or backing off.
+    
     Args:
         request: ToFHIRRequest containing the structured medical data
         
@@ -30,6 +38,12 @@ async def convert_to_fhir(request: ToFHIRRequest) -> ToFHIRResponse:
             resources=resources,
             resource_types=resource_types
         )
+    except LLMServiceUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"LLM service unavailable: {str(e)}",
+            headers=retry_after_headers(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
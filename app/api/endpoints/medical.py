@@ -1,10 +1,31 @@
 from fastapi import APIRouter, HTTPException, status
 from app.schemas.medical import MedicalNoteRequest, MedicalNoteSummaryResponse
 from app.services.llm.azure_openai_service import AzureOpenAIService
-from app.services.llm.base_service import LLMServiceError
+from app.services.llm.base_service import LLMServiceError, LLMServiceUnavailableError
+from app.services.llm.scheduler import RequestPriority
+from app.services.llm.model_router import LLMTask
+from app.services.prompts import PromptTemplate, register_prompt
+from app.utils.errors import retry_after_headers
 
 router = APIRouter()
 
+SUMMARY_PROMPT = register_prompt(PromptTemplate(
+    name="note_summary",
+    version="2",
+    system="You are a medical professional assistant.",
+    instructions="""Please summarize the medical note below,
+extracting key patient information including:
+- Demographics
+- Medical history
+- Current symptoms
+- Diagnosis
+- Treatment plan
+
+Format your response as a concise professional summary.""",
+    body="""Medical Note:
+{note_text}"""
+))
+
 @router.post(
     "/summarize_note", 
     response_model=MedicalNoteSummaryResponse,
@@ -12,10 +33,13 @@ router = APIRouter()
     summary="Summarize a medical note",
     description="Endpoint to summarize a medical note using Azure OpenAI."
 )
-async def summarize_medical_note(request: MedicalNoteRequest):
+def summarize_medical_note(request: MedicalNoteRequest):
     """
     Summarize a medical note using Azure OpenAI.
     
+    A sync endpoint, run in the threadpool: the LLM scheduler blocks while
+    waiting for rate-limit capacity or backing off.
+    
     Args:
         request: The request containing the medical note text
         
@@ -23,28 +47,19 @@ async def summarize_medical_note(request: MedicalNoteRequest):
         MedicalNoteSummaryResponse: The summarized medical note or error
     """
     # Create prompt for medical note summarization
-    prompt = f"""
-    You are a medical professional assistant. Please summarize the following medical note,
-    extracting key patient information including:
-    - Demographics
-    - Medical history
-    - Current symptoms
-    - Diagnosis
-    - Treatment plan
-    
-    Medical Note:
-    {request.note_text}
-    
-    Format your response as a concise professional summary.
-    """
+    system_prompt, prompt = SUMMARY_PROMPT.render(note_text=request.note_text)
     
     try:
         # Call Azure OpenAI to summarize the note
         llm_service = AzureOpenAIService()
         result = llm_service.generate_text(
             prompt=prompt,
+            system_prompt=system_prompt,
             temperature=0.3,  # Lower temperature for more focused response
-            max_tokens=500    # Limit the response length
+            max_tokens=500,   # Limit the response length
+            priority=RequestPriority.INTERACTIVE,
+            task=LLMTask.NOTE_SUMMARY,
+            prompt_id=SUMMARY_PROMPT.id
         )
         
         # Return the response
@@ -54,6 +69,13 @@ async def summarize_medical_note(request: MedicalNoteRequest):
             error=None
         )
         
+    except LLMServiceUnavailableError as e:
+        # Upstream is overloaded; ask the client to retry later
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"LLM service unavailable: {str(e)}",
+            headers=retry_after_headers(e)
+        )
     except LLMServiceError as e:
         # Handle service errors
         raise HTTPException(
@@ -1,32 +1,85 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from app.services.llm_service import llm_service
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from app.core.config import settings
+from app.services.llm_service import LLMService, get_llm_service
+from app.services.llm.base_service import LLMServiceUnavailableError
+from app.utils.errors import retry_after_headers
 
 router = APIRouter()
 
 class QuestionRequest(BaseModel):
     question: str
+    # Only retrieve context from this SOAP section of the notes
+    section: Optional[Literal["subjective", "objective", "assessment", "plan"]] = None
 
 class QuestionResponse(BaseModel):
     answer: str
     context: dict
 
+class BatchQuestionRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=settings.QA_BATCH_MAX_QUESTIONS)
+    # Only retrieve context from this SOAP section of the notes
+    section: Optional[Literal["subjective", "objective", "assessment", "plan"]] = None
+    # "parallel": one prompt per question, run concurrently; "combined": one structured completion for all
+    mode: Literal["parallel", "combined"] = "parallel"
+
+class BatchAnswerItem(QuestionResponse):
+    question: str
+
+class BatchQuestionResponse(BaseModel):
+    answers: List[BatchAnswerItem]
+
 @router.post("/answer_question", response_model=QuestionResponse)
-async def answer_question(request: QuestionRequest):
+def answer_question(request: QuestionRequest, llm_service: LLMService = Depends(get_llm_service)):
     """
     Answer a question using RAG (Retrieval Augmented Generation).
     
     The endpoint retrieves relevant document chunks and uses them as context
-    to generate an answer using the configured LLM.
+    to generate an answer using the configured LLM. Runs in the threadpool
+    so concurrent requests overlap and identical ones can be coalesced.
     """
     try:
-        result = llm_service.answer_question(request.question)
+        result = llm_service.answer_question(request.question, section=request.section)
         return QuestionResponse(
             answer=result["answer"],
             context=result["context"]
         )
+    except LLMServiceUnavailableError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"LLM service unavailable: {str(e)}",
+            headers=retry_after_headers(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing question: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+@router.post("/answer_questions", response_model=BatchQuestionResponse)
+def answer_questions(request: BatchQuestionRequest, llm_service: LLMService = Depends(get_llm_service)):
+    """
+    Answer several questions about the same notes in one request.
+    
+    All questions are embedded in a single request and retrieved together;
+    answers are generated concurrently or, with mode "combined", in one
+    completion that sends context shared between questions only once.
+    """
+    try:
+        results = llm_service.answer_questions(request.questions, section=request.section, mode=request.mode)
+        return BatchQuestionResponse(answers=[
+            BatchAnswerItem(question=question, answer=result["answer"], context=result["context"])
+            for question, result in zip(request.questions, results)
+        ])
+    except LLMServiceUnavailableError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"LLM service unavailable: {str(e)}",
+            headers=retry_after_headers(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing questions: {str(e)}"
+        )
@@ -1,7 +1,9 @@
 import os
+import json
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from enum import Enum
+from typing import Optional, List, Dict
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,13 +17,82 @@ class AzureOpenAIEmbeddingModelEnum(str, Enum):
     """Enum for Azure OpenAI embedding models."""
     TEXT_EMBEDDING_3_LARGE = "text-embedding-3-large"
 
+class AzureDeploymentConfig(BaseModel):
+    """One Azure OpenAI deployment in a load-balanced pool."""
+    endpoint: str
+    api_key: str
+    deployment: str
+    model: Optional[AzureOpenAIModelEnum] = None  # Model served by the deployment, defaults to AZURE_OPENAI_MODEL
+    api_version: Optional[str] = None  # Falls back to AZURE_OPENAI_API_VERSION
+    tpm: int = 0  # Tokens per minute, 0 for unlimited
+    rpm: int = 0  # Requests per minute, 0 for unlimited
+
+def _deployments_from_env(name: str) -> List[AzureDeploymentConfig]:
+    """Parse a JSON list of deployments from an environment variable."""
+    return [AzureDeploymentConfig(**item) for item in json.loads(os.getenv(name) or "[]")]
+
 class Settings(BaseModel):
     """Application settings."""
     # Database settings
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./documents.db")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))  # Wait for other processes' write locks
+    # Document content is stored compressed: "zstd" (zlib if zstandard is not installed), "zlib" or "none"
+    CONTENT_COMPRESSION: str = os.getenv("CONTENT_COMPRESSION", "zstd").lower()
+    CONTENT_COMPRESSION_LEVEL: int = int(os.getenv("CONTENT_COMPRESSION_LEVEL", "3"))
+    # Creating a document whose content matches an existing one returns the existing document
+    DEDUPLICATE_DOCUMENTS: bool = os.getenv("DEDUPLICATE_DOCUMENTS", "True").lower() == "true"
+    
+    # Vector store settings: "persistent" embeds Chroma in the process (single worker only),
+    # "http" connects to a shared Chroma server so several workers and nodes can write
+    CHROMA_MODE: str = os.getenv("CHROMA_MODE", "persistent").lower()
+    CHROMA_DB_PATH: str = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+    CHROMA_HOST: str = os.getenv("CHROMA_HOST", "localhost")
+    CHROMA_PORT: int = int(os.getenv("CHROMA_PORT", "8000"))
+    CHROMA_SSL: bool = os.getenv("CHROMA_SSL", "False").lower() == "true"
+    CHROMA_COLLECTION: str = os.getenv("CHROMA_COLLECTION", "documents")
+    # "soap" chunks on Subjective/Objective/Assessment/Plan headers; "recursive" uses fixed-size windows
+    CHUNKING_STRATEGY: str = os.getenv("CHUNKING_STRATEGY", "soap").lower()
+    CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "1000"))
+    CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "200"))  # Recursive splitting only; SOAP sections never overlap
+    # Documents are chunked in blocks of this many characters and embedded/stored this many chunks at a time,
+    # so ingesting a very large record holds only one block and one window of vectors
+    INGEST_BLOCK_CHARS: int = int(os.getenv("INGEST_BLOCK_CHARS", "262144"))
+    INGEST_EMBED_BATCH: int = int(os.getenv("INGEST_EMBED_BATCH", "64"))
+    # "reference" stores chunks in Chroma as offsets into the document's content, read back on retrieval;
+    # "inline" stores a copy of the chunk text
+    CHUNK_STORAGE: str = os.getenv("CHUNK_STORAGE", "reference").lower()
+    # Decompressed document content kept per process for reading reference chunks
+    HYDRATE_CACHE_MB: int = int(os.getenv("HYDRATE_CACHE_MB", "64"))
+    # First-stage search over quantized vectors ("none", "int8" or "binary"), re-ranked exactly on the floats;
+    # a speed-up held in memory in addition to the floats, not a memory saving
+    VECTOR_QUANTIZATION: str = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+    VECTOR_RERANK_OVERSAMPLE: int = int(os.getenv("VECTOR_RERANK_OVERSAMPLE", "10"))  # Candidates per requested result
+    VECTOR_QUANTIZED_REFRESH_SECONDS: float = float(os.getenv("VECTOR_QUANTIZED_REFRESH_SECONDS", "60"))
+    
+    # Re-ranking of retrieved chunks before Q&A prompting ("none", "lexical" or "cross_encoder")
+    RERANKER: str = os.getenv("RERANKER", "lexical").lower()
+    RERANK_MODEL: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")  # For cross_encoder
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "20"))  # Chunks fetched from the vector store
+    RERANK_TOP_N: int = int(os.getenv("RERANK_TOP_N", "3"))  # Chunks sent to the LLM
+    RERANK_VECTOR_WEIGHT: float = float(os.getenv("RERANK_VECTOR_WEIGHT", "0.5"))  # Share of vector similarity in the final score
+    
+    # Document uploads (/documents/upload)
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+    UPLOAD_DIR: Optional[str] = os.getenv("UPLOAD_DIR") or None  # Where uploads are spooled; the system temp dir if unset
+    UPLOAD_EXTRACT_PROCESSES: int = int(os.getenv("UPLOAD_EXTRACT_PROCESSES", "2"))  # Worker processes parsing PDF/DOCX
+    UPLOAD_PAGES_PER_TASK: int = int(os.getenv("UPLOAD_PAGES_PER_TASK", "10"))  # PDF pages extracted per worker task
+    
+    # Batch Q&A (/answer_questions)
+    QA_BATCH_MAX_QUESTIONS: int = int(os.getenv("QA_BATCH_MAX_QUESTIONS", "20"))
+    QA_BATCH_MAX_CONCURRENCY: int = int(os.getenv("QA_BATCH_MAX_CONCURRENCY", "4"))  # Concurrent completions in parallel mode
     
     # Application settings
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
+    
+    # Logging settings
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_PAYLOAD_SAMPLE_RATE: float = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0"))  # Fraction of payloads logged at DEBUG
+    LOG_REDACT_PHI: bool = os.getenv("LOG_REDACT_PHI", "True").lower() == "true"
     APP_NAME: str = os.getenv("APP_NAME", "Document API")
     API_VERSION: str = "v1"
     
@@ -34,19 +105,147 @@ class Settings(BaseModel):
     AZURE_OPENAI_EMBEDDINGS_API_KEY: str = os.getenv("AZURE_OPENAI_EMBEDDINGS_API_KEY", "")
     AZURE_OPENAI_ENDPOINT: str = os.getenv("AZURE_OPENAI_ENDPOINT", "")
     AZURE_OPENAI_EMBEDDING_ENDPOINT: str = os.getenv("AZURE_OPENAI_EMBEDDING_ENDPOINT", "")
-    AZURE_OPENAI_API_VERSION: str = os.getenv("AZURE_OPENAI_API_VERSION", "2023-05-15")
+    # 2024-08-01 or later is needed for structured output (AZURE_OPENAI_RESPONSE_FORMAT=auto picks json_schema);
+    # before 2023-12-01 auto falls back to no JSON enforcement
+    AZURE_OPENAI_API_VERSION: str = os.getenv("AZURE_OPENAI_API_VERSION") or "2024-10-21"
     
     # Azure OpenAI model settings
     AZURE_OPENAI_MODEL: AzureOpenAIModelEnum = AzureOpenAIModelEnum(
         os.getenv("AZURE_OPENAI_MODEL", AzureOpenAIModelEnum.GPT_4O_MINI)
     )
     AZURE_OPENAI_DEPLOYMENT: str = os.getenv("AZURE_OPENAI_DEPLOYMENT", "")  # If specified, overrides the model
+    # JSON output enforcement: auto (by API version), json_schema, json_object or none
+    AZURE_OPENAI_RESPONSE_FORMAT: str = os.getenv("AZURE_OPENAI_RESPONSE_FORMAT", "auto")
+    LLM_JSON_MAX_ATTEMPTS: int = int(os.getenv("LLM_JSON_MAX_ATTEMPTS", "2"))  # Per-call attempts for unparseable output
     
     # Azure OpenAI embedding model settings
     AZURE_OPENAI_EMBEDDING_MODEL: AzureOpenAIEmbeddingModelEnum = AzureOpenAIEmbeddingModelEnum(
         os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", AzureOpenAIEmbeddingModelEnum.TEXT_EMBEDDING_3_LARGE)
     )
     AZURE_OPENAI_EMBEDDING_DEPLOYMENT: str = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "")  # If specified, overrides the model
+    # Truncate v3 embeddings to this many dimensions (e.g. 256 or 1024); the model's full width if unset
+    AZURE_OPENAI_EMBEDDING_DIMENSIONS: Optional[int] = (
+        int(os.getenv("AZURE_OPENAI_EMBEDDING_DIMENSIONS")) if os.getenv("AZURE_OPENAI_EMBEDDING_DIMENSIONS") else None
+    )
+    
+    # Model routing: deployments per model on the main endpoint, model per task, and tasks
+    # that try the cheaper model first and escalate when output fails validation
+    AZURE_OPENAI_MODEL_DEPLOYMENTS: Dict[str, str] = json.loads(os.getenv("AZURE_OPENAI_MODEL_DEPLOYMENTS") or "{}")
+    LLM_TASK_MODELS: Dict[str, str] = json.loads(os.getenv("LLM_TASK_MODELS") or "{}")
+    LLM_CASCADE_TASKS: List[str] = [
+        task.strip() for task in os.getenv("LLM_CASCADE_TASKS", "").split(",") if task.strip()
+    ]
+    LLM_CASCADE_MODELS: List[AzureOpenAIModelEnum] = [
+        AzureOpenAIModelEnum(model.strip())
+        for model in os.getenv("LLM_CASCADE_MODELS", "gpt-4o-mini,gpt-4.1").split(",") if model.strip()
+    ]
+    
+    # Azure OpenAI deployment pools (JSON lists of AzureDeploymentConfig); override the single deployment settings
+    AZURE_OPENAI_DEPLOYMENTS: List[AzureDeploymentConfig] = _deployments_from_env("AZURE_OPENAI_DEPLOYMENTS")
+    AZURE_OPENAI_EMBEDDING_DEPLOYMENTS: List[AzureDeploymentConfig] = _deployments_from_env("AZURE_OPENAI_EMBEDDING_DEPLOYMENTS")
+    LLM_EJECT_AFTER_FAILURES: int = int(os.getenv("LLM_EJECT_AFTER_FAILURES", "3"))  # Consecutive failures before ejection
+    LLM_EJECT_SECONDS: float = float(os.getenv("LLM_EJECT_SECONDS", "30"))
+    
+    # Azure OpenAI rate limiting (per deployment, 0 disables the budget)
+    AZURE_OPENAI_TPM_LIMIT: int = int(os.getenv("AZURE_OPENAI_TPM_LIMIT", "0"))
+    AZURE_OPENAI_RPM_LIMIT: int = int(os.getenv("AZURE_OPENAI_RPM_LIMIT", "0"))
+    AZURE_OPENAI_EMBEDDING_TPM_LIMIT: int = int(os.getenv("AZURE_OPENAI_EMBEDDING_TPM_LIMIT", "0"))
+    AZURE_OPENAI_EMBEDDING_RPM_LIMIT: int = int(os.getenv("AZURE_OPENAI_EMBEDDING_RPM_LIMIT", "0"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_BACKOFF_BASE_SECONDS: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1.0"))
+    LLM_BACKOFF_MAX_SECONDS: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30.0"))
+    # Processes sharing the TPM/RPM limits above; each enforces its share (set by gunicorn.conf.py)
+    LLM_RATE_LIMIT_PROCESSES: int = max(1, int(os.getenv("LLM_RATE_LIMIT_PROCESSES") or os.getenv("WEB_CONCURRENCY") or "1"))
+    
+    # Instrumentation: USD prices per 1K tokens by model, e.g. {"gpt-4o-mini": {"prompt": 0.00015, "cached": 0.000075, "completion": 0.0006}}
+    LLM_PRICING: Dict[str, Dict[str, float]] = json.loads(os.getenv("LLM_PRICING") or "{}")
+    # Always return per-request LLM usage in the X-LLM-Usage header (otherwise only on X-Include-LLM-Usage: true)
+    LLM_USAGE_HEADER: bool = os.getenv("LLM_USAGE_HEADER", "False").lower() == "true"
+    
+    # Tracing: "none", "console", "memory" (tests) or "otlp" (uses the standard OTEL_EXPORTER_OTLP_* variables)
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "none").lower()
+    TRACING_SERVICE_NAME: str = os.getenv("OTEL_SERVICE_NAME", "medical-documents-api")
+    
+    # Readiness and warm-up settings
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "True").lower() == "true"
+    READINESS_CACHE_SECONDS: float = float(os.getenv("READINESS_CACHE_SECONDS", "10"))
+    READINESS_CHECK_LLM: bool = os.getenv("READINESS_CHECK_LLM", "True").lower() == "true"
+    
+    # Share one in-flight computation between concurrent identical Q&A and extraction requests
+    SINGLE_FLIGHT_ENABLED: bool = os.getenv("SINGLE_FLIGHT_ENABLED", "True").lower() == "true"
+    
+    # Extraction settings
+    EXTRACTION_MAP_REDUCE_THRESHOLD: int = int(os.getenv("EXTRACTION_MAP_REDUCE_THRESHOLD", "6000"))  # Characters
+    EXTRACTION_MAX_CONCURRENCY: int = int(os.getenv("EXTRACTION_MAX_CONCURRENCY", "4"))
+    
+    # Extract-on-ingest settings
+    EXTRACT_ON_INGEST: bool = os.getenv("EXTRACT_ON_INGEST", "False").lower() == "true"
+    EXTRACT_ON_INGEST_FHIR: bool = os.getenv("EXTRACT_ON_INGEST_FHIR", "True").lower() == "true"
+    # Off-peak window in local hours (0-23); extraction runs at any time if either is unset
+    EXTRACT_OFF_PEAK_START_HOUR: Optional[int] = (
+        int(os.getenv("EXTRACT_OFF_PEAK_START_HOUR")) if os.getenv("EXTRACT_OFF_PEAK_START_HOUR") else None
+    )
+    EXTRACT_OFF_PEAK_END_HOUR: Optional[int] = (
+        int(os.getenv("EXTRACT_OFF_PEAK_END_HOUR")) if os.getenv("EXTRACT_OFF_PEAK_END_HOUR") else None
+    )
+    EXTRACT_WORKER_POLL_SECONDS: int = int(os.getenv("EXTRACT_WORKER_POLL_SECONDS", "60"))
+    # Running extractions not updated for this long are assumed abandoned by a dead worker
+    EXTRACT_STALE_SECONDS: int = int(os.getenv("EXTRACT_STALE_SECONDS", "1800"))
+    # How long shutdown waits for the worker's current document before handing it back as pending
+    EXTRACT_SHUTDOWN_SECONDS: int = int(os.getenv("EXTRACT_SHUTDOWN_SECONDS", "10"))
+    
+    # Vector index reconciliation: documents re-embedded per run, to bound Azure spend
+    RECONCILE_MAX_REINDEX: int = int(os.getenv("RECONCILE_MAX_REINDEX", "100"))
+    # Documents written this recently are skipped: their ingest or re-index may still be running
+    RECONCILE_GRACE_SECONDS: int = int(os.getenv("RECONCILE_GRACE_SECONDS", "300"))
+
+    def completion_deployments(self, model: Optional[AzureOpenAIModelEnum] = None) -> List[AzureDeploymentConfig]:
+        """Completion deployments serving a model, from the pool or the single deployment settings."""
+        model = model or self.AZURE_OPENAI_MODEL
+        if self.AZURE_OPENAI_DEPLOYMENTS:
+            deployments = [
+                deployment for deployment in self.AZURE_OPENAI_DEPLOYMENTS
+                if (deployment.model or self.AZURE_OPENAI_MODEL) == model
+            ]
+            if not deployments:
+                raise ValueError(f"No deployments in AZURE_OPENAI_DEPLOYMENTS serve model {model.value}")
+            return deployments
+        if not self.AZURE_OPENAI_API_KEY:
+            raise ValueError("AZURE_OPENAI_API_KEY environment variable is not set")
+        if not self.AZURE_OPENAI_ENDPOINT:
+            raise ValueError("AZURE_OPENAI_ENDPOINT environment variable is not set")
+        return [AzureDeploymentConfig(
+            endpoint=self.AZURE_OPENAI_ENDPOINT,
+            api_key=self.AZURE_OPENAI_API_KEY,
+            # Use deployment name if provided, otherwise use the model value
+            deployment=(
+                self.AZURE_OPENAI_MODEL_DEPLOYMENTS.get(model.value)
+                or (self.AZURE_OPENAI_DEPLOYMENT if model == self.AZURE_OPENAI_MODEL else "")
+                or model.value
+            ),
+            model=model,
+            tpm=self.AZURE_OPENAI_TPM_LIMIT,
+            rpm=self.AZURE_OPENAI_RPM_LIMIT
+        )]
+    
+    def embedding_deployments(self) -> List[AzureDeploymentConfig]:
+        """Embedding deployments, from the pool or the single deployment settings."""
+        if self.AZURE_OPENAI_EMBEDDING_DEPLOYMENTS:
+            return self.AZURE_OPENAI_EMBEDDING_DEPLOYMENTS
+        # Dedicated embedding key and endpoint fall back to the main ones
+        api_key = self.AZURE_OPENAI_EMBEDDINGS_API_KEY or self.AZURE_OPENAI_API_KEY
+        endpoint = self.AZURE_OPENAI_EMBEDDING_ENDPOINT or self.AZURE_OPENAI_ENDPOINT
+        if not api_key:
+            raise ValueError("Neither AZURE_OPENAI_EMBEDDINGS_API_KEY nor AZURE_OPENAI_API_KEY environment variable is set")
+        if not endpoint:
+            raise ValueError("Neither AZURE_OPENAI_EMBEDDING_ENDPOINT nor AZURE_OPENAI_ENDPOINT environment variable is set")
+        return [AzureDeploymentConfig(
+            endpoint=endpoint,
+            api_key=api_key,
+            deployment=self.AZURE_OPENAI_EMBEDDING_DEPLOYMENT or self.AZURE_OPENAI_EMBEDDING_MODEL.value,
+            tpm=self.AZURE_OPENAI_EMBEDDING_TPM_LIMIT,
+            rpm=self.AZURE_OPENAI_EMBEDDING_RPM_LIMIT
+        )]
 
 # Create settings instance
 settings = Settings() 
\ No newline at end of file
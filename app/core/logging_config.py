@@ -0,0 +1,132 @@
+"""Centralized, non-blocking logging with PHI redaction and sampled payload logging."""
+
+from typing import Any, Optional
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import threading
+
+from app.core.config import settings
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+# Identifiers that must never reach log output
+PHI_PATTERNS = [
+    (re.compile(r"\b\d{3}-\d{2}-\d{4}\b"), "[SSN]"),
+    (re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.-]+\b"), "[EMAIL]"),
+    (re.compile(r"(?<!\w)(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]\d{3}[\s.-]\d{4}\b"), "[PHONE]"),
+    (re.compile(r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b"), "[DATE]"),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}\b"), "[DATE]"),
+    (re.compile(r"\b(?:MRN|Medical Record(?: Number)?)\s*[:#]?\s*[\w-]+", re.IGNORECASE), "[MRN]"),
+    (re.compile(r'("(?:name|patient_name|first_name|last_name|address|dob|date_of_birth)"\s*:\s*)"[^"]*"', re.IGNORECASE), r'\1"[REDACTED]"'),
+]
+
+def redact(text: str) -> str:
+    """Replace identifiers such as SSNs, phone numbers, emails, dates and MRNs in text."""
+    for pattern, replacement in PHI_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+class PHIRedactionFilter(logging.Filter):
+    """Redact PHI from the rendered message and traceback of every record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = redact(record.getMessage())
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = redact(record.exc_text)
+        return True
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves message formatting to the listener thread.
+
+    The stock QueueHandler renders the message on the calling thread so the
+    record can be pickled; our queue is in-process, so the hot path only
+    enqueues the record and the listener does the formatting and I/O.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+_setup_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+
+def setup_logging() -> None:
+    """
+    Route all logging through a queue drained by a background listener.
+
+    The root level comes from LOG_LEVEL. Output goes to stderr with PHI
+    redaction applied in the listener thread unless LOG_REDACT_PHI is off.
+    Safe to call more than once.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        if settings.LOG_REDACT_PHI:
+            handler.addFilter(PHIRedactionFilter())
+
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(DeferredQueueHandler(log_queue))
+        root.setLevel(settings.LOG_LEVEL)
+
+        _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+
+class _Payload:
+    """Defers serializing a payload until the record is actually formatted."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        try:
+            return json.dumps(self.value, default=str)
+        except (TypeError, ValueError):
+            return repr(self.value)
+
+def log_payload(logger: logging.Logger, message: str, payload: Any) -> None:
+    """
+    Log a full request or response payload at DEBUG for a sample of calls.
+
+    Nothing is serialized unless DEBUG is enabled for the logger and the call
+    falls within LOG_PAYLOAD_SAMPLE_RATE; serialization then happens on the
+    listener thread.
+
+    Args:
+        logger: Logger to write to
+        message: Description of the payload
+        payload: Any JSON-serializable value
+    """
+    rate = settings.LOG_PAYLOAD_SAMPLE_RATE
+    if rate <= 0 or not logger.isEnabledFor(logging.DEBUG):
+        return
+    if rate < 1 and random.random() >= rate:
+        return
+    logger.debug("%s: %s", message, _Payload(payload))
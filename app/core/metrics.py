@@ -0,0 +1,207 @@
+"""Token, cost and latency accounting for LLM calls."""
+
+from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import logging
+import os
+import threading
+
+from app.core.config import settings
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest
+except ImportError:  # pragma: no cover - metrics are optional
+    Counter = Gauge = Histogram = CollectorRegistry = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    generate_latest = None
+
+usage_logger = logging.getLogger("app.llm.usage")
+
+if Counter is not None:
+    LLM_CALLS = Counter(
+        "llm_calls_total", "LLM API calls", ["kind", "model", "caller", "outcome"]
+    )
+    LLM_TOKENS = Counter(
+        "llm_tokens_total", "Tokens used by LLM API calls", ["kind", "model", "caller", "token_type"]
+    )
+    LLM_COST = Counter(
+        "llm_cost_usd_total", "Estimated LLM spend in USD", ["kind", "model", "caller"]
+    )
+    LLM_LATENCY = Histogram(
+        "llm_call_duration_seconds", "LLM API call latency", ["kind", "model", "caller", "outcome"],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 40, 80)
+    )
+    REQUESTS_COALESCED = Counter(
+        "llm_requests_coalesced_total", "Calls that joined an identical in-flight computation", ["operation"]
+    )
+    INDEX_INCONSISTENCIES = Gauge(
+        "vector_index_inconsistencies", "Problems found by the last reconciliation run", ["kind"],
+        multiprocess_mode="mostrecent"
+    )
+    INDEX_REPAIRS = Counter(
+        "vector_index_repairs_total", "Repairs made by reconciliation runs", ["action"]
+    )
+    RECONCILE_LAST_RUN = Gauge(
+        "vector_index_reconcile_last_run_timestamp_seconds", "When reconciliation last finished",
+        multiprocess_mode="mostrecent"
+    )
+
+# Who is making LLM calls (agent, service or endpoint) in the current context
+_caller: ContextVar[Optional[str]] = ContextVar("llm_caller", default=None)
+
+@contextmanager
+def llm_caller(name: str):
+    """Attribute LLM calls made inside the block to the named caller."""
+    token = _caller.set(name)
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+def current_caller(default: str = "unknown") -> str:
+    """Caller attributed to LLM calls in the current context."""
+    return _caller.get() or default
+
+class RequestUsage:
+    """Aggregated LLM usage for a single API request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost_usd = 0.0
+        self.latency_seconds = 0.0
+
+    def add(self, outcome: str, latency: float, usage: Dict[str, int], cost: float) -> None:
+        with self._lock:
+            self.calls += 1
+            if outcome != "success":
+                self.errors += 1
+            self.prompt_tokens += usage.get("prompt_tokens", 0) or 0
+            self.completion_tokens += usage.get("completion_tokens", 0) or 0
+            self.cached_tokens += usage.get("cached_tokens", 0) or 0
+            self.cost_usd += cost
+            self.latency_seconds += latency
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cost_usd": round(self.cost_usd, 6),
+                "llm_time_ms": round(self.latency_seconds * 1000, 1),
+            }
+
+_request_usage: ContextVar[Optional[RequestUsage]] = ContextVar("llm_request_usage", default=None)
+
+def start_request_usage() -> RequestUsage:
+    """Begin aggregating LLM usage for the current request."""
+    usage = RequestUsage()
+    _request_usage.set(usage)
+    return usage
+
+def estimate_cost(model: str, usage: Dict[str, int]) -> float:
+    """Estimated USD cost of a call from LLM_PRICING (per 1K tokens); 0 if unpriced."""
+    pricing = settings.LLM_PRICING.get(model)
+    if not pricing:
+        return 0.0
+    cached = usage.get("cached_tokens", 0) or 0
+    prompt = (usage.get("prompt_tokens", 0) or 0) - cached
+    completion = usage.get("completion_tokens", 0) or 0
+    return (
+        prompt * pricing.get("prompt", 0.0)
+        + cached * pricing.get("cached", pricing.get("prompt", 0.0))
+        + completion * pricing.get("completion", 0.0)
+    ) / 1000
+
+def record_llm_call(
+    kind: str,
+    model: str,
+    caller: str,
+    outcome: str,
+    latency: float,
+    usage: Optional[Dict[str, int]] = None
+) -> None:
+    """
+    Record one LLM API call in Prometheus metrics, the usage log and the
+    current request's aggregate.
+
+    Args:
+        kind: "completion" or "embedding"
+        model: Model or deployment used
+        caller: Agent, service or endpoint that made the call
+        outcome: "success", "rate_limited" or "error"
+        latency: Wall-clock seconds including scheduling and retries
+        usage: Token usage block from the response, if any
+    """
+    usage = usage or {}
+    cost = estimate_cost(model, usage)
+
+    if Counter is not None:
+        LLM_CALLS.labels(kind, model, caller, outcome).inc()
+        LLM_LATENCY.labels(kind, model, caller, outcome).observe(latency)
+        for token_type in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+            if usage.get(token_type):
+                LLM_TOKENS.labels(kind, model, caller, token_type.replace("_tokens", "")).inc(usage[token_type])
+        if cost:
+            LLM_COST.labels(kind, model, caller).inc(cost)
+
+    request_usage = _request_usage.get()
+    if request_usage is not None:
+        request_usage.add(outcome, latency, usage, cost)
+
+    if usage_logger.isEnabledFor(logging.INFO):
+        usage_logger.info(json.dumps({
+            "event": "llm_call",
+            "kind": kind,
+            "model": model,
+            "caller": caller,
+            "outcome": outcome,
+            "latency_ms": round(latency * 1000, 1),
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "cached_tokens": usage.get("cached_tokens", 0),
+            "cost_usd": round(cost, 6),
+        }))
+
+def record_coalesced(operation: str) -> None:
+    """Count a call served by another caller's in-flight computation."""
+    if Counter is not None:
+        REQUESTS_COALESCED.labels(operation).inc()
+
+def record_reconcile(report) -> None:
+    """Export the findings and repairs of a reconciliation run (a ReconcileReport)."""
+    if Counter is None:
+        return
+    for kind, value in (
+        ("missing", len(report.missing)),
+        ("stale", len(report.stale)),
+        ("unverified", report.unverified),
+        ("orphan_chunks", report.orphan_chunks),
+    ):
+        INDEX_INCONSISTENCIES.labels(kind).set(value)
+    if not report.dry_run:
+        INDEX_REPAIRS.labels("reindexed").inc(len(report.reindexed))
+        INDEX_REPAIRS.labels("deleted_chunks").inc(report.deleted_chunks)
+        INDEX_REPAIRS.labels("failed").inc(len(report.failed))
+    RECONCILE_LAST_RUN.set_to_current_time()
+
+def render_metrics() -> Optional[bytes]:
+    """Prometheus exposition of all metrics, or None if prometheus_client is not installed."""
+    if generate_latest is None:
+        return None
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Under gunicorn each worker writes its samples to this directory; aggregate all of them
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
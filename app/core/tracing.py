@@ -0,0 +1,136 @@
+"""OpenTelemetry tracing for the RAG, agent and FHIR pipelines."""
+
+from typing import Any, Callable, Optional, TypeVar
+from contextlib import contextmanager
+import functools
+import threading
+
+from app.core.config import settings
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:  # pragma: no cover - tracing is optional
+    trace = None
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_setup_lock = threading.Lock()
+_configured = False
+_memory_exporter = None
+
+def setup_tracing() -> None:
+    """
+    Install a tracer provider with the exporter selected by TRACING_EXPORTER.
+
+    "none" leaves the global no-op provider in place, "console" prints spans,
+    "memory" keeps them in process for tests and "otlp" ships them to
+    OTEL_EXPORTER_OTLP_ENDPOINT. Safe to call more than once.
+    """
+    global _configured, _memory_exporter
+    exporter_name = settings.TRACING_EXPORTER
+    if trace is None or exporter_name == "none":
+        return
+
+    with _setup_lock:
+        if _configured:
+            return
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+
+        provider = TracerProvider(resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}))
+        if exporter_name == "console":
+            from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+            provider.add_span_processor(SimpleSpanProcessor(ConsoleSpanExporter()))
+        elif exporter_name == "memory":
+            from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+            _memory_exporter = InMemorySpanExporter()
+            provider.add_span_processor(SimpleSpanProcessor(_memory_exporter))
+        elif exporter_name == "otlp":
+            # Endpoint, headers and protocol options are read from the standard OTEL_EXPORTER_OTLP_* variables
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        else:
+            raise ValueError(f"Unsupported TRACING_EXPORTER: {exporter_name}")
+
+        trace.set_tracer_provider(provider)
+        _configured = True
+
+def shutdown_tracing() -> None:
+    """Flush and shut down the tracer provider, if one was installed."""
+    if trace is None or not _configured:
+        return
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
+
+def memory_exporter():
+    """The in-memory exporter when TRACING_EXPORTER is "memory", for inspecting spans in tests."""
+    return _memory_exporter
+
+def _tracer():
+    return trace.get_tracer("app")
+
+@contextmanager
+def span(name: str, kind: Optional[str] = None, **attributes: Any):
+    """
+    Record the block as a child span of the current span.
+
+    Args:
+        name: Span name, e.g. "vector_store.search"
+        kind: "server" for incoming requests; internal otherwise
+        **attributes: Span attributes; None values are skipped
+
+    Yields:
+        The span, or None when OpenTelemetry is not installed
+    """
+    if trace is None:
+        yield None
+        return
+    span_kind = SpanKind.SERVER if kind == "server" else SpanKind.INTERNAL
+    with _tracer().start_as_current_span(
+        name,
+        kind=span_kind,
+        attributes={key: value for key, value in attributes.items() if value is not None}
+    ) as current:
+        yield current
+
+def start_span(name: str, **attributes: Any):
+    """
+    Start a span without making it current; the caller must call end().
+
+    Used where the span's lifetime crosses threads, such as FastAPI
+    generator dependencies, and attaching it to the context would leak.
+    """
+    if trace is None:
+        return None
+    return _tracer().start_span(
+        name,
+        attributes={key: value for key, value in attributes.items() if value is not None}
+    )
+
+def set_attributes(current, **attributes: Any) -> None:
+    """Set attributes on a span returned by span() or start_span(), skipping None values."""
+    if current is None:
+        return
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute(key, value)
+
+def set_error(current, error: Exception) -> None:
+    """Mark a span as failed with the given exception."""
+    if current is None:
+        return
+    current.record_exception(error)
+    current.set_status(Status(StatusCode.ERROR, str(error)))
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator recording each call of the function as a span."""
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
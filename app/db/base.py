@@ -1,25 +1,108 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.core.tracing import start_span
 
 # Create SQLAlchemy engine
 engine = create_engine(
     settings.DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        """Let several worker processes share the database file."""
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers proceed during a write; busy_timeout waits for locks instead of failing
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create Base class for models
 Base = declarative_base()
 
+def create_tables() -> None:
+    """Create any missing tables; safe to run from several processes."""
+    import app.db.models  # noqa: F401 - registers the models on Base
+    Base.metadata.create_all(bind=engine, checkfirst=True)
+    _migrate_documents()
+    # Tables from before extraction claims were recorded
+    _add_columns("document_extractions", [("claim_token", ["ALTER TABLE document_extractions ADD COLUMN claim_token VARCHAR(32)"])])
+
+def _add_columns(table: str, columns) -> None:
+    """
+    Add missing columns to a table, each with the statements that create it.
+
+    Safe if another process is adding them at the same time.
+    """
+    from sqlalchemy import inspect, text
+    from sqlalchemy.exc import OperationalError
+
+    for name, statements in columns:
+        if name in {column["name"] for column in inspect(engine).get_columns(table)}:
+            continue
+        try:
+            with engine.begin() as connection:
+                for statement in statements:
+                    connection.execute(text(statement))
+        except OperationalError:
+            # Added by another process in the meantime
+            if name not in {column["name"] for column in inspect(engine).get_columns(table)}:
+                raise
+
+def _migrate_documents(batch_size: int = 100) -> None:
+    """
+    Bring a documents table from before content hashing and compression up to date.
+
+    Adds the content_hash and updated_at columns, then rewrites rows without a hash, which
+    sets the hash and stores the content compressed. Idempotent, and safe
+    if another process is running it at the same time.
+    """
+    from sqlalchemy.orm.attributes import flag_modified
+    from app.db.models import Document
+
+    _add_columns("documents", [
+        ("content_hash", [
+            "ALTER TABLE documents ADD COLUMN content_hash VARCHAR(64)",
+            "CREATE INDEX IF NOT EXISTS ix_documents_content_hash ON documents (content_hash)",
+        ]),
+        # NULL on existing rows until they are next written; the reconciler treats NULL as not recent
+        ("updated_at", ["ALTER TABLE documents ADD COLUMN updated_at DATETIME"]),
+    ])
+
+    db = SessionLocal()
+    try:
+        while True:
+            documents = (
+                db.query(Document)
+                .filter(Document.content_hash.is_(None), Document.content.isnot(None))
+                .limit(batch_size)
+                .all()
+            )
+            if not documents:
+                break
+            for document in documents:
+                document.content = document.content
+                flag_modified(document, "content")  # Rewrite even though unchanged, to compress it
+            db.commit()
+    finally:
+        db.close()
+
 # Dependency to get DB session
 def get_db():
     """Dependency for database session."""
+    # Not made current: the dependency is entered and exited on different threads
+    session_span = start_span("db.session")
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+        if session_span is not None:
+            session_span.end() 
\ No newline at end of file
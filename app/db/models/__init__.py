@@ -1,4 +1,5 @@
 from app.db.models.document import Document
+from app.db.models.document_extraction import DocumentExtraction
 
 # Add models to this import to make them easier to import elsewhere
-__all__ = ["Document"]
+__all__ = ["Document", "DocumentExtraction"]
@@ -1,6 +1,16 @@
-from sqlalchemy import Column, Integer, String, Text
+from datetime import datetime
+import hashlib
+
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.orm import validates
 
 from app.db.base import Base
+from app.db.types import CompressedText
+from app.utils.singleflight import normalize_text
+
+def hash_content(content: str) -> str:
+    """SHA-256 of the content with whitespace collapsed, so re-imports of the same note match."""
+    return hashlib.sha256(normalize_text(content).encode("utf-8")).hexdigest()
 
 class Document(Base):
     """SQLAlchemy model for documents table."""
@@ -8,4 +18,12 @@ class Document(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
-    content = Column(Text) 
\ No newline at end of file
+    content = Column(CompressedText)
+    content_hash = Column(String(64), index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @validates("content")
+    def _set_content_hash(self, key, content):
+        # Kept in step with every write of content
+        self.content_hash = hash_content(content) if content is not None else None
+        return content
@@ -0,0 +1,19 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey
+
+from app.db.base import Base
+
+class DocumentExtraction(Base):
+    """SQLAlchemy model for precomputed document extractions."""
+    __tablename__ = "document_extractions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), unique=True, index=True)
+    status = Column(String, index=True, default="pending")  # pending, running, completed, failed
+    extraction = Column(JSON, nullable=True)
+    fhir_resources = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    # Set by the worker that claimed the run; results are stored only while it still matches
+    claim_token = Column(String(32), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,73 @@
+"""Column types shared by the models."""
+
+from typing import Optional
+import logging
+import zlib
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# One-byte tag in front of every stored value naming its codec
+_RAW, _ZLIB, _ZSTD = b"r", b"d", b"z"
+
+# Values shorter than this are stored raw; compression would not pay for its header
+MIN_COMPRESS_BYTES = 256
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; zlib is used instead
+    zstandard = None
+
+_zstd_warned = False
+
+def compress_text(text: str) -> bytes:
+    """Encode text with the configured CONTENT_COMPRESSION codec, behind its tag byte."""
+    global _zstd_warned
+    data = text.encode("utf-8")
+    method = settings.CONTENT_COMPRESSION
+    if method == "none" or len(data) < MIN_COMPRESS_BYTES:
+        return _RAW + data
+    if method == "zstd" and zstandard is not None:
+        return _ZSTD + zstandard.ZstdCompressor(level=settings.CONTENT_COMPRESSION_LEVEL).compress(data)
+    if method == "zstd" and not _zstd_warned:
+        logger.warning("CONTENT_COMPRESSION=zstd but the zstandard package is not installed; using zlib")
+        _zstd_warned = True
+    return _ZLIB + zlib.compress(data, min(9, settings.CONTENT_COMPRESSION_LEVEL))
+
+def decompress_text(value) -> str:
+    """Decode a value written by compress_text; plain strings from before compression are returned as is."""
+    if isinstance(value, str):
+        return value
+    value = bytes(value)
+    tag, data = value[:1], value[1:]
+    if tag == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Stored content is zstd-compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    if tag == _ZLIB:
+        return zlib.decompress(data).decode("utf-8")
+    if tag == _RAW:
+        return data.decode("utf-8")
+    # Untagged bytes: text written as a BLOB by something else
+    return value.decode("utf-8")
+
+class CompressedText(TypeDecorator):
+    """
+    Text stored compressed (CONTENT_COMPRESSION) and read back as str.
+
+    Rows written before compression was enabled hold plain TEXT; SQLite
+    returns those as str and they are passed through unchanged, so old
+    databases keep working and are compressed as rows are rewritten.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect):
+        return None if value is None else compress_text(value)
+
+    def process_result_value(self, value, dialect) -> Optional[str]:
+        return None if value is None else decompress_text(value)
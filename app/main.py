@@ -1,20 +1,58 @@
-from fastapi import FastAPI
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import api_router
 from app.core.config import settings
-from app.db.base import engine
-import app.db.models as models
+from app.db.base import create_tables
 from app.api.endpoints import qa, medical, extraction
+from app.services.ingest_pipeline import ingest_pipeline
+from app.services.document_text import shutdown_text_extraction
+from app.services.readiness import readiness_service
+from app.services.llm.load_balancer import pool_metrics
+from app.services.prompts import prompt_versions, prompt_usage
+from app.core.metrics import start_request_usage, render_metrics, CONTENT_TYPE_LATEST
+from app.core.tracing import setup_tracing, shutdown_tracing, span, set_attributes
+from app.core.logging_config import setup_logging, shutdown_logging
 
-# Create database tables
-models.Document.__table__.create(bind=engine, checkfirst=True)
+setup_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Prepare the process on startup and release resources on shutdown.
+
+    Services (Azure clients, Chroma) are not created here; each is built on
+    first use by its get_*_service dependency, or by the background warm-up,
+    so a worker boots without waiting on chromadb or Azure.
+    """
+    setup_tracing()
+    
+    # Create database tables (already done once by the gunicorn master when using gunicorn.conf.py)
+    create_tables()
+    
+    # Pick up extractions left pending by a previous process
+    ingest_pipeline.resume_pending()
+    
+    # Load Chroma and open connections in the background; /health/ready reports when done
+    readiness_service.start_warm_up()
+    
+    yield
+    
+    # Stop the background extraction worker
+    ingest_pipeline.stop()
+    # Stop the upload text extraction processes
+    shutdown_text_extraction()
+    shutdown_tracing()
+    shutdown_logging()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Medical Documents API",
     description="API for processing and analyzing medical documents using RAG and structured extraction",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -26,12 +64,64 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+@app.middleware("http")
+async def llm_usage_header(request: Request, call_next):
+    """Aggregate LLM usage for the request and optionally return it in a header."""
+    usage = start_request_usage()
+    response = await call_next(request)
+    if settings.LLM_USAGE_HEADER or request.headers.get("X-Include-LLM-Usage", "").lower() == "true":
+        response.headers["X-LLM-Usage"] = json.dumps(usage.to_dict(), separators=(",", ":"))
+    return response
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Record each request as a server span; pipeline spans nest under it."""
+    with span(f"{request.method} {request.url.path}", kind="server", **{
+        "http.method": request.method,
+        "http.target": request.url.path
+    }) as current:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if current is not None and route is not None:
+            # Name by route template so spans group across path parameters
+            current.update_name(f"{request.method} {route.path}")
+        set_attributes(current, **{
+            "http.route": getattr(route, "path", None),
+            "http.status_code": response.status_code
+        })
+        return response
+
 # Health check endpoint
 @app.get("/health", tags=["health"])
 def health_check():
     """Health check endpoint."""
     return {"status": "ok"}
 
+@app.get("/health/ready", tags=["health"])
+def readiness_check(response: Response):
+    """Readiness probe: warm-up finished and database, vector store and LLM deployments reachable."""
+    result = readiness_service.check()
+    if not result["ready"]:
+        response.status_code = 503
+    return result
+
+@app.get("/health/llm", tags=["health"])
+def llm_scheduler_health():
+    """Routing health, queue depth and remaining budget for each LLM deployment pool, plus prompt cache usage."""
+    return {
+        "pools": pool_metrics(),
+        "prompt_versions": prompt_versions(),
+        "prompt_usage": prompt_usage()
+    }
+
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+def metrics():
+    """Prometheus metrics."""
+    body = render_metrics()
+    if body is None:
+        return Response("prometheus_client is not installed\n", status_code=501, media_type="text/plain")
+    return Response(body, media_type=CONTENT_TYPE_LATEST)
+
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
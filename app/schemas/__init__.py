@@ -1,6 +1,6 @@
 """Schema models for the application."""
 
-from app.schemas.document import Document, DocumentCreate, DocumentUpdate
+from app.schemas.document import Document, DocumentCreate, DocumentUpdate, ReconcileReport
 from app.schemas.medical import MedicalNoteRequest, MedicalNoteSummaryResponse
 from app.schemas.extraction import (
     ExtractionRequest,
@@ -11,7 +11,12 @@ from app.schemas.extraction import (
     Treatment,
     Observation,
     PlanAction,
-    StructuredMedicalData
+    StructuredMedicalData,
+    IdentifiedCodes,
+    ICDMapping,
+    RxNormMapping,
+    CodeMappings,
+    StoredExtraction
 )
 
 # Add schemas to this import to make them easier to import elsewhere
@@ -19,6 +24,7 @@ __all__ = [
     "Document",
     "DocumentCreate",
     "DocumentUpdate",
+    "ReconcileReport",
     "MedicalNoteRequest",
     "MedicalNoteSummaryResponse",
     "ExtractionRequest",
@@ -29,5 +35,10 @@ __all__ = [
     "Treatment",
     "Observation",
     "PlanAction",
-    "StructuredMedicalData"
+    "StructuredMedicalData",
+    "IdentifiedCodes",
+    "ICDMapping",
+    "RxNormMapping",
+    "CodeMappings",
+    "StoredExtraction"
 ]
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, List, Optional
 
 class DocumentBase(BaseModel):
     """Base schema for Document."""
@@ -8,14 +8,33 @@ class DocumentBase(BaseModel):
     
 class DocumentCreate(DocumentBase):
     """Schema for creating a Document."""
-    pass
+    extract_on_ingest: Optional[bool] = None  # Overrides settings.EXTRACT_ON_INGEST when set
 
 class DocumentUpdate(BaseModel):
     """Schema for updating a Document with optional fields."""
     title: Optional[str] = None
     content: Optional[str] = None
+    extract_on_ingest: Optional[bool] = None  # Overrides settings.EXTRACT_ON_INGEST when set
 
 class Document(DocumentBase):
     """Schema for returning a Document."""
     id: int
-    model_config = ConfigDict(from_attributes=True) 
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class ReconcileReport(BaseModel):
+    """Differences between the documents table and the vector index, and what was repaired."""
+    dry_run: bool = Field(..., description="Whether repairs were skipped")
+    documents: int = Field(..., description="Rows in the documents table")
+    indexed_documents: int = Field(..., description="Documents with chunks in the vector index")
+    chunks: int = Field(..., description="Chunks in the vector index")
+    missing: List[int] = Field(default_factory=list, description="Documents with content but no chunks")
+    stale: List[int] = Field(default_factory=list, description="Documents whose chunks are incomplete or from other content")
+    unverified: int = Field(0, description="Indexed documents whose chunks predate content hashes")
+    recent: int = Field(0, description="Documents skipped because they were written within RECONCILE_GRACE_SECONDS")
+    orphan_documents: List[str] = Field(default_factory=list, description="Document IDs with chunks but no row")
+    orphan_chunks: int = Field(0, description="Chunks belonging to orphan documents")
+    reindexed: List[int] = Field(default_factory=list, description="Documents re-embedded by this run")
+    deferred: int = Field(0, description="Documents left for a later run by RECONCILE_MAX_REINDEX")
+    deleted_chunks: int = Field(0, description="Orphan chunks deleted by this run")
+    failed: Dict[str, str] = Field(default_factory=dict, description="Errors by document ID")
+    duration_seconds: float = Field(..., description="Run time")
@@ -1,9 +1,13 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Dict, Any, Optional, Literal
 
 class ExtractionRequest(BaseModel):
     """Request model for medical text extraction"""
     text: str = Field(..., description="Medical text to analyze")
+    mode: Literal["auto", "single", "map_reduce"] = Field(
+        "auto",
+        description="Extraction mode: single prompt, chunked map-reduce, or auto by text length"
+    )
 
 class PatientInfo(BaseModel):
     """Patient information"""
@@ -57,8 +61,40 @@ class StructuredMedicalData(BaseModel):
     observations: List[Observation] = Field(default_factory=list, description="List of observations")
     plan: List[PlanAction] = Field(default_factory=list, description="List of planned actions")
 
+class IdentifiedCodes(BaseModel):
+    """Potential medical codes identified in text, before validation"""
+    icd_codes: List[str] = Field(default_factory=list, description="Potential ICD-10 codes")
+    rxnorm_codes: List[str] = Field(default_factory=list, description="Potential RxNorm codes")
+
+class ICDMapping(BaseModel):
+    """Validated ICD-10 code"""
+    code: str = Field(..., description="ICD-10 code")
+    description: Optional[str] = Field(None, description="Official description")
+    category: Optional[str] = Field(None, description="Disease category")
+
+class RxNormMapping(BaseModel):
+    """Validated RxNorm code"""
+    code: str = Field(..., description="RxNorm code")
+    description: Optional[str] = Field(None, description="Medication name")
+    form: Optional[str] = Field(None, description="Dosage form")
+    strength: Optional[str] = Field(None, description="Strength information")
+
+class CodeMappings(BaseModel):
+    """Validated code mappings with descriptions"""
+    icd_mappings: List[ICDMapping] = Field(default_factory=list, description="Validated ICD-10 codes")
+    rxnorm_mappings: List[RxNormMapping] = Field(default_factory=list, description="Validated RxNorm codes")
+
 class ExtractionResponse(BaseModel):
     """Response model for medical text extraction"""
     structured_data: StructuredMedicalData = Field(..., description="Structured medical information")
     code_mappings: Dict[str, List[Dict[str, str]]] = Field(..., description="Validated code mappings")
-    raw_codes: Dict[str, List[str]] = Field(..., description="Raw identified codes before validation") 
\ No newline at end of file
+    raw_codes: Dict[str, List[str]] = Field(..., description="Raw identified codes before validation") 
+
+class StoredExtraction(BaseModel):
+    """Precomputed extraction and FHIR conversion for an ingested document"""
+    document_id: int = Field(..., description="ID of the source document")
+    status: str = Field(..., description="pending, running, completed or failed")
+    extraction: Optional[ExtractionResponse] = Field(None, description="Extraction result once completed")
+    fhir_resources: Optional[List[Dict[str, Any]]] = Field(None, description="FHIR resources generated from the extraction")
+    error: Optional[str] = Field(None, description="Error message if processing failed")
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -1,6 +1,9 @@
 from typing import Dict, List
-import json
 from app.services.llm.azure_openai_service import AzureOpenAIService
+from app.services.llm.model_router import LLMTask
+from app.services.prompts import PromptTemplate, register_prompt
+from app.core.tracing import traced
+from app.schemas.extraction import IdentifiedCodes
 
 class CodeIdentificationAgent:
     """Agent responsible for identifying potential ICD and RxNorm codes from text"""
@@ -12,9 +15,29 @@ class CodeIdentificationAgent:
 
 Be thorough in identifying potential codes but do not validate them yet."""
 
+    PROMPT = register_prompt(PromptTemplate(
+        name="code_identification",
+        version="2",
+        system=SYSTEM_PROMPT,
+        instructions="""Please analyze the medical text below and identify potential medical codes.
+
+For each medical concept mentioned (conditions, medications, procedures, etc.), identify potential:
+1. ICD-10 codes for diagnoses and conditions
+2. RxNorm codes for medications
+
+Return ONLY the codes in this JSON format:
+{
+    "icd_codes": ["list of potential ICD-10 codes"],
+    "rxnorm_codes": ["list of potential RxNorm codes"]
+}""",
+        body="""Text:
+{text}"""
+    ))
+
     def __init__(self):
         self.llm_service = AzureOpenAIService()
 
+    @traced("agent.code_identification.process")
     def process(self, text: str) -> Dict[str, List[str]]:
         """
         Extract potential ICD and RxNorm codes from text.
@@ -25,24 +48,13 @@ Be thorough in identifying potential codes but do not validate them yet."""
         Returns:
             Dictionary containing arrays of potential ICD and RxNorm codes
         """
-        prompt = f"""Please analyze this medical text and identify potential medical codes:
-
-Text:
-{text}
-
-For each medical concept mentioned (conditions, medications, procedures, etc.), identify potential:
-1. ICD-10 codes for diagnoses and conditions
-2. RxNorm codes for medications
-
-Return ONLY the codes in this JSON format:
-{{
-    "icd_codes": ["list of potential ICD-10 codes"],
-    "rxnorm_codes": ["list of potential RxNorm codes"]
-}}"""
+        system_prompt, prompt = self.PROMPT.render(text=text)
 
-        result = self.llm_service.generate_text(
+        return self.llm_service.generate_json(
             prompt=prompt,
-            system_prompt=self.SYSTEM_PROMPT,
+            schema=IdentifiedCodes,
+            task=LLMTask.CODE_IDENTIFICATION,
+            prompt_id=self.PROMPT.id,
+            system_prompt=system_prompt,
             temperature=0.0  # Use deterministic output for medical information
         )
-        return json.loads(result["text"]) 
\ No newline at end of file
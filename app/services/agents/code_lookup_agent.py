@@ -1,6 +1,9 @@
 from typing import Dict, List
-import json
 from app.services.llm.azure_openai_service import AzureOpenAIService
+from app.services.llm.model_router import LLMTask
+from app.services.prompts import PromptTemplate, register_prompt
+from app.core.tracing import traced
+from app.schemas.extraction import CodeMappings
 
 class CodeLookupAgent:
     """Agent responsible for looking up and validating medical codes"""
@@ -12,26 +15,11 @@ class CodeLookupAgent:
 
 Be precise and only return valid codes with accurate descriptions."""
 
-    def __init__(self):
-        self.llm_service = AzureOpenAIService()
-
-    def process(self, code_arrays: Dict[str, List[str]]) -> Dict[str, List[Dict[str, str]]]:
-        """
-        Look up and validate medical codes.
-        
-        Args:
-            code_arrays: Dictionary containing arrays of ICD and RxNorm codes to validate
-            
-        Returns:
-            Dictionary containing validated code mappings with descriptions
-        """
-        prompt = f"""Please validate and look up these medical codes:
-
-ICD-10 Codes:
-{code_arrays["icd_codes"]}
-
-RxNorm Codes:
-{code_arrays["rxnorm_codes"]}
+    PROMPT = register_prompt(PromptTemplate(
+        name="code_lookup",
+        version="2",
+        system=SYSTEM_PROMPT,
+        instructions="""Please validate and look up the medical codes listed below.
 
 For each code, provide:
 1. The code itself
@@ -39,27 +27,54 @@ For each code, provide:
 3. Any relevant additional information
 
 Return the results in this JSON format:
-{{
+{
     "icd_mappings": [
-        {{
+        {
             "code": "ICD-10 code",
             "description": "official description",
             "category": "disease category"
-        }}
+        }
     ],
     "rxnorm_mappings": [
-        {{
+        {
             "code": "RxNorm code",
             "description": "medication name",
             "form": "dosage form",
             "strength": "strength info"
-        }}
+        }
     ]
-}}"""
+}""",
+        body="""ICD-10 Codes:
+{icd_codes}
+
+RxNorm Codes:
+{rxnorm_codes}"""
+    ))
+
+    def __init__(self):
+        self.llm_service = AzureOpenAIService()
+
+    @traced("agent.code_lookup.process")
+    def process(self, code_arrays: Dict[str, List[str]]) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Look up and validate medical codes.
+        
+        Args:
+            code_arrays: Dictionary containing arrays of ICD and RxNorm codes to validate
+            
+        Returns:
+            Dictionary containing validated code mappings with descriptions
+        """
+        system_prompt, prompt = self.PROMPT.render(
+            icd_codes=code_arrays["icd_codes"],
+            rxnorm_codes=code_arrays["rxnorm_codes"]
+        )
 
-        result = self.llm_service.generate_text(
+        return self.llm_service.generate_json(
             prompt=prompt,
-            system_prompt=self.SYSTEM_PROMPT,
+            schema=CodeMappings,
+            task=LLMTask.CODE_LOOKUP,
+            prompt_id=self.PROMPT.id,
+            system_prompt=system_prompt,
             temperature=0.0  # Use deterministic output for medical information
         )
-        return json.loads(result["text"]) 
\ No newline at end of file
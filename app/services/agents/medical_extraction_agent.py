@@ -3,10 +3,12 @@ import json
 import logging
 from app.services.llm.azure_openai_service import AzureOpenAIService
 from app.services.llm.base_service import LLMServiceError
-from app.schemas.extraction import ExtractionResponse
+from app.services.llm.model_router import LLMTask
+from app.services.prompts import PromptTemplate, register_prompt
+from app.core.tracing import traced
+from app.core.logging_config import log_payload
+from app.schemas.extraction import StructuredMedicalData
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 class MedicalExtractionAgent:
@@ -22,28 +24,12 @@ Be thorough and maintain accuracy in the extracted information.
 
 IMPORTANT: Your response must be a valid JSON object matching the specified format exactly."""
 
-    def __init__(self):
-        self.llm_service = AzureOpenAIService()
-
-    def process(self, text: str, code_mappings: Dict[str, List[Dict[str, str]]]) -> Dict[str, Any]:
-        """
-        Extract and enrich medical information.
-        
-        Args:
-            text: The medical text to analyze
-            code_mappings: Dictionary containing validated ICD and RxNorm code mappings
-            
-        Returns:
-            Dictionary containing structured medical information
-        """
-        try:
-            prompt = f"""Please analyze this medical text and create a structured representation:
-
-Text:
-{text}
-
-Available Code Mappings:
-{json.dumps(code_mappings, indent=2)}
+    # Static instructions and schema come first so repeated calls share a cacheable prefix
+    PROMPT = register_prompt(PromptTemplate(
+        name="medical_extraction",
+        version="2",
+        system=SYSTEM_PROMPT,
+        instructions="""Please analyze the medical text below and create a structured representation, using the available code mappings.
 
 Extract and structure the following information:
 1. Patient Information
@@ -54,80 +40,98 @@ Extract and structure the following information:
 6. Plan Actions and Follow-ups
 
 Return ONLY a valid JSON object in this exact format:
-{{
-    "patient_info": {{
-        "demographics": {{"age": "", "gender": "", "other_relevant_info": ""}},
+{
+    "patient_info": {
+        "demographics": {"age": "", "gender": "", "other_relevant_info": ""},
         "medical_history": []
-    }},
+    },
     "conditions": [
-        {{
+        {
             "name": "condition name",
             "status": "status",
             "severity": "severity",
             "icd_code": "matched ICD code",
             "description": "from code mapping"
-        }}
+        }
     ],
     "medications": [
-        {{
+        {
             "name": "medication name",
             "dosage": "dosage",
             "frequency": "frequency",
             "route": "route",
             "rxnorm_code": "matched RxNorm code",
             "details": "from code mapping"
-        }}
+        }
     ],
     "treatments": [
-        {{
+        {
             "procedure": "procedure name",
             "status": "status",
             "date": "date"
-        }}
+        }
     ],
     "observations": [
-        {{
+        {
             "type": "observation type",
             "value": "value",
             "unit": "unit",
             "date": "date",
             "interpretation": "interpretation"
-        }}
+        }
     ],
     "plan": [
-        {{
+        {
             "action": "planned action",
             "due_date": "due date",
             "status": "status",
             "details": "additional details"
-        }}
+        }
     ]
-}}"""
+}""",
+        # Code mappings precede the text: map-reduce chunks share them, extending the cached prefix
+        body="""Available Code Mappings:
+{code_mappings}
+
+Text:
+{text}"""
+    ))
 
-            logger.debug("Sending prompt to LLM service")
-            result = self.llm_service.generate_text(
+    def __init__(self):
+        self.llm_service = AzureOpenAIService()
+
+    @traced("agent.medical_extraction.process")
+    def process(self, text: str, code_mappings: Dict[str, List[Dict[str, str]]]) -> Dict[str, Any]:
+        """
+        Extract and enrich medical information.
+        
+        Args:
+            text: The medical text to analyze
+            code_mappings: Dictionary containing validated ICD and RxNorm code mappings
+            
+        Returns:
+            Dictionary containing structured medical information
+        """
+        try:
+            system_prompt, prompt = self.PROMPT.render(
+                text=text,
+                code_mappings=json.dumps(code_mappings, indent=2)
+            )
+
+            structured_data = self.llm_service.generate_json(
                 prompt=prompt,
-                system_prompt=self.SYSTEM_PROMPT,
+                schema=StructuredMedicalData,
+                task=LLMTask.MEDICAL_EXTRACTION,
+                prompt_id=self.PROMPT.id,
+                system_prompt=system_prompt,
                 temperature=0.0  # Use deterministic output for medical information
             )
+            log_payload(logger, "Structured data", structured_data)
+            return structured_data
             
-            logger.debug(f"Received response from LLM service: {result}")
-            
-            if not result.get("text"):
-                raise ValueError("Empty response from LLM service")
-                
-            try:
-                structured_data = json.loads(result["text"])
-                logger.debug(f"Successfully parsed JSON response: {structured_data}")
-                return structured_data
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {e}")
-                logger.error(f"Raw response: {result['text']}")
-                raise ValueError(f"Invalid JSON response from LLM: {str(e)}")
-                
         except LLMServiceError as e:
-            logger.error(f"LLM service error: {e}")
+            logger.error("LLM service error: %s", e)
             raise
         except Exception as e:
-            logger.error(f"Unexpected error in medical extraction: {e}")
+            logger.exception("Unexpected error in medical extraction")
             raise 
\ No newline at end of file
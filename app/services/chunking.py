@@ -0,0 +1,195 @@
+"""Splitting notes into chunks for embedding."""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import re
+
+from app.core.config import settings
+
+SOAP_SECTIONS = ("subjective", "objective", "assessment", "plan")
+
+# Header spellings at the start of a line, mapped to their section
+_SECTION_ALIASES = {
+    "s": "subjective",
+    "subjective": "subjective",
+    "o": "objective",
+    "objective": "objective",
+    "a": "assessment",
+    "assessment": "assessment",
+    "a/p": "assessment",
+    "assessment and plan": "assessment",
+    "assessment & plan": "assessment",
+    "p": "plan",
+    "plan": "plan",
+}
+_HEADER = re.compile(
+    r"^[ \t]*(?:(?P<letter>[SOAP]|A/P)|(?P<word>subjective|objective|assessment(?:\s*(?:and|&)\s*plan)?|plan))[ \t]*:",
+    re.IGNORECASE | re.MULTILINE
+)
+
+def _make_recursive_splitter(chunk_size: int, chunk_overlap: int):
+    # Imported here so that importing the app does not load langchain
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+
+class SOAPSectionSplitter:
+    """
+    Splits SOAP notes on their Subjective/Objective/Assessment/Plan headers.
+
+    Consecutive whole sections are packed into chunks of up to chunk_size,
+    so a section is only cut when it alone exceeds chunk_size; such sections
+    are split on paragraph and line boundaries. Chunks never overlap, so no
+    text is embedded twice. Text before the first header (encounter date,
+    patient) is kept with the first section; the signature block ends up in
+    the last. Notes without recognizable headers fall back to the recursive
+    character splitter.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        self.chunk_size = chunk_size
+        self._section_splitter = _make_recursive_splitter(chunk_size, 0)
+        self._fallback = _make_recursive_splitter(chunk_size, chunk_overlap)
+
+    def sections(self, text: str) -> List[Tuple[str, str]]:
+        """(section, text) for each SOAP section in order; empty if no headers are found."""
+        headers = list(_HEADER.finditer(text))
+        if not headers:
+            return []
+
+        sections = []
+        for header, following in zip(headers, headers[1:] + [None]):
+            name = _SECTION_ALIASES[(header.group("letter") or header.group("word")).lower()]
+            body = text[header.start():following.start() if following else len(text)]
+            sections.append((name, body))
+
+        preamble = text[:headers[0].start()].strip()
+        if preamble:
+            sections[0] = (sections[0][0], f"{preamble}\n\n{sections[0][1]}")
+        # Sections sharing a name, e.g. a repeated "P:", are merged
+        merged: List[Tuple[str, str]] = []
+        for name, body in sections:
+            if merged and merged[-1][0] == name:
+                merged[-1] = (name, f"{merged[-1][1]}\n{body}")
+            else:
+                merged.append((name, body))
+        return [(name, body.strip()) for name, body in merged if body.strip()]
+
+    def split_sections(self, text: str) -> List[Tuple[List[str], str]]:
+        """
+        Chunk a note, keeping sections intact where they fit.
+
+        Args:
+            text: The note to split
+
+        Returns:
+            (sections, chunk) pairs in note order, where sections names the
+            SOAP sections in the chunk; empty for notes without SOAP headers
+        """
+        sections = self.sections(text)
+        if not sections:
+            return [([], chunk) for chunk in self._fallback.split_text(text)]
+
+        chunks: List[Tuple[List[str], str]] = []
+        names: List[str] = []
+        parts: List[str] = []
+        length = 0
+        for name, body in sections:
+            pieces = [body] if len(body) <= self.chunk_size else self._section_splitter.split_text(body)
+            for piece in pieces:
+                # Parts are joined by a blank line
+                if parts and length + 2 + len(piece) > self.chunk_size:
+                    chunks.append((names, "\n\n".join(parts)))
+                    names, parts, length = [], [], 0
+                length += len(piece) + (2 if parts else 0)
+                parts.append(piece)
+                if name not in names:
+                    names.append(name)
+        if parts:
+            chunks.append((names, "\n\n".join(parts)))
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        """Chunk texts only, for callers that do not need section names."""
+        return [chunk for _, chunk in self.split_sections(text)]
+
+def iter_text_blocks(text: str, block_chars: int) -> Iterator[str]:
+    """
+    Consecutive slices of text of up to about block_chars characters.
+
+    Blocks end at a paragraph break where there is one in the second half
+    of the block, else at a line break, so chunks rarely straddle a cut.
+    Texts no longer than block_chars come back whole.
+    """
+    start = 0
+    while len(text) - start > block_chars:
+        end = start + block_chars
+        cut = text.rfind("\n\n", start + block_chars // 2, end)
+        if cut == -1:
+            cut = text.rfind("\n", start + block_chars // 2, end)
+        end = cut + 1 if cut != -1 else end
+        yield text[start:end]
+        start = end
+    if start < len(text):
+        yield text[start:]
+
+def _squash(text: str) -> str:
+    return "".join(text.split())
+
+def chunk_span(text: str, chunk: str, start: int = 0) -> Optional[Tuple[int, int]]:
+    """
+    Where a chunk lies in the text it was split from, searching from start.
+
+    Chunks are substrings of the text up to whitespace: section chunks join
+    their parts with blank lines and strip them. The span returned covers
+    the same characters other than whitespace, so text[begin:end] can stand
+    in for the chunk.
+
+    Returns:
+        (begin, end) offsets, or None if the chunk cannot be located
+    """
+    first = chunk.split("\n\n", 1)[0]
+    last = chunk.rsplit("\n\n", 1)[-1]
+    target = _squash(chunk)
+    begin = text.find(first, start)
+    while begin != -1:
+        found = text.find(last, begin)
+        while found != -1:
+            end = found + len(last)
+            squashed = _squash(text[begin:end])
+            if squashed == target:
+                return begin, end
+            if len(squashed) > len(target):
+                break
+            found = text.find(last, found + 1)
+        # A short first part such as a "P:" header can also occur earlier, e.g. in "BP:"
+        begin = text.find(first, begin + 1)
+    return None
+
+def split_with_sections(splitter, text: str) -> List[Tuple[List[str], str]]:
+    """(sections, chunk) pairs from any splitter; sections is empty unless it is section-aware."""
+    if isinstance(splitter, SOAPSectionSplitter):
+        return splitter.split_sections(text)
+    return [([], chunk) for chunk in splitter.split_text(text)]
+
+def section_metadata(sections: List[str]) -> Dict[str, Any]:
+    """
+    Chunk metadata naming its SOAP sections.
+
+    Chroma metadata values are scalars, so membership is stored as one
+    boolean flag per section (filter with {"section_plan": True}) next to a
+    readable comma-separated list.
+    """
+    if not sections:
+        return {}
+    return {"sections": ",".join(sections), **{f"section_{name}": True for name in sections}}
+
+def build_text_splitter():
+    """Text splitter for the configured CHUNKING_STRATEGY."""
+    if settings.CHUNKING_STRATEGY == "soap":
+        return SOAPSectionSplitter(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+    if settings.CHUNKING_STRATEGY == "recursive":
+        return _make_recursive_splitter(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+    raise ValueError(f"Unknown CHUNKING_STRATEGY {settings.CHUNKING_STRATEGY!r}; expected 'soap' or 'recursive'")
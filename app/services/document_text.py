@@ -0,0 +1,154 @@
+"""Incremental text extraction from uploaded PDF, DOCX and plain text files."""
+
+from typing import Iterator, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import importlib.util
+import multiprocessing
+import os
+import threading
+
+from app.core.config import settings
+
+# Upload kinds by file extension and by content type
+_EXTENSIONS = {".pdf": "pdf", ".docx": "docx", ".txt": "text", ".text": "text", ".md": "text"}
+_CONTENT_TYPES = {
+    "application/pdf": "pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+}
+# Optional packages needed per kind
+_REQUIREMENTS = {"pdf": ("pypdf", "pypdf"), "docx": ("docx", "python-docx")}
+
+# Characters of plain text read per page
+TEXT_BLOCK_CHARS = 64 * 1024
+
+class UnsupportedDocumentError(ValueError):
+    """The file type is not supported, or the library to read it is not installed."""
+
+def detect_kind(filename: Optional[str], content_type: Optional[str]) -> str:
+    """
+    Document kind ("pdf", "docx" or "text") from the filename or content type.
+
+    Raises:
+        UnsupportedDocumentError: For other types, or when pypdf/python-docx is missing
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    kind = _EXTENSIONS.get(extension) or _CONTENT_TYPES.get((content_type or "").split(";")[0].strip())
+    if kind is None and (content_type or "").startswith("text/"):
+        kind = "text"
+    if kind is None:
+        raise UnsupportedDocumentError(f"Unsupported file type {extension or content_type!r}; upload PDF, DOCX or plain text")
+
+    module, package = _REQUIREMENTS.get(kind, (None, None))
+    if module is not None and importlib.util.find_spec(module) is None:
+        raise UnsupportedDocumentError(f"Reading {kind.upper()} files requires the {package} package")
+    return kind
+
+# Functions below run in the worker processes
+
+def _pdf_page_count(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+def _pdf_pages(path: str, start: int, end: int) -> List[str]:
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(reader.pages[index].extract_text() or "") for index in range(start, end)]
+
+def _docx_text(path: str) -> str:
+    import docx
+    document = docx.Document(path)
+    blocks = [paragraph.text for paragraph in document.paragraphs]
+    for table in document.tables:
+        for row in table.rows:
+            blocks.append(" | ".join(cell.text for cell in row.cells))
+    return "\n".join(blocks)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers do not inherit the server's threads, locks or open connections
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.UPLOAD_EXTRACT_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def shutdown_text_extraction() -> None:
+    """Stop the extraction worker processes, if any were started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def _iter_text_file(path: str) -> Iterator[Tuple[Optional[int], str]]:
+    """Plain text in blocks ending at line breaks, read without loading the whole file."""
+    with open(path, encoding="utf-8", errors="replace") as file:
+        carry = ""
+        while True:
+            block = file.read(TEXT_BLOCK_CHARS)
+            if not block:
+                break
+            block = carry + block
+            cut = block.rfind("\n")
+            if cut == -1:
+                carry = block
+                continue
+            carry = block[cut + 1:]
+            yield None, block[:cut + 1]
+        if carry:
+            yield None, carry
+
+def _iter_pdf(path: str) -> Iterator[Tuple[Optional[int], str]]:
+    """PDF pages in order, extracted in batches across the pool with a bounded number in flight."""
+    pool = _get_pool()
+    page_count = pool.submit(_pdf_page_count, path).result()
+    batch = max(1, settings.UPLOAD_PAGES_PER_TASK)
+    starts = iter(range(0, page_count, batch))
+    in_flight = deque()
+    window = 2 * settings.UPLOAD_EXTRACT_PROCESSES
+
+    def submit_next() -> None:
+        start = next(starts, None)
+        if start is not None:
+            in_flight.append((start, pool.submit(_pdf_pages, path, start, min(start + batch, page_count))))
+
+    for _ in range(window):
+        submit_next()
+    while in_flight:
+        start, future = in_flight.popleft()
+        pages = future.result()
+        submit_next()
+        for offset, text in enumerate(pages):
+            yield start + offset + 1, text
+
+def page_separator(kind: str) -> str:
+    """What the pages of a document kind are joined with: plain text blocks keep their own line breaks."""
+    return "" if kind == "text" else "\n"
+
+def iter_document_pages(path: str, kind: str) -> Iterator[Tuple[Optional[int], str]]:
+    """
+    Text of an uploaded file as it is extracted.
+
+    PDF and DOCX parsing runs in a pool of worker processes, so it neither
+    blocks other requests on the GIL nor holds parsed documents in the
+    server's memory. PDF pages are yielded as their batch finishes.
+
+    Args:
+        path: File on disk
+        kind: "pdf", "docx" or "text", from detect_kind()
+
+    Returns:
+        Iterator of (page number or None, text); join them with page_separator(kind)
+    """
+    if kind == "pdf":
+        yield from _iter_pdf(path)
+    elif kind == "docx":
+        yield None, _get_pool().submit(_docx_text, path).result()
+    else:
+        yield from _iter_text_file(path)
@@ -0,0 +1,100 @@
+"""Deterministic merging of per-chunk extraction results for map-reduce extraction."""
+
+from typing import Dict, List, Any, Iterable, Tuple, Callable
+import re
+
+def _normalize(value: Any) -> str:
+    """Normalize a value for duplicate detection."""
+    if value is None:
+        return ""
+    text = re.sub(r"[^\w./%-]+", " ", str(value).lower())
+    return " ".join(text.split())
+
+def _unique(values: Iterable[Any]) -> List[Any]:
+    """De-duplicate values by normalized form, keeping the first occurrence."""
+    seen = set()
+    result = []
+    for value in values:
+        key = _normalize(value)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        result.append(value)
+    return result
+
+def _merge_records(
+    chunk_records: Iterable[List[Dict[str, Any]]],
+    key_fn: Callable[[Dict[str, Any]], Tuple[str, ...]]
+) -> List[Dict[str, Any]]:
+    """
+    Merge record lists from several chunks.
+
+    Records with the same key are combined field by field, keeping the first
+    non-empty value, so the output depends only on chunk order.
+    """
+    merged: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for records in chunk_records:
+        for record in records or []:
+            if not isinstance(record, dict):
+                continue
+            key = key_fn(record)
+            if not any(key):
+                continue
+            if key not in merged:
+                merged[key] = dict(record)
+                continue
+            existing = merged[key]
+            for field, value in record.items():
+                if value not in (None, "") and existing.get(field) in (None, ""):
+                    existing[field] = value
+    return list(merged.values())
+
+def merge_codes(chunk_codes: List[Dict[str, List[str]]]) -> Dict[str, List[str]]:
+    """Merge potential code arrays from several chunks."""
+    return {
+        "icd_codes": _unique(code for codes in chunk_codes for code in codes.get("icd_codes", [])),
+        "rxnorm_codes": _unique(code for codes in chunk_codes for code in codes.get("rxnorm_codes", [])),
+    }
+
+def merge_structured_data(chunk_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge structured medical data extracted from several chunks into one result."""
+    demographics: Dict[str, Any] = {}
+    for data in chunk_data:
+        for field, value in (data.get("patient_info") or {}).get("demographics", {}).items():
+            if value not in (None, "") and demographics.get(field) in (None, ""):
+                demographics[field] = value
+            else:
+                demographics.setdefault(field, value)
+
+    medical_history = _unique(
+        item
+        for data in chunk_data
+        for item in (data.get("patient_info") or {}).get("medical_history", [])
+    )
+
+    return {
+        "patient_info": {
+            "demographics": demographics,
+            "medical_history": medical_history
+        },
+        "conditions": _merge_records(
+            (data.get("conditions") for data in chunk_data),
+            lambda c: (_normalize(c.get("icd_code")) or _normalize(c.get("name")),)
+        ),
+        "medications": _merge_records(
+            (data.get("medications") for data in chunk_data),
+            lambda m: (_normalize(m.get("rxnorm_code")) or _normalize(m.get("name")), _normalize(m.get("dosage")))
+        ),
+        "treatments": _merge_records(
+            (data.get("treatments") for data in chunk_data),
+            lambda t: (_normalize(t.get("procedure")), _normalize(t.get("date")))
+        ),
+        "observations": _merge_records(
+            (data.get("observations") for data in chunk_data),
+            lambda o: (_normalize(o.get("type")), _normalize(o.get("value")), _normalize(o.get("date")))
+        ),
+        "plan": _merge_records(
+            (data.get("plan") for data in chunk_data),
+            lambda p: (_normalize(p.get("action")), _normalize(p.get("due_date")))
+        ),
+    }
@@ -1,4 +1,9 @@
-from typing import Dict, Any, Optional
+from typing import Any, List, Callable
+from app.utils.lazy import lazy_singleton
+from app.utils.singleflight import SingleFlight, flight_key, normalize_text
+from app.utils.concurrency import map_in_context
+import logging
+from app.core.config import settings
 from app.services.agents import (
     CodeIdentificationAgent,
     CodeLookupAgent,
@@ -14,6 +19,13 @@ from app.schemas.extraction import (
     Observation,
     PlanAction
 )
+from app.services.extraction_merge import merge_codes, merge_structured_data
+from app.services.chunking import build_text_splitter
+from app.services.prompts import prompt_versions
+from app.core.tracing import traced
+from app.core.logging_config import log_payload
+
+logger = logging.getLogger(__name__)
 
 class ExtractionService:
     """Service for extracting and enriching medical information from text"""
@@ -22,31 +34,69 @@ class ExtractionService:
         self.code_identifier = CodeIdentificationAgent()
         self.code_lookup = CodeLookupAgent()
         self.medical_extractor = MedicalExtractionAgent()
+        # Same splitting as ingestion, without loading the vector store
+        self.text_splitter = build_text_splitter()
+        self._inflight: SingleFlight[ExtractionResponse] = SingleFlight("extract_entities", settings.SINGLE_FLIGHT_ENABLED)
+    
+    def _split(self, text: str, mode: str) -> List[str]:
+        """Split text into chunks for map-reduce extraction, or keep it whole."""
+        if mode == "single":
+            return [text]
+        if mode == "auto" and len(text) <= settings.EXTRACTION_MAP_REDUCE_THRESHOLD:
+            return [text]
+        return self.text_splitter.split_text(text) or [text]
+    
+    def _map(self, func: Callable[[str], Any], chunks: List[str]) -> List[Any]:
+        """Apply an agent call to every chunk concurrently, preserving chunk order."""
+        return map_in_context(func, chunks, max_workers=settings.EXTRACTION_MAX_CONCURRENCY)
     
+    @traced("extraction.extract_entities")
     def extract_entities(
         self,
         text: str,
+        mode: str = "auto",
     ) -> ExtractionResponse:
         """
         Process medical text through the agent pipeline.
         
+        Long texts are split into chunks; codes are identified and entities
+        extracted per chunk concurrently, then merged and de-duplicated.
+        Concurrent calls for the same text (ignoring whitespace) and mode
+        share one run of the pipeline.
+        
         Args:
             text: The medical text to analyze
+            mode: "single" for one prompt, "map_reduce" to always chunk, or
+                "auto" to chunk only above EXTRACTION_MAP_REDUCE_THRESHOLD
             
         Returns:
             ExtractionResponse containing structured medical information
         """
+        key = flight_key(normalize_text(text), mode, prompt_versions())
+        return self._inflight.do(key, lambda: self._extract_entities(text, mode))
+    
+    def _extract_entities(self, text: str, mode: str) -> ExtractionResponse:
+        chunks = self._split(text, mode)
+        
         # Step 1: Identify potential medical codes
-        potential_codes = self.code_identifier.process(text)
-        print(f"Potential codes: {potential_codes}")
+        if len(chunks) == 1:
+            potential_codes = self.code_identifier.process(chunks[0])
+        else:
+            potential_codes = merge_codes(self._map(self.code_identifier.process, chunks))
+        log_payload(logger, "Potential codes", potential_codes)
         
         # Step 2: Look up and validate the codes
         code_mappings = self.code_lookup.process(potential_codes)
-        print(f"Code mappings: {code_mappings}")
+        log_payload(logger, "Code mappings", code_mappings)
         
         # Step 3: Extract and enrich medical information
-        raw_data = self.medical_extractor.process(text, code_mappings)
-        print(f"Structured data: {raw_data}")
+        if len(chunks) == 1:
+            raw_data = self.medical_extractor.process(chunks[0], code_mappings)
+        else:
+            raw_data = merge_structured_data(
+                self._map(lambda chunk: self.medical_extractor.process(chunk, code_mappings), chunks)
+            )
+        log_payload(logger, "Structured data", raw_data)
         
         # Convert raw data into proper Pydantic models
         structured_data = StructuredMedicalData(
@@ -65,4 +115,7 @@ class ExtractionService:
         )
 
 # Create singleton instance
-extraction_service = ExtractionService() 
\ No newline at end of file
+@lazy_singleton
+def get_extraction_service() -> ExtractionService:
+    """Shared ExtractionService, created on first use."""
+    return ExtractionService()
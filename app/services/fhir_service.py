@@ -1,88 +1,113 @@
 from typing import List, Dict, Any, Tuple
+from app.utils.lazy import lazy_singleton
 import uuid
 import json
+import logging
 from app.schemas.extraction import StructuredMedicalData
-from app.services.llm_service import llm_service
+from app.services.llm.azure_openai_service import AzureOpenAIService
+from app.services.llm.base_service import LLMResponseFormatError
+from app.services.llm.model_router import LLMTask
+from app.services.prompts import PromptTemplate, register_prompt
+from app.core.tracing import span, traced
+
+logger = logging.getLogger(__name__)
 
 class FHIRService:
     def __init__(self):
-        self.llm = llm_service.llm_service
+        self.llm = AzureOpenAIService()
+
+    RESOURCE_TYPES_PROMPT = register_prompt(PromptTemplate(
+        name="fhir_resource_types",
+        version="2",
+        system="You are a FHIR expert. Return only the resource types as a comma-separated list without any additional text or explanation.",
+        instructions="""Given the medical data below, determine which FHIR resources would best represent it.
+Focus on Patient, Condition, and MedicationStatement resources.
+Only return the resource types as a comma-separated list.""",
+        body="""Data: {data}"""
+    ))
+
+    GENERATION_PROMPT = register_prompt(PromptTemplate(
+        name="fhir_generation",
+        version="2",
+        system="""You are a FHIR expert. Generate only valid FHIR JSON for the requested resource type.
+The response must:
+1. Start with {
+2. End with }
+3. Be valid JSON
+4. Follow FHIR R4 specification
+5. Include only the JSON, no explanation or other text""",
+        instructions="""Convert the medical data below into a valid FHIR resource of the requested type.
+Follow these rules:
+1. Include only relevant fields from the data
+2. Use proper FHIR formatting and required fields
+3. Generate valid JSON that matches the FHIR R4 spec
+4. For references, use placeholder IDs
+5. Include proper coding systems (SNOMED, ICD, RxNorm) where applicable
+6. Ensure all JSON is properly formatted with correct brackets and commas""",
+        # The data precedes the resource type so calls for one record share the longer prefix
+        body="""Data: {data}
+
+Resource type: {resource_type}"""
+    ))
 
     def determine_fhir_resources(self, data: Dict[str, Any]) -> List[str]:
         """Use AI to determine which FHIR resources to generate based on the data"""
-        prompt = f"""Given this medical data, determine which FHIR resources would best represent it.
-        Focus on Patient, Condition, and MedicationStatement resources.
-        Only return the resource types as a comma-separated list.
-        
-        Data: {json.dumps(data, indent=2)}
-        """
+        system_prompt, prompt = self.RESOURCE_TYPES_PROMPT.render(data=json.dumps(data, indent=2))
         response = self.llm.generate_text(
             prompt=prompt,
             temperature=0,
             max_tokens=100,
-            system_prompt="You are a FHIR expert. Return only the resource types as a comma-separated list without any additional text or explanation."
+            task=LLMTask.FHIR_RESOURCE_TYPES,
+            prompt_id=self.RESOURCE_TYPES_PROMPT.id,
+            system_prompt=system_prompt
         )["text"].strip()
         return [r.strip() for r in response.split(",")]
 
     def generate_fhir_json(self, data: Dict[str, Any], resource_type: str) -> Dict[str, Any]:
-        """Use AI to generate FHIR-compliant JSON for a specific resource type"""
-        system_prompt = f"""You are a FHIR expert. Generate only valid FHIR JSON for a {resource_type} resource.
-        The response must:
-        1. Start with {{
-        2. End with }}
-        3. Be valid JSON
-        4. Follow FHIR R4 specification
-        5. Include only the JSON, no explanation or other text
         """
-        
-        prompt = f"""Convert this medical data into a valid FHIR {resource_type} resource.
-        Follow these rules:
-        1. Include only relevant fields from the data
-        2. Use proper FHIR formatting and required fields
-        3. Generate valid JSON that matches the FHIR R4 spec
-        4. For references, use placeholder IDs
-        5. Include proper coding systems (SNOMED, ICD, RxNorm) where applicable
-        6. Ensure all JSON is properly formatted with correct brackets and commas
-        
-        Data: {json.dumps(data, indent=2)}
+        Use AI to generate FHIR-compliant JSON for a specific resource type.
+
+        Raises:
+            ValueError: If no valid resource was generated
+            LLMServiceError: If the LLM call itself failed, e.g. LLMRateLimitError
         """
+        system_prompt, prompt = self.GENERATION_PROMPT.render(
+            data=json.dumps(data, indent=2),
+            resource_type=resource_type
+        )
+        
+        def validate(fhir_json: Any) -> None:
+            if not isinstance(fhir_json, dict):
+                raise ValueError("Response is not a JSON object")
+            if "resourceType" not in fhir_json:
+                raise ValueError("Missing resourceType in FHIR resource")
+            if fhir_json["resourceType"] != resource_type:
+                raise ValueError(f"Wrong resourceType: expected {resource_type}, got {fhir_json['resourceType']}")
         
         try:
-            response = self.llm.generate_text(
-                prompt=prompt,
-                temperature=0,
-                max_tokens=1000,
-                system_prompt=system_prompt
-            )["text"].strip()
-            
-            # Try to find JSON content if there's any extra text
-            try:
-                start_idx = response.index("{")
-                end_idx = response.rindex("}") + 1
-                response = response[start_idx:end_idx]
-            except ValueError:
-                raise ValueError(f"No valid JSON found in response for {resource_type}")
-            
-            # Parse and validate JSON
-            try:
-                fhir_json = json.loads(response)
-                if not isinstance(fhir_json, dict):
-                    raise ValueError("Response is not a JSON object")
-                if "resourceType" not in fhir_json:
-                    raise ValueError("Missing resourceType in FHIR resource")
-                if fhir_json["resourceType"] != resource_type:
-                    raise ValueError(f"Wrong resourceType: expected {resource_type}, got {fhir_json['resourceType']}")
-                return fhir_json
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Invalid JSON format: {str(e)}")
-            
-        except Exception as e:
-            print(f"Error generating {resource_type} resource: {str(e)}")
-            print(f"Raw response: {response}")
+            # Malformed output is repaired locally and only this resource is retried
+            with span("fhir.generate_fhir_json", resource_type=resource_type):
+                return self.llm.generate_json(
+                    prompt=prompt,
+                    validator=validate,
+                    task=LLMTask.FHIR_GENERATION,
+                    prompt_id=self.GENERATION_PROMPT.id,
+                    temperature=0,
+                    max_tokens=1000,
+                    system_prompt=system_prompt
+                )
+        except LLMResponseFormatError as e:
+            # Only invalid output is wrapped; rate limits and outages propagate so callers can return 503
             raise ValueError(f"Failed to generate valid {resource_type} resource: {str(e)}")
 
+    @traced("fhir.convert_to_fhir")
     def convert_to_fhir(self, data: StructuredMedicalData) -> Tuple[List[Dict[str, Any]], List[str]]:
-        """Convert structured medical data to FHIR resources"""
+        """
+        Convert structured medical data to FHIR resources.
+
+        Resource types the model cannot produce valid JSON for are skipped;
+        LLM service errors abort the conversion.
+        """
         # Convert to dict for easier handling
         data_dict = data.dict()
         
@@ -100,8 +125,8 @@ class FHIRService:
                     fhir_json["id"] = str(uuid.uuid4())
                 resources.append(fhir_json)
                 successful_types.append(resource_type)
-            except Exception as e:
-                print(f"Error generating {resource_type}: {str(e)}")
+            except ValueError as e:
+                logger.warning("Error generating %s resource: %s", resource_type, e)
                 continue
                 
         if not resources:
@@ -109,4 +134,7 @@ class FHIRService:
                 
         return resources, successful_types
 
-fhir_service = FHIRService() 
\ No newline at end of file
+@lazy_singleton
+def get_fhir_service() -> FHIRService:
+    """Shared FHIRService, created on first use."""
+    return FHIRService()
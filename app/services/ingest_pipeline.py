@@ -0,0 +1,209 @@
+from typing import Optional, Tuple
+from datetime import datetime, timedelta
+import logging
+import queue
+import threading
+import uuid
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.db.models import Document, DocumentExtraction
+from app.services.extraction_service import get_extraction_service
+from app.services.fhir_service import get_fhir_service
+from app.services.llm.scheduler import RequestPriority, priority_scope
+from app.core.metrics import llm_caller
+
+logger = logging.getLogger(__name__)
+
+class IngestExtractionPipeline:
+    """Runs the extraction agents and FHIR conversion for ingested documents off the request path."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[int]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        # (document ID, claim token) of the extraction the worker is running
+        self._current: Optional[Tuple[int, str]] = None
+
+    def is_enabled(self, override: Optional[bool] = None) -> bool:
+        """Whether a document should be extracted on ingest."""
+        return settings.EXTRACT_ON_INGEST if override is None else override
+
+    def in_off_peak_window(self, now: Optional[datetime] = None) -> bool:
+        """Check whether extraction is currently allowed to run."""
+        start = settings.EXTRACT_OFF_PEAK_START_HOUR
+        end = settings.EXTRACT_OFF_PEAK_END_HOUR
+        if start is None or end is None:
+            return True
+
+        hour = (now or datetime.now()).hour
+        if start <= end:
+            return start <= hour < end
+        # Window wraps around midnight, e.g. 22 -> 6
+        return hour >= start or hour < end
+
+    def enqueue(self, db: Session, document_id: int) -> None:
+        """Mark a document's extraction as pending and schedule it for the background worker."""
+        record = db.query(DocumentExtraction).filter(DocumentExtraction.document_id == document_id).first()
+        if record is None:
+            record = DocumentExtraction(document_id=document_id)
+            db.add(record)
+        record.status = "pending"
+        record.extraction = None
+        record.fhir_resources = None
+        record.error = None
+        # Any run still working on the old content loses its claim
+        record.claim_token = None
+        db.commit()
+
+        self._queue.put(document_id)
+        self.start()
+
+    def remove(self, db: Session, document_id: int) -> None:
+        """Drop any stored extraction for a document. The caller commits."""
+        db.query(DocumentExtraction).filter(DocumentExtraction.document_id == document_id).delete()
+
+    def resume_pending(self) -> int:
+        """
+        Re-queue extractions left pending or interrupted by a previous process.
+
+        With several workers sharing the database, a "running" record may
+        belong to a live sibling; only those not updated for
+        EXTRACT_STALE_SECONDS are treated as abandoned. Pending records may be
+        queued by more than one worker; the atomic claim in process_document
+        ensures only one of them runs it.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.EXTRACT_STALE_SECONDS)
+        db = SessionLocal()
+        try:
+            records = db.query(DocumentExtraction).filter(
+                (DocumentExtraction.status == "pending")
+                | ((DocumentExtraction.status == "running") & (DocumentExtraction.updated_at < stale_before))
+            ).all()
+            for record in records:
+                record.status = "pending"
+                record.claim_token = None
+                self._queue.put(record.document_id)
+            db.commit()
+        finally:
+            db.close()
+
+        if records:
+            self.start()
+        return len(records)
+
+    def start(self) -> None:
+        """Start the background worker if it is not already running."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="ingest-extraction", daemon=True)
+            self._worker.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background worker, waiting up to EXTRACT_SHUTDOWN_SECONDS for its current document.
+
+        A document still being extracted after that is set back to pending,
+        so the next process to start picks it up instead of waiting for
+        EXTRACT_STALE_SECONDS.
+        """
+        self._stop.set()
+        worker = self._worker
+        if worker is None or self._current is None:
+            # Idle workers hold no claim and exit with the process
+            return
+        worker.join(timeout=settings.EXTRACT_SHUTDOWN_SECONDS)
+        current = self._current
+        if worker.is_alive() and current is not None:
+            db = SessionLocal()
+            try:
+                self._release(db, *current)
+            finally:
+                db.close()
+
+    def _run(self) -> None:
+        """Worker loop: wait for the off-peak window, then process queued documents one at a time."""
+        while not self._stop.is_set():
+            if not self.in_off_peak_window():
+                self._stop.wait(settings.EXTRACT_WORKER_POLL_SECONDS)
+                continue
+            try:
+                document_id = self._queue.get(timeout=settings.EXTRACT_WORKER_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            try:
+                # Precomputation yields to interactive traffic in the LLM scheduler
+                with priority_scope(RequestPriority.BATCH), llm_caller("ingest_extraction"):
+                    self.process_document(document_id)
+            except Exception:
+                logger.exception("Ingest extraction failed for document %s", document_id)
+            finally:
+                self._queue.task_done()
+
+    def _claim(self, db: Session, document_id: int) -> Optional[str]:
+        """Atomically move a pending extraction to running; its claim token, or None if another worker got it first."""
+        token = uuid.uuid4().hex
+        claimed = db.query(DocumentExtraction).filter(
+            DocumentExtraction.document_id == document_id,
+            DocumentExtraction.status == "pending"
+        ).update(
+            {"status": "running", "claim_token": token, "updated_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.commit()
+        return token if claimed == 1 else None
+
+    def _release(self, db: Session, document_id: int, token: str) -> None:
+        """Hand a claimed extraction back as pending, unless it has been claimed or reset since."""
+        db.query(DocumentExtraction).filter(
+            DocumentExtraction.document_id == document_id,
+            DocumentExtraction.claim_token == token
+        ).update({"status": "pending", "claim_token": None}, synchronize_session=False)
+        db.commit()
+
+    def process_document(self, document_id: int) -> None:
+        """Run extraction and FHIR conversion for a document and store the results."""
+        db = SessionLocal()
+        try:
+            document = db.query(Document).filter(Document.id == document_id).first()
+            token = self._claim(db, document_id) if document is not None else None
+            if token is None:
+                # Deleted, or already handled by a duplicate queue entry or another process
+                return
+            self._current = (document_id, token)
+
+            extraction, resources, error = None, None, None
+            try:
+                result = get_extraction_service().extract_entities(text=document.content)
+                extraction = result.model_dump()
+                if settings.EXTRACT_ON_INGEST_FHIR:
+                    resources, _ = get_fhir_service().convert_to_fhir(result.structured_data)
+            except Exception as e:
+                error = str(e)
+
+            # Stored only if this run still holds the claim: an update re-queues the document,
+            # and a sibling may have taken over a run it thought abandoned
+            stored = db.query(DocumentExtraction).filter(
+                DocumentExtraction.document_id == document_id,
+                DocumentExtraction.claim_token == token,
+                DocumentExtraction.status == "running"
+            ).update({
+                "extraction": extraction,
+                "fhir_resources": resources,
+                "error": error,
+                "status": "failed" if error else "completed",
+                "updated_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+            if not stored:
+                logger.info("Extraction of document %s was superseded; result discarded", document_id)
+        finally:
+            self._current = None
+            db.close()
+
+# Create singleton instance
+ingest_pipeline = IngestExtractionPipeline()
@@ -2,16 +2,30 @@
 
 # Import base classes
 from app.services.llm.base_service import BaseLLMService, BaseEmbeddingService
-from app.services.llm.base_service import LLMServiceError, LLMServiceUnavailableError
+from app.services.llm.base_service import LLMServiceError, LLMServiceUnavailableError, LLMResponseFormatError
+from app.services.llm.base_service import LLMRateLimitError
 
 # Import implementations
 from app.services.llm.azure_openai_service import AzureOpenAIService, AzureOpenAIEmbeddingService
+from app.services.llm.scheduler import RequestPriority, RateLimitScheduler, priority_scope
+from app.services.llm.load_balancer import DeploymentPool, DeploymentEndpoint
+from app.services.llm.model_router import LLMTask, ModelRouter, model_router
 
 __all__ = [
     "BaseLLMService",
     "BaseEmbeddingService",
     "LLMServiceError",
     "LLMServiceUnavailableError",
+    "LLMResponseFormatError",
+    "LLMRateLimitError",
     "AzureOpenAIService",
     "AzureOpenAIEmbeddingService",
+    "RequestPriority",
+    "RateLimitScheduler",
+    "priority_scope",
+    "DeploymentPool",
+    "DeploymentEndpoint",
+    "LLMTask",
+    "ModelRouter",
+    "model_router",
 ] 
\ No newline at end of file
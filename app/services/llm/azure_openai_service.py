@@ -1,8 +1,27 @@
-import os
-from typing import Dict, Any, List, Optional
-import openai
-from app.core.config import settings
-from app.services.llm.base_service import BaseLLMService, BaseEmbeddingService, LLMServiceError
+import time
+from typing import Dict, Any, List, Optional, Type
+from pydantic import BaseModel
+from app.core.config import settings, AzureOpenAIModelEnum
+from app.services.llm.base_service import BaseLLMService, BaseEmbeddingService, LLMServiceError, LLMRateLimitError
+from app.services.llm.scheduler import RateLimitScheduler, RequestPriority, estimate_tokens, is_rate_limit_error
+from app.services.llm.load_balancer import DeploymentEndpoint, DeploymentPool, get_pool
+from app.services.llm.model_router import model_router
+from app.services.prompts import record_prompt_usage
+from app.core.metrics import record_llm_call, current_caller
+from app.core.tracing import span, set_attributes
+
+def _outcome(error: LLMServiceError) -> str:
+    """Outcome label for a failed call."""
+    return "rate_limited" if isinstance(error, LLMRateLimitError) else "error"
+
+def _wrap_error(error: Exception, prefix: str) -> LLMServiceError:
+    """Convert an OpenAI exception into the service's error types."""
+    if is_rate_limit_error(error):
+        return LLMRateLimitError(
+            f"{prefix}: {str(error)}",
+            retry_after=RateLimitScheduler.retry_after(error)
+        )
+    return LLMServiceError(f"{prefix}: {str(error)}")
 
 class AzureOpenAIService(BaseLLMService):
     """Service for interacting with Azure OpenAI's API."""
@@ -10,21 +29,54 @@ class AzureOpenAIService(BaseLLMService):
     DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
     
     def __init__(self):
-        self._setup_azure_openai()
-        self.client = openai.AzureOpenAI(
-            api_key=settings.AZURE_OPENAI_API_KEY,
-            api_version=settings.AZURE_OPENAI_API_VERSION,
-            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT
-        )
-        # Use deployment name if provided, otherwise use the model value
-        self.deployment_name = settings.AZURE_OPENAI_DEPLOYMENT or settings.AZURE_OPENAI_MODEL.value
+        # Deployments are shared by every service instance so routing stats are global
+        self.pool = self._pool_for(settings.AZURE_OPENAI_MODEL)
+        self.deployment_name = self.pool.endpoints[0].deployment_name
+    
+    @staticmethod
+    def _pool_for(model: AzureOpenAIModelEnum) -> DeploymentPool:
+        """The shared deployment pool serving a model."""
+        return get_pool(f"completion:{model.value}", lambda: settings.completion_deployments(model))
     
-    def _setup_azure_openai(self):
-        """Configure the Azure OpenAI with settings."""
-        if not settings.AZURE_OPENAI_API_KEY:
-            raise ValueError("AZURE_OPENAI_API_KEY environment variable is not set")
-        if not settings.AZURE_OPENAI_ENDPOINT:
-            raise ValueError("AZURE_OPENAI_ENDPOINT environment variable is not set")
+    def cascade_models(self, task: Optional[str] = None) -> List[AzureOpenAIModelEnum]:
+        """Models to try in order for a task, cheapest first."""
+        return model_router.cascade_for(task)
+    
+    @staticmethod
+    def _resolve_response_format_mode(api_version: Optional[str]) -> str:
+        """Pick the JSON enforcement supported by a deployment's API version."""
+        mode = settings.AZURE_OPENAI_RESPONSE_FORMAT
+        if mode != "auto":
+            return mode
+        # API versions are dated, e.g. 2024-08-01-preview, so they compare as strings
+        version = api_version or settings.AZURE_OPENAI_API_VERSION
+        if version >= "2024-08-01":
+            return "json_schema"
+        if version >= "2023-12-01":
+            return "json_object"
+        return "none"
+    
+    def _response_format(
+        self,
+        response_schema: Optional[Type[BaseModel]],
+        json_output: bool,
+        api_version: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Build the response_format parameter for a request, if any."""
+        mode = self._resolve_response_format_mode(api_version)
+        if not (json_output or response_schema) or mode == "none":
+            return None
+        if response_schema is not None and mode == "json_schema":
+            # Non-strict: strict mode rejects the free-form dicts used in our schemas
+            return {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": response_schema.__name__,
+                    "schema": response_schema.model_json_schema(),
+                    "strict": False
+                }
+            }
+        return {"type": "json_object"}
     
     def generate_text(
         self, 
@@ -32,6 +84,12 @@ class AzureOpenAIService(BaseLLMService):
         temperature: float = 0.7,
         max_tokens: int = 1000,
         system_prompt: Optional[str] = None,
+        response_schema: Optional[Type[BaseModel]] = None,
+        json_output: bool = False,
+        priority: Optional[RequestPriority] = None,
+        model: Optional[AzureOpenAIModelEnum] = None,
+        task: Optional[str] = None,
+        prompt_id: Optional[str] = None,
         **kwargs
     ) -> Dict[str, Any]:
         """
@@ -42,72 +100,91 @@ class AzureOpenAIService(BaseLLMService):
             temperature: Controls randomness (0-1)
             max_tokens: Maximum tokens to generate
             system_prompt: Optional system prompt to override default
+            response_schema: Optional Pydantic model requested as structured output
+            json_output: Request a JSON object response
+            priority: Scheduling priority (default: the current priority scope)
+            model: Model to use, overriding task routing
+            task: Task name used to route to a model via LLM_TASK_MODELS
+            prompt_id: Versioned prompt template ID, used for cache usage reporting
             **kwargs: Additional OpenAI-specific parameters
             
         Returns:
             Dict containing the generated text and metadata
         """
-        try:
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
+        system_prompt = system_prompt or self.DEFAULT_SYSTEM_PROMPT
+        model = AzureOpenAIModelEnum(model) if model else model_router.model_for(task)
+        caller = getattr(task, "value", task) or current_caller()
+        
+        def create(endpoint: DeploymentEndpoint):
+            request_kwargs = dict(kwargs)
+            response_format = self._response_format(response_schema, json_output, endpoint.config.api_version)
+            if response_format is not None:
+                request_kwargs.setdefault("response_format", response_format)
+            return endpoint.client.chat.completions.create(
+                model=endpoint.deployment_name,
                 messages=[
-                    {"role": "system", "content": system_prompt or self.DEFAULT_SYSTEM_PROMPT},
+                    {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=temperature,
                 max_tokens=max_tokens,
-                **kwargs
+                **request_kwargs
             )
-            
-            # Extract text from response
-            text = response.choices[0].message.content
-            
-            return {
-                "text": text,
-                "processed_successfully": True,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
-            }
-            
-        except Exception as e:
-            # Handle any errors from the API
-            raise LLMServiceError(f"Azure OpenAI service error: {str(e)}")
+        
+        start = time.perf_counter()
+        with span("llm.completion", model=model.value, caller=caller, prompt_id=prompt_id) as current:
+            try:
+                response = self._pool_for(model).call(
+                    create,
+                    estimated_tokens=estimate_tokens(system_prompt, prompt) + max_tokens,
+                    priority=priority
+                )
+                
+            except Exception as e:
+                # Handle any errors from the API
+                error = _wrap_error(e, "Azure OpenAI service error")
+                record_llm_call("completion", model.value, caller, _outcome(error), time.perf_counter() - start)
+                raise error
+            set_attributes(
+                current,
+                **{"llm.prompt_tokens": response.usage.prompt_tokens, "llm.completion_tokens": response.usage.completion_tokens}
+            )
+        
+        # Extract text from response
+        text = response.choices[0].message.content
+        
+        # Prompt tokens served from the provider's prefix cache, when reported
+        prompt_details = getattr(response.usage, "prompt_tokens_details", None)
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens,
+            "cached_tokens": getattr(prompt_details, "cached_tokens", None) or 0
+        }
+        if prompt_id:
+            record_prompt_usage(prompt_id, usage)
+        record_llm_call("completion", model.value, caller, "success", time.perf_counter() - start, usage)
+        
+        return {
+            "text": text,
+            "model": model.value,
+            "prompt_id": prompt_id,
+            "processed_successfully": True,
+            "usage": usage
+        }
 
 class AzureOpenAIEmbeddingService(BaseEmbeddingService):
     """Service for generating embeddings with Azure OpenAI."""
     
     def __init__(self):
-        self._setup_azure_openai()
-        # Use a dedicated embedding API key if available, otherwise fall back to the main API key
-        api_key = settings.AZURE_OPENAI_EMBEDDINGS_API_KEY or settings.AZURE_OPENAI_API_KEY
-        
-        # Use a dedicated embedding endpoint if available, otherwise fall back to the main endpoint
-        endpoint = settings.AZURE_OPENAI_EMBEDDING_ENDPOINT or settings.AZURE_OPENAI_ENDPOINT
-        
-        self.client = openai.AzureOpenAI(
-            api_key=api_key,
-            api_version=settings.AZURE_OPENAI_API_VERSION,
-            azure_endpoint=endpoint
-        )
-        # Use deployment name if provided, otherwise use the model value
-        self.deployment_name = settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT or settings.AZURE_OPENAI_EMBEDDING_MODEL.value
-    
-    def _setup_azure_openai(self):
-        """Configure the Azure OpenAI with settings."""
-        # Check if either the embedding-specific API key or the main API key is set
-        if not (settings.AZURE_OPENAI_EMBEDDINGS_API_KEY or settings.AZURE_OPENAI_API_KEY):
-            raise ValueError("Neither AZURE_OPENAI_EMBEDDINGS_API_KEY nor AZURE_OPENAI_API_KEY environment variable is set")
-            
-        # Check if either the embedding-specific endpoint or the main endpoint is set
-        if not (settings.AZURE_OPENAI_EMBEDDING_ENDPOINT or settings.AZURE_OPENAI_ENDPOINT):
-            raise ValueError("Neither AZURE_OPENAI_EMBEDDING_ENDPOINT nor AZURE_OPENAI_ENDPOINT environment variable is set")
+        # Deployments are shared by every service instance so routing stats are global
+        self.pool = get_pool("embedding", settings.embedding_deployments)
+        self.deployment_name = self.pool.endpoints[0].deployment_name
     
     def generate_embeddings(
         self,
         texts: List[str],
+        priority: Optional[RequestPriority] = None,
         **kwargs
     ) -> Dict[str, Any]:
         """
@@ -115,30 +192,44 @@ class AzureOpenAIEmbeddingService(BaseEmbeddingService):
         
         Args:
             texts: List of texts to generate embeddings for
+            priority: Scheduling priority (default: the current priority scope)
             **kwargs: Additional OpenAI-specific parameters
             
         Returns:
             Dict containing the embeddings and metadata
         """
-        try:
-            response = self.client.embeddings.create(
-                model=self.deployment_name,
-                input=texts,
-                **kwargs
-            )
-            
-            # Extract embeddings from response
-            embeddings = [item.embedding for item in response.data]
-            
-            return {
-                "embeddings": embeddings,
-                "processed_successfully": True,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
-            }
-            
-        except Exception as e:
-            # Handle any errors from the API
-            raise LLMServiceError(f"Azure OpenAI embedding service error: {str(e)}") 
\ No newline at end of file
+        if settings.AZURE_OPENAI_EMBEDDING_DIMENSIONS:
+            # v3 models return shortened, re-normalized vectors natively
+            kwargs.setdefault("dimensions", settings.AZURE_OPENAI_EMBEDDING_DIMENSIONS)
+        caller = current_caller("embedding")
+        start = time.perf_counter()
+        with span("llm.embedding", model=self.deployment_name, caller=caller, texts=len(texts)):
+            try:
+                response = self.pool.call(
+                    lambda endpoint: endpoint.client.embeddings.create(
+                        model=endpoint.deployment_name,
+                        input=texts,
+                        **kwargs
+                    ),
+                    estimated_tokens=estimate_tokens(*texts),
+                    priority=priority
+                )
+            except Exception as e:
+                # Handle any errors from the API
+                error = _wrap_error(e, "Azure OpenAI embedding service error")
+                record_llm_call("embedding", self.deployment_name, caller, _outcome(error), time.perf_counter() - start)
+                raise error
+        
+        # Extract embeddings from response
+        embeddings = [item.embedding for item in response.data]
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "total_tokens": response.usage.total_tokens
+        }
+        record_llm_call("embedding", self.deployment_name, caller, "success", time.perf_counter() - start, usage)
+        
+        return {
+            "embeddings": embeddings,
+            "processed_successfully": True,
+            "usage": usage
+        }
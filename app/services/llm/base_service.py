@@ -1,5 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Type, Callable
+from pydantic import BaseModel, ValidationError
+from app.core.config import settings
+from app.utils.json_repair import parse_json
 
 class LLMServiceError(Exception):
     """Base exception for LLM service errors."""
@@ -9,6 +12,17 @@ class LLMServiceUnavailableError(LLMServiceError):
     """Exception raised when a requested LLM service is unavailable."""
     pass
 
+class LLMRateLimitError(LLMServiceUnavailableError):
+    """Exception raised when the provider's rate limit is still exceeded after retries."""
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMResponseFormatError(LLMServiceError):
+    """Exception raised when an LLM response cannot be parsed into the expected structure."""
+    pass
+
 class BaseLLMService(ABC):
     """Abstract base class for LLM services."""
     
@@ -33,6 +47,78 @@ class BaseLLMService(ABC):
             Dict containing the generated text and metadata
         """
         pass
+    
+    def generate_json(
+        self,
+        prompt: str,
+        schema: Optional[Type[BaseModel]] = None,
+        validator: Optional[Callable[[Any], None]] = None,
+        temperature: float = 0.0,
+        max_tokens: int = 1000,
+        max_attempts: Optional[int] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Generate a JSON response, repairing and validating it locally.
+        
+        Only this call is retried when the output cannot be parsed or fails
+        validation, so a single malformed response does not fail a pipeline.
+        For cascading tasks, a failure on a cheaper model escalates to the
+        next model instead.
+        
+        Args:
+            prompt: The prompt to send to the LLM
+            schema: Optional Pydantic model the response must match; also
+                requested from the provider as structured output
+            validator: Optional callable raising ValueError on invalid data
+            temperature: Controls randomness (0-1)
+            max_tokens: Maximum tokens to generate
+            max_attempts: Attempts before giving up (default: settings.LLM_JSON_MAX_ATTEMPTS)
+            **kwargs: Additional provider-specific parameters; a "task" is
+                used to pick models via cascade_models
+            
+        Returns:
+            The parsed JSON, normalized through the schema if one is given
+            
+        Raises:
+            LLMResponseFormatError: If no attempt produced valid JSON
+        """
+        attempts = max(1, max_attempts or settings.LLM_JSON_MAX_ATTEMPTS)
+        models = self.cascade_models(kwargs.get("task"))
+        last_error: Optional[Exception] = None
+        for index, model in enumerate(models):
+            # Cheaper models get one try before escalating; the last model gets every attempt
+            model_attempts = attempts if index == len(models) - 1 else 1
+            if model is not None:
+                kwargs["model"] = model
+            for _ in range(model_attempts):
+                result = self.generate_text(
+                    prompt=prompt,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    response_schema=schema,
+                    json_output=True,
+                    **kwargs
+                )
+                try:
+                    data = parse_json(result.get("text"))
+                    if schema is not None:
+                        data = schema.model_validate(data).model_dump(exclude_none=True)
+                    if validator is not None:
+                        validator(data)
+                    return data
+                except (ValueError, ValidationError) as e:
+                    last_error = e
+        total_attempts = attempts + len(models) - 1
+        raise LLMResponseFormatError(f"Invalid structured response after {total_attempts} attempt(s): {str(last_error)}")
+    
+    def cascade_models(self, task: Optional[str] = None) -> List[Optional[Any]]:
+        """
+        Models to try in order for a task in generate_json.
+        
+        The default of [None] uses the provider's default model only.
+        """
+        return [None]
 
 class BaseEmbeddingService(ABC):
     """Abstract base class for embedding services."""
@@ -0,0 +1,239 @@
+"""Load balancing and failover across a pool of Azure OpenAI deployments."""
+
+from typing import Dict, Any, List, Optional, Callable, Tuple, TypeVar
+from functools import lru_cache
+from urllib.parse import urlparse
+import threading
+import time
+
+from app.core.config import settings, AzureDeploymentConfig
+from app.services.llm.scheduler import (
+    RateLimitScheduler,
+    RequestPriority,
+    get_scheduler,
+    retryable_errors,
+    is_rate_limit_error
+)
+
+T = TypeVar("T")
+
+@lru_cache(maxsize=None)
+def failover_errors() -> Tuple[type, ...]:
+    """Errors that indicate a deployment problem rather than a bad request."""
+    import openai
+    return retryable_errors() + (
+        openai.AuthenticationError,
+        openai.PermissionDeniedError,
+        openai.NotFoundError,
+    )
+
+class DeploymentEndpoint:
+    """A single deployment in a pool, with its client, scheduler and health state."""
+
+    # Smoothing factor for the latency moving average
+    LATENCY_ALPHA = 0.2
+
+    def __init__(self, config: AzureDeploymentConfig):
+        import openai
+
+        self.config = config
+        self.deployment_name = config.deployment
+        self.name = f"{urlparse(config.endpoint).netloc or config.endpoint}/{config.deployment}"
+        self.client = openai.AzureOpenAI(
+            api_key=config.api_key,
+            api_version=config.api_version or settings.AZURE_OPENAI_API_VERSION,
+            azure_endpoint=config.endpoint,
+            max_retries=0  # Retries are handled by the scheduler
+        )
+        # The deployment's quota is shared by every worker process; each enforces its share
+        processes = settings.LLM_RATE_LIMIT_PROCESSES
+        self.tpm = max(1, config.tpm // processes) if config.tpm else config.tpm
+        self.rpm = max(1, config.rpm // processes) if config.rpm else config.rpm
+        self.scheduler: RateLimitScheduler = get_scheduler(
+            self.name,
+            tokens_per_minute=self.tpm,
+            requests_per_minute=self.rpm
+        )
+        self._lock = threading.Lock()
+        self.latency_ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    def is_healthy(self, now: Optional[float] = None) -> bool:
+        """Whether the deployment is currently in rotation."""
+        return (now or time.monotonic()) >= self.ejected_until
+
+    def remaining_quota(self) -> float:
+        """Fraction (0-1) of the per-minute budget still available."""
+        metrics = self.scheduler.metrics()
+        if metrics["blocked_for_seconds"] > 0:
+            return 0.0
+        fractions = [1.0]
+        if self.tpm:
+            fractions.append(max(0.0, metrics["tokens_available"]) / self.tpm)
+        if self.rpm:
+            fractions.append(max(0.0, metrics["requests_available"]) / self.rpm)
+        # Calls already queued will consume budget before a new one can run
+        return min(fractions) / (1 + metrics["queue_depth"])
+
+    def score(self) -> float:
+        """Routing score; higher is better. Unmeasured deployments are tried early."""
+        latency = self.latency_ewma if self.latency_ewma is not None else 0.1
+        return self.remaining_quota() / max(latency, 0.001)
+
+    def record_success(self, latency: float) -> None:
+        """Update latency stats and put the deployment back in rotation."""
+        with self._lock:
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += self.LATENCY_ALPHA * (latency - self.latency_ewma)
+            self.consecutive_failures = 0
+            self.ejected_until = 0.0
+
+    def record_failure(self) -> None:
+        """Count a failure, ejecting the deployment after too many in a row."""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= settings.LLM_EJECT_AFTER_FAILURES:
+                self.ejected_until = time.monotonic() + settings.LLM_EJECT_SECONDS
+
+    def probe(self, timeout: float = 5.0) -> None:
+        """
+        Open a connection to the deployment's endpoint without spending tokens.
+
+        Lists models on the endpoint through the deployment's own connection
+        pool, so the TLS handshake is done before real traffic arrives. Any
+        HTTP response proves the endpoint is reachable; authentication
+        failures and connection errors are raised.
+        """
+        import openai
+
+        try:
+            self.client.with_options(timeout=timeout, max_retries=0).models.list()
+        except (openai.AuthenticationError, openai.PermissionDeniedError):
+            raise
+        except openai.APIStatusError:
+            pass
+
+    def metrics(self) -> Dict[str, Any]:
+        """Health and routing state of the deployment."""
+        now = time.monotonic()
+        return {
+            "name": self.name,
+            "healthy": self.is_healthy(now),
+            "ejected_for_seconds": round(max(0.0, self.ejected_until - now), 3),
+            "consecutive_failures": self.consecutive_failures,
+            "latency_ewma_seconds": round(self.latency_ewma, 4) if self.latency_ewma is not None else None,
+            "remaining_quota": round(self.remaining_quota(), 4),
+            "scheduler": self.scheduler.metrics(),
+        }
+
+class DeploymentPool:
+    """
+    Routes calls across deployments by remaining quota and observed latency.
+
+    A call that fails on one deployment fails over to the next best one; only
+    the last candidate retries through its scheduler. Deployments failing
+    repeatedly are ejected for LLM_EJECT_SECONDS and then tried again.
+    """
+
+    def __init__(self, name: str, configs: List[AzureDeploymentConfig]):
+        if not configs:
+            raise ValueError(f"No deployments configured for pool '{name}'")
+        self.name = name
+        self.endpoints = [DeploymentEndpoint(config) for config in configs]
+
+    def candidates(self) -> List[DeploymentEndpoint]:
+        """Deployments in the order they should be tried."""
+        now = time.monotonic()
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.is_healthy(now)]
+        ejected = [endpoint for endpoint in self.endpoints if not endpoint.is_healthy(now)]
+        # Ejected deployments are a last resort, soonest-to-return first
+        return (
+            sorted(healthy, key=lambda endpoint: endpoint.score(), reverse=True)
+            + sorted(ejected, key=lambda endpoint: endpoint.ejected_until)
+        )
+
+    def call(
+        self,
+        func: Callable[[DeploymentEndpoint], T],
+        estimated_tokens: int,
+        priority: Optional[RequestPriority] = None
+    ) -> T:
+        """
+        Run an API call on the best deployment, failing over on errors.
+
+        Args:
+            func: Callable issuing the request against the given deployment
+            estimated_tokens: Tokens reserved in the deployment's budget
+            priority: Scheduling priority (default: the current priority scope)
+
+        Returns:
+            The call's result
+        """
+        candidates = self.candidates()
+        last_error: Optional[Exception] = None
+        for index, endpoint in enumerate(candidates):
+            is_last = index == len(candidates) - 1
+            timing = {}
+
+            def timed_call(endpoint=endpoint):
+                start = time.monotonic()
+                result = func(endpoint)
+                timing["latency"] = time.monotonic() - start
+                return result
+
+            try:
+                result = endpoint.scheduler.run(
+                    timed_call,
+                    estimated_tokens=estimated_tokens,
+                    priority=priority,
+                    max_retries=None if is_last else 0
+                )
+            except failover_errors() as e:
+                last_error = e
+                if not is_rate_limit_error(e):
+                    # Quota exhaustion is tracked by the scheduler, not as ill health
+                    endpoint.record_failure()
+                continue
+            endpoint.record_success(timing["latency"])
+            return result
+        raise last_error
+
+    def probe(self, timeout: float = 5.0) -> Dict[str, Optional[str]]:
+        """Probe every deployment; maps deployment name to an error message, or None if reachable."""
+        results = {}
+        for endpoint in self.endpoints:
+            try:
+                endpoint.probe(timeout)
+                results[endpoint.name] = None
+            except Exception as e:
+                results[endpoint.name] = f"{type(e).__name__}: {e}"
+        return results
+
+    def metrics(self) -> Dict[str, Any]:
+        """Routing state for every deployment in the pool."""
+        return {
+            "name": self.name,
+            "deployments": [endpoint.metrics() for endpoint in self.endpoints],
+        }
+
+_pools: Dict[str, DeploymentPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(name: str, configs: Callable[[], List[AzureDeploymentConfig]]) -> DeploymentPool:
+    """Get the shared pool with the given name, creating it from configs on first use."""
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = DeploymentPool(name, configs())
+        return _pools[name]
+
+def all_pools() -> List[DeploymentPool]:
+    """Every deployment pool created in this process."""
+    with _pools_lock:
+        return list(_pools.values())
+
+def pool_metrics() -> List[Dict[str, Any]]:
+    """Metrics for every deployment pool in this process."""
+    return [pool.metrics() for pool in all_pools()]
@@ -0,0 +1,41 @@
+"""Per-task model selection for LLM calls."""
+
+from typing import List, Optional
+from enum import Enum
+
+from app.core.config import settings, AzureOpenAIModelEnum
+
+class LLMTask(str, Enum):
+    """Named LLM tasks that can be routed to different models."""
+    QA_ANSWER = "qa_answer"
+    NOTE_SUMMARY = "note_summary"
+    CODE_IDENTIFICATION = "code_identification"
+    CODE_LOOKUP = "code_lookup"
+    MEDICAL_EXTRACTION = "medical_extraction"
+    FHIR_RESOURCE_TYPES = "fhir_resource_types"
+    FHIR_GENERATION = "fhir_generation"
+
+class ModelRouter:
+    """Chooses the model for a task from LLM_TASK_MODELS and LLM_CASCADE_TASKS."""
+
+    def model_for(self, task: Optional[str] = None) -> AzureOpenAIModelEnum:
+        """The model configured for a task, or the default AZURE_OPENAI_MODEL."""
+        task = task.value if isinstance(task, LLMTask) else task
+        if task and task in settings.LLM_TASK_MODELS:
+            return AzureOpenAIModelEnum(settings.LLM_TASK_MODELS[task])
+        return settings.AZURE_OPENAI_MODEL
+
+    def cascade_for(self, task: Optional[str] = None) -> List[AzureOpenAIModelEnum]:
+        """
+        Models to try in order for a task.
+
+        Cascading tasks start with the cheapest model in LLM_CASCADE_MODELS and
+        escalate only when its output fails validation.
+        """
+        task = task.value if isinstance(task, LLMTask) else task
+        if task and task in settings.LLM_CASCADE_TASKS and settings.LLM_CASCADE_MODELS:
+            return list(settings.LLM_CASCADE_MODELS)
+        return [self.model_for(task)]
+
+# Create singleton instance
+model_router = ModelRouter()
@@ -0,0 +1,278 @@
+"""Client-side request scheduling and retry for rate-limited LLM deployments."""
+
+from typing import Dict, Any, List, Optional, Callable, Tuple, TypeVar
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+class RequestPriority(IntEnum):
+    """Scheduling priority for LLM calls; lower values are served first."""
+    INTERACTIVE = 0
+    NORMAL = 1
+    BATCH = 2
+
+# Priority applied to calls that do not pass one explicitly
+_current_priority: ContextVar[RequestPriority] = ContextVar("llm_request_priority", default=RequestPriority.NORMAL)
+
+@contextmanager
+def priority_scope(priority: RequestPriority):
+    """Run all LLM calls made inside the block with the given priority."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+def current_priority() -> RequestPriority:
+    """Priority for LLM calls made in the current context."""
+    return _current_priority.get()
+
+def estimate_tokens(*texts: Optional[str]) -> int:
+    """Rough token estimate (about four characters per token) used for budgeting."""
+    return sum(len(text) for text in texts if text) // 4 + 1
+
+# openai is imported on first use: it is the slowest import in the app and
+# is only needed once a call is actually made
+@lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[type, ...]:
+    """OpenAI errors that are transient and worth retrying."""
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an error is an OpenAI rate limit (429) response."""
+    import openai
+    return isinstance(error, openai.RateLimitError)
+
+class RateLimitScheduler:
+    """
+    Tokens-per-minute and requests-per-minute budget for a single deployment.
+
+    Calls wait in a priority queue until the budget allows them to run. Rate
+    limit responses pause the whole deployment for the server's Retry-After
+    period; transient errors are retried with jittered exponential backoff.
+    A limit of 0 disables that budget.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        tokens_per_minute: int = 0,
+        requests_per_minute: int = 0,
+        max_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None
+    ):
+        self.name = name
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = settings.LLM_BACKOFF_BASE_SECONDS if backoff_base is None else backoff_base
+        self.backoff_max = settings.LLM_BACKOFF_MAX_SECONDS if backoff_max is None else backoff_max
+
+        self._cond = threading.Condition()
+        self._waiting: List[tuple] = []
+        self._seq = itertools.count()
+        self._tokens = float(tokens_per_minute)
+        self._requests = float(requests_per_minute)
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._in_flight = 0
+        self._stats = {"completed": 0, "failed": 0, "retries": 0, "rate_limited": 0}
+
+    def _refill(self, now: float) -> None:
+        """Replenish budgets for the time elapsed since the last refill."""
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a call needing the given tokens may start; 0 if it can start now."""
+        wait = max(0.0, self._blocked_until - now)
+        if self.tokens_per_minute and self._tokens < tokens:
+            wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+        if self.requests_per_minute and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+        return wait
+
+    def _acquire(self, tokens: int, priority: RequestPriority) -> None:
+        """Block until this call is first in line and the budget allows it."""
+        if self.tokens_per_minute:
+            # A single oversized call must not wait forever
+            tokens = min(tokens, self.tokens_per_minute)
+        ticket = (int(priority), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._waiting[0] == ticket:
+                    wait = self._wait_time(tokens, now)
+                    if wait <= 0:
+                        heapq.heappop(self._waiting)
+                        self._tokens -= tokens
+                        self._requests -= 1
+                        self._in_flight += 1
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait(timeout=min(wait, 1.0))
+                else:
+                    self._cond.wait(timeout=1.0)
+
+    def _release(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Finish a call, correcting the token budget with actual usage when known."""
+        with self._cond:
+            self._in_flight -= 1
+            if self.tokens_per_minute and actual_tokens is not None:
+                self._tokens -= actual_tokens - min(estimated_tokens, self.tokens_per_minute)
+            self._cond.notify_all()
+
+    def _block(self, seconds: float) -> None:
+        """Pause the deployment for all callers."""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with equal jitter."""
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        """Read the server's requested delay, in seconds, from an API error."""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        return None
+
+    def run(
+        self,
+        call: Callable[[], T],
+        estimated_tokens: int,
+        priority: Optional[RequestPriority] = None,
+        max_retries: Optional[int] = None
+    ) -> T:
+        """
+        Run a call within the deployment's budget, retrying transient failures.
+
+        Args:
+            call: Zero-argument callable issuing the API request
+            estimated_tokens: Prompt plus completion tokens reserved up front
+            priority: Queue priority (default: the current priority scope)
+            max_retries: Override for the number of retries
+
+        Returns:
+            The call's result
+        """
+        priority = current_priority() if priority is None else priority
+        retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            self._acquire(estimated_tokens, priority)
+            actual_tokens = None
+            try:
+                result = call()
+                usage = getattr(result, "usage", None)
+                actual_tokens = getattr(usage, "total_tokens", None)
+            except retryable_errors() as e:
+                rate_limited = is_rate_limit_error(e)
+                delay = self.retry_after(e) or self._backoff(attempt)
+                with self._cond:
+                    if rate_limited:
+                        self._stats["rate_limited"] += 1
+                    if attempt >= retries:
+                        self._stats["failed"] += 1
+                    else:
+                        self._stats["retries"] += 1
+                if rate_limited:
+                    # Everyone waits: the quota is shared by the deployment
+                    self._block(delay)
+                if attempt >= retries:
+                    raise
+                if not rate_limited:
+                    time.sleep(delay)
+                attempt += 1
+                continue
+            except Exception:
+                with self._cond:
+                    self._stats["failed"] += 1
+                raise
+            finally:
+                self._release(estimated_tokens, actual_tokens)
+
+            with self._cond:
+                self._stats["completed"] += 1
+            return result
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of queue depth, in-flight calls, remaining budget and outcome counts."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            depth_by_priority = {priority.name.lower(): 0 for priority in RequestPriority}
+            for priority, _ in self._waiting:
+                depth_by_priority[RequestPriority(priority).name.lower()] += 1
+            return {
+                "name": self.name,
+                "queue_depth": len(self._waiting),
+                "queue_depth_by_priority": depth_by_priority,
+                "in_flight": self._in_flight,
+                "tokens_available": round(self._tokens) if self.tokens_per_minute else None,
+                "requests_available": round(self._requests, 2) if self.requests_per_minute else None,
+                "blocked_for_seconds": round(max(0.0, self._blocked_until - now), 3),
+                **self._stats,
+            }
+
+_schedulers: Dict[str, RateLimitScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(name: str, tokens_per_minute: int = 0, requests_per_minute: int = 0) -> RateLimitScheduler:
+    """Get the shared scheduler for a deployment, creating it on first use."""
+    with _schedulers_lock:
+        if name not in _schedulers:
+            _schedulers[name] = RateLimitScheduler(name, tokens_per_minute, requests_per_minute)
+        return _schedulers[name]
+
+def scheduler_metrics() -> List[Dict[str, Any]]:
+    """Metrics for every deployment scheduler in this process."""
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    return [scheduler.metrics() for scheduler in schedulers]
@@ -1,44 +1,193 @@
-from typing import List, Dict, Any
-from app.services.vector_store import vector_store_service
+from typing import List, Dict, Any, Optional
+from pydantic import BaseModel
+from app.core.config import settings
+from app.utils.lazy import lazy_singleton
+from app.utils.singleflight import SingleFlight, flight_key, normalize_text
+from app.utils.concurrency import map_in_context
+from app.services.vector_store import get_vector_store_service
+from app.services.reranker import get_reranker
 from app.services.llm.azure_openai_service import AzureOpenAIService
+from app.services.llm.scheduler import RequestPriority, priority_scope
+from app.services.llm.model_router import LLMTask
+from app.services.prompts import PromptTemplate, register_prompt, prompt_versions
+
+class BatchAnswer(BaseModel):
+    index: int
+    answer: str
+
+class BatchAnswers(BaseModel):
+    """Structured output of the combined batch Q&A prompt."""
+    answers: List[BatchAnswer]
 
 class LLMService:
     MEDICAL_SYSTEM_PROMPT = "You are a medical assistant which summarizes medical SOAP notes. The user will provide a question and context will be retrieved from a vector store. If the answer cannot be found in the context, say so."
     
+    QA_PROMPT = register_prompt(PromptTemplate(
+        name="qa_answer",
+        version="2",
+        system=MEDICAL_SYSTEM_PROMPT,
+        instructions="",
+        body="""Context:
+{context}
+
+Question: {question}
+
+Answer:"""
+    ))
+    
+    QA_BATCH_PROMPT = register_prompt(PromptTemplate(
+        name="qa_batch_answer",
+        version="1",
+        system=MEDICAL_SYSTEM_PROMPT,
+        instructions="""Answer each numbered question using only the context. Reply with a JSON object of the form {"answers": [{"index": <question number>, "answer": "<answer>"}]} containing one entry per question.""",
+        body="""Context:
+{context}
+
+Questions:
+{questions}"""
+    ))
+    
     def __init__(self):
         self.llm_service = AzureOpenAIService()
+        self._inflight: SingleFlight[Dict[str, Any]] = SingleFlight("answer_question", settings.SINGLE_FLIGHT_ENABLED)
 
-    def answer_question(self, question: str) -> Dict[str, Any]:
-        """Answer a question using RAG."""
-        # Retrieve relevant chunks
-        relevant_chunks = vector_store_service.search_similar_chunks(question)
-        
+    def answer_question(self, question: str, section: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Answer a question using RAG.
+
+        Concurrent requests for the same question (ignoring case and
+        whitespace) share one retrieval and completion.
+
+        Args:
+            question: The user's question
+            section: Only use context from this SOAP section, e.g. "plan"
+        """
+        key = flight_key(normalize_text(question, casefold=True), section, prompt_versions())
+        return self._inflight.do(key, lambda: self._answer_question_interactive(question, section))
+
+    def _answer_question_interactive(self, question: str, section: Optional[str]) -> Dict[str, Any]:
+        # Interactive Q&A is scheduled ahead of batch extraction work
+        with priority_scope(RequestPriority.INTERACTIVE):
+            return self._answer_question(question, section)
+    
+    def _answer_question(self, question: str, section: Optional[str] = None) -> Dict[str, Any]:
+        # Over-fetch candidates, then keep only the best few for the prompt
+        reranker = get_reranker()
+        candidates = get_vector_store_service().search_similar_chunks(
+            question,
+            k=self._candidate_count(reranker),
+            section=section
+        )
+        relevant_chunks = reranker.rerank(question, candidates, top_n=settings.RERANK_TOP_N)
+        return self._result(self._generate_answer(question, relevant_chunks), relevant_chunks)
+    
+    @staticmethod
+    def _candidate_count(reranker) -> int:
+        return settings.RERANK_CANDIDATES if reranker.name != "none" else settings.RERANK_TOP_N
+    
+    @staticmethod
+    def _result(answer: str, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "answer": answer,
+            "context": {
+                "chunks": chunks,
+                "total_chunks_used": len(chunks)
+            }
+        }
+    
+    def _generate_answer(self, question: str, chunks: List[Dict[str, Any]]) -> str:
         # Prepare context from chunks
-        context = "\n\n".join([chunk["content"] for chunk in relevant_chunks])
+        context = "\n\n".join([chunk["content"] for chunk in chunks])
         
         # Create prompt
-        prompt = f"""
-        Context:
-        {context}
-
-        Question: {question}
-
-        Answer:"""
+        system_prompt, prompt = self.QA_PROMPT.render(context=context, question=question)
         
         # Get response from LLM
         result = self.llm_service.generate_text(
             prompt=prompt,
             temperature=0,  # Use 0 temperature for more deterministic answers
             max_tokens=1000,
-            system_prompt=self.MEDICAL_SYSTEM_PROMPT
+            system_prompt=system_prompt,
+            task=LLMTask.QA_ANSWER,
+            prompt_id=self.QA_PROMPT.id
         )
+        return result["text"]
+    
+    def answer_questions(
+        self,
+        questions: List[str],
+        section: Optional[str] = None,
+        mode: str = "parallel"
+    ) -> List[Dict[str, Any]]:
+        """
+        Answer several questions against the same notes.
         
-        return {
-            "answer": result["text"],
-            "context": {
-                "chunks": relevant_chunks,
-                "total_chunks_used": len(relevant_chunks)
-            }
-        }
+        All questions are embedded in one request and retrieved with one
+        vector store query; repeated questions (ignoring case and whitespace)
+        are answered once.
+        
+        Args:
+            questions: The user's questions
+            section: Only use context from this SOAP section, e.g. "plan"
+            mode: "parallel" answers each question with its own prompt,
+                concurrently; "combined" answers all of them in one structured
+                completion over the union of their context, so chunks shared
+                between questions are sent once
+            
+        Returns:
+            One result per question, in order, shaped like answer_question's
+        """
+        unique: Dict[str, str] = {}
+        for question in questions:
+            unique.setdefault(normalize_text(question, casefold=True), question)
+        
+        with priority_scope(RequestPriority.INTERACTIVE):
+            reranker = get_reranker()
+            candidates = get_vector_store_service().search_similar_chunks_batch(
+                list(unique.values()),
+                k=self._candidate_count(reranker),
+                section=section
+            )
+            contexts = [
+                reranker.rerank(question, chunks, top_n=settings.RERANK_TOP_N)
+                for question, chunks in zip(unique.values(), candidates)
+            ]
+            if mode == "combined":
+                answers = self._answer_combined(list(unique.values()), contexts)
+            else:
+                answers = self._answer_parallel(list(unique.values()), contexts)
+        
+        results = {key: self._result(answer, chunks) for key, answer, chunks in zip(unique, answers, contexts)}
+        return [results[normalize_text(question, casefold=True)] for question in questions]
+    
+    def _answer_parallel(self, questions: List[str], contexts: List[List[Dict[str, Any]]]) -> List[str]:
+        """Answer each question with its own prompt, several at a time."""
+        return map_in_context(self._generate_answer, questions, contexts, max_workers=settings.QA_BATCH_MAX_CONCURRENCY)
+    
+    def _answer_combined(self, questions: List[str], contexts: List[List[Dict[str, Any]]]) -> List[str]:
+        """Answer all questions in one completion, sending each shared chunk once."""
+        chunks: Dict[str, str] = {}
+        for context in contexts:
+            for chunk in context:
+                chunks.setdefault(chunk["metadata"].get("chunk_id") or chunk["content"], chunk["content"])
+        
+        system_prompt, prompt = self.QA_BATCH_PROMPT.render(
+            context="\n\n".join(chunks.values()),
+            questions="\n".join(f"{index}. {question}" for index, question in enumerate(questions, start=1))
+        )
+        data = self.llm_service.generate_json(
+            prompt=prompt,
+            schema=BatchAnswers,
+            temperature=0,
+            max_tokens=min(4000, 500 * len(questions)),
+            system_prompt=system_prompt,
+            task=LLMTask.QA_ANSWER,
+            prompt_id=self.QA_BATCH_PROMPT.id
+        )
+        answers = {item["index"]: item["answer"] for item in data["answers"]}
+        return [answers.get(index, "") for index in range(1, len(questions) + 1)]
 
-llm_service = LLMService() 
\ No newline at end of file
+@lazy_singleton
+def get_llm_service() -> LLMService:
+    """Shared LLMService, created on first use."""
+    return LLMService()
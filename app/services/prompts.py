@@ -0,0 +1,74 @@
+"""Versioned prompt templates laid out for provider prompt-prefix caching."""
+
+from typing import Dict, Any, Tuple
+from dataclasses import dataclass
+import threading
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    A prompt split into a static prefix and a variable tail.
+
+    The system prompt and instructions never contain request data, so every
+    call with the same template starts with a byte-identical prefix that the
+    provider can cache. Only the body is formatted with request values, and it
+    is always appended last.
+    """
+    name: str
+    version: str
+    system: str
+    instructions: str
+    body: str
+
+    @property
+    def id(self) -> str:
+        """Stable identifier including the version, e.g. "code_lookup@2"."""
+        return f"{self.name}@{self.version}"
+
+    def render(self, **values: Any) -> Tuple[str, str]:
+        """
+        Render the template.
+
+        Returns:
+            Tuple of (system prompt, user prompt)
+        """
+        body = self.body.format(**values)
+        prompt = f"{self.instructions}\n\n{body}" if self.instructions else body
+        return self.system, prompt
+
+_templates: Dict[str, PromptTemplate] = {}
+_usage: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+def register_prompt(template: PromptTemplate) -> PromptTemplate:
+    """Register a template so its version and usage are reported."""
+    with _lock:
+        existing = _templates.get(template.name)
+        if existing is not None and existing != template:
+            raise ValueError(f"Prompt template '{template.name}' is already registered with different content")
+        _templates[template.name] = template
+    return template
+
+def prompt_versions() -> Dict[str, str]:
+    """Version of every registered template, keyed by name."""
+    with _lock:
+        return {name: template.version for name, template in sorted(_templates.items())}
+
+def record_prompt_usage(prompt_id: str, usage: Dict[str, int]) -> None:
+    """Accumulate token usage, including cached prompt tokens, for a template."""
+    with _lock:
+        totals = _usage.setdefault(prompt_id, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += usage.get("prompt_tokens", 0) or 0
+        totals["cached_tokens"] += usage.get("cached_tokens", 0) or 0
+
+def prompt_usage() -> Dict[str, Dict[str, Any]]:
+    """Per-template call counts, prompt tokens and prompt-cache hit rate."""
+    with _lock:
+        return {
+            prompt_id: {
+                **totals,
+                "cache_hit_rate": round(totals["cached_tokens"] / totals["prompt_tokens"], 4) if totals["prompt_tokens"] else 0.0
+            }
+            for prompt_id, totals in sorted(_usage.items())
+        }
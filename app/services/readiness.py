@@ -0,0 +1,162 @@
+from typing import Dict, Any, Callable, Optional
+import logging
+import threading
+import time
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.services.vector_store import get_vector_store_service
+from app.services.llm_service import get_llm_service
+from app.services.extraction_service import get_extraction_service
+from app.services.fhir_service import get_fhir_service
+from app.services.reranker import get_reranker
+from app.services.llm.azure_openai_service import AzureOpenAIService
+from app.services.llm.load_balancer import all_pools
+from app.services.llm.model_router import LLMTask, model_router
+
+logger = logging.getLogger(__name__)
+
+class ReadinessService:
+    """
+    Dependency checks for the readiness probe, and the startup warm-up that
+    must finish before the process reports ready.
+
+    Check results are cached for READINESS_CACHE_SECONDS so frequent probes
+    do not hammer the database, Chroma or Azure.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cached: Optional[Dict[str, Any]] = None
+        self._cached_at = 0.0
+        self._warmup_thread: Optional[threading.Thread] = None
+        self.warmup_state = "pending" if settings.WARMUP_ON_STARTUP else "skipped"
+        self.warmup_error: Optional[str] = None
+
+    @staticmethod
+    def _timed(check: Callable[[], Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run a check, reporting ok, latency and any error or details."""
+        start = time.perf_counter()
+        try:
+            details = check() or {}
+            result = {"ok": True, **details}
+        except Exception as e:
+            result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def check_database(self) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(text("SELECT 1"))
+        finally:
+            db.close()
+
+    def check_vector_store(self) -> Dict[str, Any]:
+        return {"chunks": get_vector_store_service().vector_store._collection.count()}
+
+    def check_llm(self) -> Dict[str, Any]:
+        # Building the services creates the default completion and embedding pools
+        get_llm_service()
+        get_vector_store_service()
+        failures = {}
+        for pool in all_pools():
+            failures.update({name: error for name, error in pool.probe().items() if error})
+        if failures:
+            raise RuntimeError("; ".join(f"{name}: {error}" for name, error in failures.items()))
+        return {"deployments": sum(len(pool.endpoints) for pool in all_pools())}
+
+    def check(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Run all dependency checks, or return the cached result if still fresh.
+
+        Returns:
+            Dict with "ready", the warm-up state and each check's result
+        """
+        if self.warmup_state == "failed":
+            # Dependencies may be back; try again rather than staying unready forever
+            self.start_warm_up()
+
+        with self._lock:
+            if not force and self._cached is not None and time.monotonic() - self._cached_at < settings.READINESS_CACHE_SECONDS:
+                return self._cached
+
+            checks = {
+                "database": self._timed(self.check_database),
+                "vector_store": self._timed(self.check_vector_store),
+            }
+            if settings.READINESS_CHECK_LLM:
+                checks["llm"] = self._timed(self.check_llm)
+
+            warmed_up = self.warmup_state in ("completed", "skipped")
+            self._cached = {
+                "ready": warmed_up and all(result["ok"] for result in checks.values()),
+                "warmup": {"state": self.warmup_state, "error": self.warmup_error},
+                "checks": checks,
+            }
+            self._cached_at = time.monotonic()
+            return self._cached
+
+    def warm_up(self) -> None:
+        """
+        Prime everything the first requests would otherwise pay for.
+
+        Opens a pooled database connection, loads Chroma and its index (and
+        the quantized index, if enabled) into memory, builds every service
+        and deployment pool (including models routed per task), opens a
+        connection to each deployment and runs the text splitter once.
+        """
+        self.warmup_state = "running"
+        self.warmup_error = None
+        start = time.perf_counter()
+        try:
+            self.check_database()
+
+            vector_store = get_vector_store_service()
+            collection = vector_store.vector_store._collection
+            embeddings = collection.peek(limit=1).get("embeddings")
+            if embeddings is not None and len(embeddings) > 0:
+                # A query forces the HNSW index to be loaded from disk
+                collection.query(query_embeddings=[embeddings[0]], n_results=1)
+            if vector_store.quantized_index is not None:
+                # Loading runs in the index's own thread; ready once it is searchable
+                vector_store.quantized_index.wait_until_ready()
+            vector_store.text_splitter.split_text("Warm-up.")
+
+            get_llm_service()
+            get_extraction_service()
+            get_fhir_service()
+            # Loads the cross-encoder model when one is configured
+            get_reranker()
+            for task in LLMTask:
+                for model in model_router.cascade_for(task):
+                    AzureOpenAIService._pool_for(model)
+            for pool in all_pools():
+                for name, error in pool.probe().items():
+                    if error:
+                        logger.warning("Warm-up could not reach deployment %s: %s", name, error)
+
+            self.warmup_state = "completed"
+            logger.info("Warm-up completed in %.2fs", time.perf_counter() - start)
+        except Exception as e:
+            self.warmup_state = "failed"
+            self.warmup_error = f"{type(e).__name__}: {e}"
+            logger.exception("Warm-up failed")
+        finally:
+            with self._lock:
+                # The next probe must reflect the new warm-up state
+                self._cached = None
+
+    def start_warm_up(self) -> None:
+        """Run the warm-up in the background so liveness probes answer meanwhile."""
+        if not settings.WARMUP_ON_STARTUP:
+            return
+        if self._warmup_thread is not None and self._warmup_thread.is_alive():
+            return
+        self.warmup_state = "running"
+        self._warmup_thread = threading.Thread(target=self.warm_up, name="warm-up", daemon=True)
+        self._warmup_thread.start()
+
+# Create singleton instance
+readiness_service = ReadinessService()
@@ -0,0 +1,170 @@
+"""Reconciliation of the documents table with the chunks in the vector index."""
+
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+import logging
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import llm_caller, record_reconcile
+from app.core.tracing import span
+from app.db.models import Document
+from app.db.models.document import hash_content
+from app.schemas import ReconcileReport
+from app.services.vector_store import VectorStoreService, document_metadata
+
+logger = logging.getLogger(__name__)
+
+# One run at a time per process; runs re-embed documents and delete chunks
+_run_lock = threading.Lock()
+
+# Orphan documents whose chunks are deleted per request
+ORPHAN_BATCH = 100
+
+class ReconcileInProgressError(RuntimeError):
+    """Another reconciliation run is already in progress in this process."""
+
+def _scan_index(vector_store: VectorStoreService) -> Dict[str, Dict[str, Any]]:
+    """Per document ID: chunk count, the content hashes and total_chunks values seen on its chunks."""
+    index: Dict[str, Dict[str, Any]] = {}
+    for metadata in vector_store.iter_chunk_metadata():
+        entry = index.setdefault(str(metadata.get("document_id")), {"chunks": 0, "hashes": set(), "totals": set()})
+        entry["chunks"] += 1
+        entry["hashes"].add(metadata.get("content_hash"))
+        entry["totals"].add(metadata.get("total_chunks"))
+    return index
+
+def reconcile(
+    db: Session,
+    vector_store: VectorStoreService,
+    dry_run: bool = True,
+    max_reindex: Optional[int] = None
+) -> ReconcileReport:
+    """
+    Compare documents with their chunks and repair the differences.
+
+    A document is missing when it has content but no chunks, and stale when
+    its chunks carry another content hash, mix hashes, or do not add up to
+    their total_chunks (an ingest that died part-way). Chunks whose document
+    no longer exists are orphans. Chunks stored before content hashes were
+    recorded cannot be checked against the content and are only counted as
+    unverified; re-run generate_embeddings.py to hash them.
+
+    Documents created or updated within RECONCILE_GRACE_SECONDS are left
+    alone, since their chunks may still be being written by the request
+    that changed them, in this process or another. They are checked again
+    just before being re-indexed.
+
+    Only IDs and hashes are read in bulk. Missing and stale documents are
+    re-embedded one at a time, at most max_reindex per run, and orphans
+    are deleted in batches.
+
+    Args:
+        db: Database session
+        vector_store: Vector store to check
+        dry_run: Report only, without repairing
+        max_reindex: Documents to re-embed at most (default: RECONCILE_MAX_REINDEX)
+
+    Returns:
+        What was found and repaired
+
+    Raises:
+        ReconcileInProgressError: If a run is already in progress
+    """
+    if not _run_lock.acquire(blocking=False):
+        raise ReconcileInProgressError("A reconciliation run is already in progress")
+    try:
+        with llm_caller("reconcile"), span("reconcile", dry_run=dry_run):
+            if max_reindex is None:
+                max_reindex = settings.RECONCILE_MAX_REINDEX
+            report = _reconcile(db, vector_store, dry_run, max_reindex)
+    finally:
+        _run_lock.release()
+
+    record_reconcile(report)
+    logger.info(
+        "Reconciliation%s: %d documents, %d missing, %d stale, %d unverified, %d orphan chunks; "
+        "%d recent, %d re-indexed, %d deferred, %d chunks deleted, %d failed in %.1fs",
+        " (dry run)" if dry_run else "", report.documents, len(report.missing), len(report.stale),
+        report.unverified, report.orphan_chunks, report.recent, len(report.reindexed), report.deferred,
+        report.deleted_chunks, len(report.failed), report.duration_seconds
+    )
+    return report
+
+def _reconcile(db: Session, vector_store: VectorStoreService, dry_run: bool, max_reindex: int) -> ReconcileReport:
+    start = time.perf_counter()
+    # The index is read first: rows are committed before their chunks are stored, so any
+    # document indexed during the scan is in the table by the time it is read
+    index = _scan_index(vector_store)
+    # Only IDs, hashes and write times; content is loaded for documents being re-indexed
+    rows = db.query(Document.id, Document.content_hash, Document.updated_at).all()
+    empty_hash = hash_content("")
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.RECONCILE_GRACE_SECONDS)
+
+    missing, stale = [], []
+    unverified = recent = 0
+    for document_id, content_hash, updated_at in rows:
+        if content_hash in (None, empty_hash):
+            # Nothing to index yet
+            continue
+        if updated_at is not None and updated_at > cutoff:
+            recent += 1
+            continue
+        entry = index.get(str(document_id))
+        if entry is None:
+            missing.append(document_id)
+            continue
+        complete = entry["totals"] == {entry["chunks"]}
+        if entry["hashes"] == {None}:
+            if complete:
+                unverified += 1
+            else:
+                stale.append(document_id)
+        elif entry["hashes"] != {content_hash} or not complete:
+            stale.append(document_id)
+
+    known = {str(document_id) for document_id, _, _ in rows}
+    orphans = sorted(document_id for document_id in index if document_id not in known)
+    report = ReconcileReport(
+        dry_run=dry_run,
+        documents=len(rows),
+        indexed_documents=len(index) - len(orphans),
+        chunks=sum(entry["chunks"] for entry in index.values()),
+        missing=missing,
+        stale=stale,
+        unverified=unverified,
+        recent=recent,
+        orphan_documents=orphans,
+        orphan_chunks=sum(index[document_id]["chunks"] for document_id in orphans),
+        duration_seconds=0.0
+    )
+
+    if not dry_run:
+        for batch_start in range(0, len(orphans), ORPHAN_BATCH):
+            report.deleted_chunks += vector_store.delete_documents(orphans[batch_start:batch_start + ORPHAN_BATCH])
+
+        to_reindex = missing + stale
+        report.deferred = max(0, len(to_reindex) - max_reindex)
+        for document_id in to_reindex[:max_reindex]:
+            document = db.query(Document).filter(Document.id == document_id).first()
+            if document is None:
+                continue  # Deleted since the scan
+            if document.updated_at is not None and document.updated_at > cutoff:
+                # Written since the scan
+                report.recent += 1
+                db.expunge(document)
+                continue
+            try:
+                vector_store.reindex_document(str(document_id), document.content, document_metadata(document))
+                report.reindexed.append(document_id)
+            except Exception as e:
+                logger.exception("Failed to re-index document %s", document_id)
+                report.failed[str(document_id)] = str(e)
+            # Only one document's content is held at a time
+            db.expunge(document)
+
+    report.duration_seconds = round(time.perf_counter() - start, 3)
+    return report
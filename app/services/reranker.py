@@ -0,0 +1,157 @@
+"""Re-ranking of retrieved chunks before they are sent to the LLM."""
+
+from typing import Any, Dict, List
+from collections import Counter
+import logging
+import math
+import re
+
+from app.core.config import settings
+from app.core.tracing import span
+from app.utils.lazy import lazy_singleton
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by did do does for from had has have he her his how i if in into is it its
+me my no not of on or our she so than that the their them then there these they this to was we were what
+when where which who why will with you your patient patients
+""".split())
+
+# Terms that carry most of the meaning in SOAP notes: drug classes by suffix, units,
+# vitals and lab abbreviations, and ICD-10 style codes
+CLINICAL_SUFFIXES = (
+    "pril", "sartan", "olol", "dipine", "statin", "formin", "gliptin", "gliflozin", "prazole", "tidine",
+    "cillin", "mycin", "cycline", "floxacin", "azole", "vir", "mab", "nib", "sone", "olone",
+    "itis", "emia", "osis", "algia", "ectomy", "otomy", "plasty", "scopy", "pathy", "oma"
+)
+CLINICAL_TERMS = frozenset("""
+bp hr rr spo2 o2 temp bmi hba1c a1c ldl hdl tsh inr egfr bun cbc bmp cmp ecg ekg mri ct xray cxr
+mg mcg ml units mmhg bpm prn bid tid qid qd qhs po iv im sc sl
+""".split())
+_ICD_CODE = re.compile(r"^[a-z][0-9]{2}(?:\.[0-9a-z]+)?$")
+
+CLINICAL_WEIGHT = 2.0
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word and number tokens without stopwords."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+def is_clinical_term(token: str) -> bool:
+    """Whether a token looks like a drug, condition, measurement or code."""
+    return token in CLINICAL_TERMS or token.endswith(CLINICAL_SUFFIXES) or bool(_ICD_CODE.match(token))
+
+def _normalize(values: List[float]) -> List[float]:
+    """Min-max scale to 0-1; all equal values map to 1."""
+    low, high = min(values), max(values)
+    if high - low < 1e-12:
+        return [1.0] * len(values)
+    return [(value - low) / (high - low) for value in values]
+
+class Reranker:
+    """Base re-ranker: keeps the vector search order."""
+
+    name = "none"
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        """Relevance of each text to the query; higher is better."""
+        return [0.0] * len(texts)
+
+    def rerank(self, query: str, chunks: List[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+        """
+        Re-score retrieved chunks and keep the best.
+
+        The re-ranker's score is blended with the vector similarity
+        (RERANK_VECTOR_WEIGHT), both scaled to 0-1 over the candidates, so a
+        chunk with no term overlap can still win on meaning.
+
+        Args:
+            query: The user's question
+            chunks: Candidates from search_similar_chunks, "score" being a distance
+            top_n: Number of chunks to return
+
+        Returns:
+            The best top_n chunks, each with an added "rerank_score"
+        """
+        if len(chunks) <= 1 or self.name == "none":
+            return chunks[:top_n]
+
+        with span("rerank", reranker=self.name, candidates=len(chunks), top_n=top_n):
+            model_scores = _normalize(self.score(query, [chunk["content"] for chunk in chunks]))
+            # Distances: smaller is closer, so invert after scaling
+            vector_scores = [1.0 - value for value in _normalize([chunk["score"] for chunk in chunks])]
+            weight = settings.RERANK_VECTOR_WEIGHT
+            scored = [
+                {**chunk, "rerank_score": round((1 - weight) * model + weight * vector, 4)}
+                for chunk, model, vector in zip(chunks, model_scores, vector_scores)
+            ]
+        scored.sort(key=lambda chunk: chunk["rerank_score"], reverse=True)
+        return scored[:top_n]
+
+class LexicalReranker(Reranker):
+    """
+    BM25-style term overlap with extra weight for clinical terms.
+
+    Inverse document frequency is computed over the candidate set, so terms
+    shared by every candidate count little. Runs in microseconds per chunk
+    with no model to load.
+    """
+
+    name = "lexical"
+    K1 = 1.2
+    B = 0.75
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return [0.0] * len(texts)
+
+        documents = [Counter(tokenize(text)) for text in texts]
+        average_length = sum(sum(document.values()) for document in documents) / len(documents) or 1.0
+        document_frequency = {term: sum(1 for document in documents if term in document) for term in query_terms}
+
+        scores = []
+        for document in documents:
+            length = sum(document.values())
+            score = 0.0
+            for term in query_terms:
+                frequency = document.get(term, 0)
+                if not frequency:
+                    continue
+                idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                saturation = frequency * (self.K1 + 1) / (frequency + self.K1 * (1 - self.B + self.B * length / average_length))
+                score += idf * saturation * (CLINICAL_WEIGHT if is_clinical_term(term) else 1.0)
+            scores.append(score)
+        return scores
+
+class CrossEncoderReranker(Reranker):
+    """Local cross-encoder (sentence-transformers), e.g. a small MS MARCO MiniLM model."""
+
+    name = "cross_encoder"
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError("RERANKER=cross_encoder requires the sentence-transformers package") from e
+        self.model = CrossEncoder(model_name)
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        return [float(score) for score in self.model.predict([(query, text) for text in texts])]
+
+RERANKERS = {
+    "none": lambda: Reranker(),
+    "lexical": lambda: LexicalReranker(),
+    "cross_encoder": lambda: CrossEncoderReranker(settings.RERANK_MODEL),
+}
+
+@lazy_singleton
+def get_reranker() -> Reranker:
+    """Re-ranker selected by RERANKER, created on first use."""
+    if settings.RERANKER not in RERANKERS:
+        raise ValueError(f"Unknown RERANKER {settings.RERANKER!r}; expected one of {sorted(RERANKERS)}")
+    reranker = RERANKERS[settings.RERANKER]()
+    logger.info("Using %s re-ranker", reranker.name)
+    return reranker
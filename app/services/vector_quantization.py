@@ -0,0 +1,269 @@
+"""Quantized in-memory index over the Chroma collection, with float re-ranking."""
+
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_METHODS = ("none", "int8", "binary")
+
+# Rows scored per block, so int8 search never materializes the whole index as floats
+_SEARCH_BLOCK = 8192
+_LOAD_PAGE = 1000
+_ID_PAGE = 20000
+
+# Refreshes re-read this much of the previous window, so clock skew between writers cannot hide a write
+REFRESH_OVERLAP_SECONDS = 30.0
+
+# Set bits in every byte value, for Hamming distance over packed binary codes
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 quantization; returns (codes, scales)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """One sign bit per dimension, packed eight to a byte."""
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+class QuantizedIndex:
+    """
+    Compact copy of the collection's embeddings for first-stage search.
+
+    A search scans the codes for the best `candidates` ids, which the
+    caller re-ranks exactly against the float vectors stored in Chroma.
+    This is a speed optimization, not a memory one: Chroma still holds the
+    float32 vectors, and the codes add a quarter (int8) or a thirty-second
+    (binary) of their size on top. Shrink vectors with
+    AZURE_OPENAI_EMBEDDING_DIMENSIONS to reduce memory.
+
+    The index is loaded and kept fresh by a background thread, never on the
+    query path; until the first load finishes `ready` is False and callers
+    search Chroma directly. This process's writes are applied as they
+    happen. Writes by other processes are picked up every
+    `refresh_seconds` by fetching only the chunks whose embedded_at
+    metadata is newer than the last refresh (so re-embeds are seen even
+    when the count is unchanged), and deletions by comparing ids.
+    """
+
+    def __init__(self, collection, method: str, refresh_seconds: float = 60.0):
+        if method not in ("int8", "binary"):
+            raise ValueError(f"Unknown quantization {method!r}; expected one of {QUANTIZATION_METHODS}")
+        self.collection = collection
+        self.method = method
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._dimensions: Optional[int] = None
+        self._loaded = threading.Event()
+        self._watermark = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the first load has finished and the index can be searched."""
+        return self._loaded.is_set()
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.method == "int8":
+            return quantize_int8(vectors)
+        return quantize_binary(vectors), None
+
+    def start(self) -> None:
+        """Load the index and keep refreshing it in a background thread; idempotent."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="quantized-index", daemon=True)
+        self._thread.start()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the first load has finished; returns whether it did within the timeout."""
+        return self._loaded.wait(timeout)
+
+    def _run(self) -> None:
+        while not self.ready:
+            try:
+                self.load()
+            except Exception:
+                logger.exception("Loading the quantized index failed; retrying")
+                time.sleep(min(self.refresh_seconds, 30))
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Refreshing the quantized index failed")
+
+    def load(self) -> None:
+        """(Re)build the index from every embedding in the collection."""
+        start = time.perf_counter()
+        # Writes that land during the load are picked up by the next refresh
+        watermark = time.time()
+        ids: List[str] = []
+        codes: List[np.ndarray] = []
+        scales: List[np.ndarray] = []
+        dimensions = None
+        offset = 0
+        while True:
+            page = self.collection.get(include=["embeddings"], limit=_LOAD_PAGE, offset=offset)
+            if not page["ids"]:
+                break
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            dimensions = vectors.shape[1]
+            page_codes, page_scales = self._quantize(vectors)
+            ids.extend(page["ids"])
+            codes.append(page_codes)
+            if page_scales is not None:
+                scales.append(page_scales)
+            offset += len(page["ids"])
+
+        with self._lock:
+            self._ids = ids
+            self._codes = np.concatenate(codes) if codes else None
+            self._scales = np.concatenate(scales) if scales else None
+            self._dimensions = dimensions
+            self._watermark = watermark
+        self._loaded.set()
+        logger.info(
+            "Loaded %s quantized index: %d vectors, %d bytes in %.2fs",
+            self.method, len(ids), self.nbytes(), time.perf_counter() - start
+        )
+
+    def refresh(self) -> None:
+        """Apply other processes' writes since the last load or refresh, by id."""
+        from app.services.vector_store import EMBEDDED_AT_KEY
+
+        watermark = time.time()
+        since = self._watermark - REFRESH_OVERLAP_SECONDS
+        changed = 0
+        offset = 0
+        while True:
+            page = self.collection.get(
+                where={EMBEDDED_AT_KEY: {"$gte": since}},
+                include=["embeddings"],
+                limit=_LOAD_PAGE,
+                offset=offset
+            )
+            if not page["ids"]:
+                break
+            self.add(page["ids"], page["embeddings"])
+            changed += len(page["ids"])
+            offset += len(page["ids"])
+
+        with self._lock:
+            indexed = set(self._ids)
+        if self.collection.count() != len(indexed):
+            # Deletions leave no trace to query for, so compare ids (without vectors)
+            stored = set()
+            offset = 0
+            while True:
+                page = self.collection.get(include=[], limit=_ID_PAGE, offset=offset)
+                if not page["ids"]:
+                    break
+                stored.update(page["ids"])
+                offset += len(page["ids"])
+            self.remove(list(indexed - stored))
+            unseen = list(stored - indexed)
+            for start in range(0, len(unseen), _LOAD_PAGE):
+                # Written without a timestamp, e.g. by an older version
+                page = self.collection.get(ids=unseen[start:start + _LOAD_PAGE], include=["embeddings"])
+                self.add(page["ids"], page["embeddings"])
+            changed += len(indexed - stored) + len(unseen)
+        self._watermark = watermark
+        if changed:
+            logger.info("Refreshed %s quantized index: %d vectors changed", self.method, changed)
+
+    def add(self, ids: List[str], embeddings: List[List[float]]) -> None:
+        """Index vectors just written to the collection, replacing any with the same id."""
+        if not ids or not self.ready:
+            # Not loaded yet: the load or the refresh after it picks them up
+            return
+        self.remove(ids)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        codes, scales = self._quantize(vectors)
+        with self._lock:
+            self._ids = self._ids + list(ids)
+            self._codes = codes if self._codes is None else np.concatenate([self._codes, codes])
+            if scales is not None:
+                self._scales = scales if self._scales is None else np.concatenate([self._scales, scales])
+            self._dimensions = vectors.shape[1]
+
+    def remove(self, ids: List[str]) -> None:
+        """Drop vectors deleted from the collection."""
+        doomed = set(ids)
+        with self._lock:
+            if self._codes is None or not doomed.intersection(self._ids):
+                return
+            keep = np.array([chunk_id not in doomed for chunk_id in self._ids], dtype=bool)
+            self._ids = [chunk_id for chunk_id, kept in zip(self._ids, keep) if kept]
+            self._codes = self._codes[keep]
+            if self._scales is not None:
+                self._scales = self._scales[keep]
+
+    def search(self, query: List[float], candidates: int) -> List[str]:
+        """
+        Ids of the approximate nearest vectors to the query, from the codes in memory.
+
+        Args:
+            query: Float query embedding
+            candidates: How many ids to return for exact re-ranking
+
+        Returns:
+            Candidate ids, best first
+        """
+        with self._lock:
+            ids, codes, scales, dimensions = self._ids, self._codes, self._scales, self._dimensions
+        if codes is None or not ids:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        if query.shape[0] != dimensions:
+            raise ValueError(
+                f"Query has {query.shape[0]} dimensions but the collection stores {dimensions}; "
+                "check AZURE_OPENAI_EMBEDDING_DIMENSIONS or migrate the collection"
+            )
+
+        if self.method == "int8":
+            # Asymmetric scoring: float query against int8 codes, higher is closer
+            scores = np.empty(len(ids), dtype=np.float32)
+            for start in range(0, len(ids), _SEARCH_BLOCK):
+                block = codes[start:start + _SEARCH_BLOCK].astype(np.float32)
+                scores[start:start + _SEARCH_BLOCK] = (block @ query) * scales[start:start + _SEARCH_BLOCK]
+            order_key = -scores
+        else:
+            query_code = quantize_binary(query[None, :])[0]
+            order_key = _POPCOUNT[np.bitwise_xor(codes, query_code)].sum(axis=1, dtype=np.int32)
+
+        n = min(candidates, len(ids))
+        top = np.argpartition(order_key, n - 1)[:n]
+        top = top[np.argsort(order_key[top], kind="stable")]
+        return [ids[i] for i in top]
+
+    def nbytes(self) -> int:
+        """Memory held by the codes and scales."""
+        total = self._codes.nbytes if self._codes is not None else 0
+        return total + (self._scales.nbytes if self._scales is not None else 0)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Size of the index and of the float vectors it stands in for."""
+        with self._lock:
+            count = len(self._ids)
+            dimensions = self._dimensions or 0
+        return {
+            "method": self.method,
+            "vectors": count,
+            "dimensions": dimensions,
+            "bytes": self.nbytes(),
+            "float32_bytes": count * dimensions * 4,
+        }
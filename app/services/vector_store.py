@@ -1,9 +1,59 @@
-from typing import List, Dict, Any
-import chromadb
-from chromadb.config import Settings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+from collections import OrderedDict
+import itertools
+import threading
+import time
+from app.core.config import settings
+from app.utils.lazy import lazy_singleton
 from app.services.llm.azure_openai_service import AzureOpenAIEmbeddingService
+from app.core.metrics import llm_caller
+from app.core.tracing import span, traced, set_attributes
+from app.services.chunking import build_text_splitter, chunk_span, iter_text_blocks, split_with_sections, section_metadata
+from app.db.base import SessionLocal
+from app.db.models import Document
+
+# Chunk ids per delete request, below Chroma's maximum batch size
+DELETE_BATCH = 5000
+
+# Chunk metadata recording when its embedding was written, so other processes' quantized indexes
+# can pick up new and re-embedded chunks incrementally
+EMBEDDED_AT_KEY = "embedded_at"
+
+class ContentCache:
+    """
+    Decompressed document content for hydrating chunks, least recently used first out.
+
+    Entries are keyed by (document ID, content hash), so an updated document
+    is read afresh instead of being served from its old content.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[int, str], str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[int, str]) -> Optional[str]:
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+            return content
+
+    def put(self, key: Tuple[int, str], content: str) -> None:
+        # Characters stand in for bytes; close enough for a memory bound
+        size = len(content)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = content
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
 
 class CustomEmbeddings:
     """Wrapper class to make Azure OpenAI embedding service compatible with LangChain's interface."""
@@ -12,92 +62,405 @@ class CustomEmbeddings:
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of documents."""
-        result = self.embedding_service.generate_embeddings(texts=texts)
+        with span("embeddings.embed_documents", texts=len(texts)):
+            result = self.embedding_service.generate_embeddings(texts=texts)
         return result["embeddings"]
 
+    @traced("embeddings.embed_query")
     def embed_query(self, text: str) -> List[float]:
         """Embed a query."""
         result = self.embedding_service.generate_embeddings(texts=[text])
         return result["embeddings"][0]
 
+def chroma_client():
+    """
+    Chroma client for the configured CHROMA_MODE.
+
+    "persistent" keeps the index in-process under CHROMA_DB_PATH, which
+    only one process may write to. "http" talks to a shared Chroma server
+    so any number of workers can read and write the same collection.
+    """
+    import chromadb
+
+    if settings.CHROMA_MODE == "http":
+        return chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT, ssl=settings.CHROMA_SSL)
+    if settings.CHROMA_MODE != "persistent":
+        raise ValueError(f"Unknown CHROMA_MODE {settings.CHROMA_MODE!r}; expected 'persistent' or 'http'")
+    return chromadb.PersistentClient(path=settings.CHROMA_DB_PATH)
+
 class VectorStoreService:
     def __init__(self):
+        # Imported here so that importing the app does not load chromadb and langchain
+        from langchain_chroma import Chroma
+
         embedding_service = AzureOpenAIEmbeddingService()
         self.embeddings = CustomEmbeddings(embedding_service)
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
+        self.text_splitter = build_text_splitter()
         self.vector_store = Chroma(
-            collection_name="documents",
+            collection_name=settings.CHROMA_COLLECTION,
             embedding_function=self.embeddings,
-            persist_directory="./chroma_db"
+            client=chroma_client()
         )
-
-    def delete_document(self, document_id: str) -> None:
-        """Delete all chunks belonging to a document from the vector store."""
-        # Get all chunks for this document
-        results = self.vector_store.similarity_search_with_score(
-            "dummy query",  # The query doesn't matter as we'll filter by metadata
-            k=1000,  # Set high to get all chunks
-            filter={"document_id": document_id}
-        )
-        
-        # Extract the ids of chunks to delete
-        chunk_ids = [
-            str(result[0].metadata.get("chunk_id"))
-            for result in results
-            if result[0].metadata.get("chunk_id") is not None
-        ]
-        
-        if chunk_ids:
-            # Delete the chunks
-            self.vector_store._collection.delete(
-                ids=chunk_ids
+        self.content_cache = ContentCache(settings.HYDRATE_CACHE_MB * 1024 * 1024)
+        self.quantized_index = None
+        if settings.VECTOR_QUANTIZATION != "none":
+            from app.services.vector_quantization import QuantizedIndex
+            self.quantized_index = QuantizedIndex(
+                self.vector_store._collection,
+                settings.VECTOR_QUANTIZATION,
+                refresh_seconds=settings.VECTOR_QUANTIZED_REFRESH_SECONDS
             )
+            # Loaded in the background; searches use Chroma until it is ready
+            self.quantized_index.start()
 
-    def process_document(self, document_id: str, content: str, metadata: Dict[str, Any] = None) -> None:
-        """Process a document by splitting it into chunks and storing embeddings."""
-        # Split document into chunks
-        chunks = self.text_splitter.split_text(content)
-        
-        # Prepare metadata for each chunk
-        chunk_metadata = []
-        chunk_ids = []
-        for i in range(len(chunks)):
-            chunk_meta = metadata.copy() if metadata else {}
-            chunk_id = f"{document_id}-chunk-{i}"
-            chunk_meta.update({
-                "document_id": document_id,
-                "chunk_index": i,
-                "total_chunks": len(chunks),
-                "chunk_id": chunk_id
-            })
-            chunk_metadata.append(chunk_meta)
-            chunk_ids.append(chunk_id)
-
-        # Add chunks to vector store
-        self.vector_store.add_texts(
-            texts=chunks,
-            metadatas=chunk_metadata,
-            ids=chunk_ids
-        )
+    def _use_quantized(self, section: Optional[str]) -> bool:
+        """Whether a search can shortlist from the quantized index."""
+        # The quantized index holds no metadata, so filtered searches go to Chroma
+        return self.quantized_index is not None and section is None and self.quantized_index.ready
+
+    def delete_document(self, document_id: str) -> int:
+        """Delete all chunks belonging to a document from the vector store; returns how many."""
+        return self._delete_where({"document_id": document_id})
+
+    def delete_documents(self, document_ids: List[str]) -> int:
+        """Delete all chunks of several documents; returns how many."""
+        if not document_ids:
+            return 0
+        return self._delete_where({"document_id": {"$in": list(document_ids)}})
+
+    def _delete_where(self, where: Dict[str, Any]) -> int:
+        """Delete chunks matching a metadata filter, keeping any quantized index in step."""
+        collection = self.vector_store._collection
+        # Looked up by metadata, without embedding a query or capping the number of chunks
+        chunk_ids = collection.get(where=where, include=[])["ids"]
+        for start in range(0, len(chunk_ids), DELETE_BATCH):
+            collection.delete(ids=chunk_ids[start:start + DELETE_BATCH])
+        if chunk_ids and self.quantized_index is not None:
+            self.quantized_index.remove(chunk_ids)
+        return len(chunk_ids)
+
+    def reindex_document(self, document_id: str, content: str, metadata: Dict[str, Any] = None) -> int:
+        """
+        Replace a document's chunks with those of new content.
+
+        Chunks are overwritten in place (their ids are sequential) and only
+        then are any left over from longer old content deleted, so the
+        document stays searchable throughout.
+
+        Returns:
+            Number of chunks stored
+        """
+        count = self.process_document(document_id, content, metadata)
+        self._delete_where({"$and": [{"document_id": document_id}, {"chunk_index": {"$gte": count}}]})
+        return count
+
+    def update_document_metadata(self, document_id: str, chunk_count: int, metadata: Dict[str, Any]) -> None:
+        """Merge metadata into each of a document's chunk_count chunks."""
+        window = max(1, settings.INGEST_EMBED_BATCH)
+        # Chunk ids are sequential, so they are rebuilt rather than kept; Chroma merges
+        # updated metadata into the stored metadata
+        for start in range(0, chunk_count, window):
+            ids = [f"{document_id}-chunk-{i}" for i in range(start, min(start + window, chunk_count))]
+            self.vector_store._collection.update(ids=ids, metadatas=[dict(metadata) for _ in ids])
+
+    def iter_chunk_metadata(self, batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        """Metadata of every stored chunk, read a page at a time."""
+        collection = self.vector_store._collection
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield from page["metadatas"]
+            offset += len(page["ids"])
+
+    def process_document(self, document_id: str, content: str, metadata: Dict[str, Any] = None) -> int:
+        """
+        Process a document by splitting it into chunks and storing embeddings.
+
+        Long content is chunked block by block (INGEST_BLOCK_CHARS), so the
+        chunks and vectors held at once do not grow with the document. With
+        CHUNK_STORAGE=reference, document_id must be the id of the documents
+        row holding this content, which chunk text is read back from.
+
+        Returns:
+            Number of chunks stored
+        """
+        blocks = ((None, block) for block in iter_text_blocks(content, settings.INGEST_BLOCK_CHARS))
+        return self.process_document_pages(document_id, blocks, metadata)
+
+    def iter_chunks(
+        self,
+        document_id: str,
+        pages: Iterable[Tuple[Optional[int], str]],
+        metadata: Dict[str, Any] = None,
+        page_separator: str = ""
+    ) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Chunks of a document as (chunk_id, text, metadata), split one page at a time.
 
-    def search_similar_chunks(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
-        """Search for similar chunks based on the query."""
-        results = self.vector_store.similarity_search_with_score(
-            query,
-            k=k
+        Metadata includes the chunk's "start" and "end" offsets in the
+        document content, the pages joined by page_separator, when the chunk
+        can be located in its page.
+
+        Args:
+            document_id: ID of the document the pages belong to
+            pages: (page number or None, text) pairs in document order
+            metadata: Metadata added to every chunk
+            page_separator: What the pages are joined with in the stored content
+
+        Returns:
+            Lazy iterator; total_chunks is not set since the count is only known at the end
+        """
+        index = 0
+        offset = 0
+        for page_number, text in pages:
+            cursor = 0
+            # Split document into chunks, keeping note sections together where possible
+            for sections, chunk in split_with_sections(self.text_splitter, text):
+                chunk_id = f"{document_id}-chunk-{index}"
+                chunk_meta = metadata.copy() if metadata else {}
+                chunk_meta.update({
+                    "document_id": document_id,
+                    "chunk_index": index,
+                    "chunk_id": chunk_id,
+                    **section_metadata(sections)
+                })
+                if page_number is not None:
+                    chunk_meta["page"] = page_number
+                span_in_page = chunk_span(text, chunk, cursor)
+                if span_in_page is not None:
+                    chunk_meta.update({"start": offset + span_in_page[0], "end": offset + span_in_page[1]})
+                    cursor = span_in_page[0] + 1
+                yield chunk_id, chunk, chunk_meta
+                index += 1
+            offset += len(text) + len(page_separator)
+
+    def _add_chunks(self, chunks: List[str], chunk_metadata: List[Dict[str, Any]], chunk_ids: List[str]) -> None:
+        """
+        Embed and store chunks, keeping any quantized index in step.
+
+        With CHUNK_STORAGE=reference, chunks with offsets are stored with
+        empty text and read back from the document's content on retrieval.
+        """
+        if not chunk_ids:
+            return
+        embeddings = self.embeddings.embed_documents(chunks)
+        by_reference = settings.CHUNK_STORAGE == "reference"
+        embedded_at = time.time()
+        self.vector_store._collection.upsert(
+            ids=chunk_ids,
+            embeddings=embeddings,
+            metadatas=[{**chunk_meta, EMBEDDED_AT_KEY: embedded_at} for chunk_meta in chunk_metadata],
+            documents=[
+                "" if by_reference and "start" in chunk_meta else chunk
+                for chunk, chunk_meta in zip(chunks, chunk_metadata)
+            ]
         )
+        if self.quantized_index is not None:
+            self.quantized_index.add(chunk_ids, embeddings)
+
+    def _hydrate(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Fill in the text of chunks stored by reference from their documents' content.
+
+        Only the content hashes are read on every search; content comes from
+        the cache and is loaded and decompressed for misses only. Chunks
+        whose content hash no longer matches their document's (a re-index in
+        progress) are dropped rather than sliced out of the new content.
+        """
+        pending = [chunk for chunk in chunks if not chunk["content"] and "start" in chunk["metadata"]]
+        if not pending:
+            return chunks
+        document_ids = {
+            int(chunk["metadata"]["document_id"])
+            for chunk in pending
+            if str(chunk["metadata"].get("document_id", "")).isdigit()
+        }
+        with span("vector_store.hydrate", documents=len(document_ids)) as current:
+            db = SessionLocal()
+            try:
+                hashes = dict(
+                    db.query(Document.id, Document.content_hash).filter(Document.id.in_(document_ids)).all()
+                )
+                contents = {}
+                for document_id, content_hash in hashes.items():
+                    content = self.content_cache.get((document_id, content_hash))
+                    if content is not None:
+                        contents[document_id] = content
+                misses = [document_id for document_id in hashes if document_id not in contents]
+                if misses:
+                    rows = db.query(Document.id, Document.content_hash, Document.content).filter(
+                        Document.id.in_(misses)
+                    ).all()
+                    for document_id, content_hash, content in rows:
+                        # Keyed by the hash read with the content, in case it changed since
+                        hashes[document_id] = content_hash
+                        contents[document_id] = content
+                        if content:
+                            self.content_cache.put((document_id, content_hash), content)
+                set_attributes(current, cache_misses=len(misses))
+            finally:
+                db.close()
+
+        stale = set()
+        for chunk in pending:
+            metadata = chunk["metadata"]
+            document_id = int(metadata["document_id"]) if str(metadata["document_id"]).isdigit() else None
+            current_hash = hashes.get(document_id)
+            if metadata.get("content_hash") and current_hash and metadata["content_hash"] != current_hash:
+                stale.add(id(chunk))
+                continue
+            content = contents.get(document_id)
+            chunk["content"] = content[metadata["start"]:metadata["end"]] if content else ""
+        return [chunk for chunk in chunks if id(chunk) not in stale]
+
+    def process_document_pages(
+        self,
+        document_id: str,
+        pages: Iterable[Tuple[Optional[int], str]],
+        metadata: Dict[str, Any] = None,
+        page_separator: str = ""
+    ) -> int:
+        """
+        Chunk and embed a document as its pages are produced.
+
+        Chunks are embedded and stored INGEST_EMBED_BATCH at a time, so only
+        one page's text and one window of vectors are held at once. The
+        chunk count is unknown until the last page, so total_chunks is
+        written to the stored chunks at the end.
+
+        Args:
+            document_id: ID of the document the pages belong to
+            pages: (page number or None, text) pairs in document order
+            metadata: Metadata added to every chunk
+            page_separator: What the pages are joined with in the document's stored content
+
+        Returns:
+            Number of chunks stored
+        """
+        window = max(1, settings.INGEST_EMBED_BATCH)
+        with llm_caller("process_document"), span("vector_store.process_document", document_id=document_id) as current:
+            chunks = self.iter_chunks(document_id, pages, metadata, page_separator)
+            count = 0
+            while True:
+                batch = list(itertools.islice(chunks, window))
+                if not batch:
+                    break
+                chunk_ids, texts, chunk_metadata = (list(column) for column in zip(*batch))
+                self._add_chunks(texts, chunk_metadata, chunk_ids)
+                count += len(batch)
+
+            self.update_document_metadata(document_id, count, {"total_chunks": count})
+            set_attributes(current, chunks=count)
+        return count
+
+    def search_similar_chunks(self, query: str, k: int = 3, section: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Search for similar chunks based on the query.
+
+        Args:
+            query: Text to search for
+            k: Number of chunks to return
+            section: Only search chunks containing this SOAP section, e.g. "plan"
+
+        Returns:
+            Chunks with their content, metadata and distance score
+        """
+        with llm_caller("search_similar_chunks"), span("vector_store.search_similar_chunks", k=k, section=section or ""):
+            if self._use_quantized(section):
+                return self._hydrate(self._search_quantized(self.embeddings.embed_query(query), k))
+            results = self.vector_store.similarity_search_with_score(
+                query,
+                k=k,
+                filter={f"section_{section}": True} if section else None
+            )
         
-        return [
+        return self._hydrate([
             {
                 "content": doc.page_content,
                 "metadata": doc.metadata,
                 "score": score
             }
             for doc, score in results
+        ])
+
+    def search_similar_chunks_batch(
+        self,
+        queries: List[str],
+        k: int = 3,
+        section: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several queries with one embedding request and one vector store query.
+
+        Args:
+            queries: Texts to search for
+            k: Number of chunks to return per query
+            section: Only search chunks containing this SOAP section, e.g. "plan"
+
+        Returns:
+            One list of chunks per query, in query order, shaped like search_similar_chunks results
+        """
+        if not queries:
+            return []
+        with llm_caller("search_similar_chunks"), span(
+            "vector_store.search_similar_chunks_batch", queries=len(queries), k=k, section=section or ""
+        ):
+            embeddings = self.embeddings.embed_documents(queries)
+            if self._use_quantized(section):
+                return self._hydrate_batches([self._search_quantized(embedding, k) for embedding in embeddings])
+
+            collection = self.vector_store._collection
+            results = collection.query(
+                query_embeddings=embeddings,
+                n_results=max(1, min(k, collection.count())),
+                where={f"section_{section}": True} if section else None,
+                include=["documents", "metadatas", "distances"]
+            )
+        batches = [
+            [
+                {"content": content, "metadata": metadata, "score": distance}
+                for content, metadata, distance in zip(documents, metadatas, distances)
+            ]
+            for documents, metadatas, distances in zip(results["documents"], results["metadatas"], results["distances"])
         ]
+        return self._hydrate_batches(batches)
+
+    def _hydrate_batches(self, batches: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """Hydrate per-query results with one database query for the whole batch, dropping stale chunks."""
+        kept = {id(chunk) for chunk in self._hydrate([chunk for chunks in batches for chunk in chunks])}
+        return [[chunk for chunk in chunks if id(chunk) in kept] for chunks in batches]
+
+    def _search_quantized(self, embedding: List[float], k: int) -> List[Dict[str, Any]]:
+        """Shortlist candidates from the quantized index, then rank them exactly on the stored floats."""
+        import numpy as np
+
+        candidate_ids = self.quantized_index.search(embedding, k * max(1, settings.VECTOR_RERANK_OVERSAMPLE))
+        if not candidate_ids:
+            return []
+        candidates = self.vector_store._collection.get(
+            ids=candidate_ids,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        vectors = np.asarray(candidates["embeddings"], dtype=np.float32)
+        # Squared L2, the distance Chroma reports for the collection's default space
+        distances = ((vectors - np.asarray(embedding, dtype=np.float32)) ** 2).sum(axis=1)
+        order = np.argsort(distances)[:k]
+        return [
+            {
+                "content": candidates["documents"][i],
+                "metadata": candidates["metadatas"][i],
+                "score": float(distances[i])
+            }
+            for i in order
+        ]
+
+def document_metadata(document: Document) -> Dict[str, Any]:
+    """Metadata stored with every chunk of a document."""
+    return {"title": document.title, "content_hash": document.content_hash}
 
-vector_store_service = VectorStoreService() 
\ No newline at end of file
+@lazy_singleton
+def get_vector_store_service() -> VectorStoreService:
+    """Shared VectorStoreService, created on first use."""
+    return VectorStoreService()
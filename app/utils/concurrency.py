@@ -0,0 +1,20 @@
+from typing import Any, Callable, Iterable, List, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+
+T = TypeVar("T")
+
+def map_in_context(func: Callable[..., T], *iterables: Iterable[Any], max_workers: int) -> List[T]:
+    """
+    Like map(), but calls run concurrently in a thread pool; results keep the input order.
+
+    Each call runs in a copy of the caller's context, so scoped settings
+    such as the LLM request priority carry over to the worker threads.
+    The first exception raised by a call is re-raised.
+    """
+    arguments = list(zip(*iterables))
+    if not arguments:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(arguments)))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, func, *args) for args in arguments]
+        return [future.result() for future in futures]
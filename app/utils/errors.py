@@ -0,0 +1,9 @@
+from typing import Dict, Optional
+import math
+
+def retry_after_headers(error: Exception) -> Optional[Dict[str, str]]:
+    """Build a Retry-After header from an error carrying a retry_after delay."""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        return None
+    return {"Retry-After": str(max(1, math.ceil(retry_after)))}
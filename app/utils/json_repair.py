@@ -0,0 +1,154 @@
+"""Tolerant parsing of JSON produced by language models."""
+
+from typing import Any
+import json
+import re
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+# States of the member being read in an open object
+_KEY, _IN_KEY, _AFTER_KEY, _VALUE, _DONE = range(5)
+# Literals a truncated word is completed to
+_COMPLETIONS = ("true", "false", "null", "True", "False", "None")
+
+def _strip_wrapping(text: str) -> str:
+    """Remove markdown fences and any prose around the first JSON value."""
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text.strip()
+    start = min(starts)
+    # Find the bracket that closes the first one, ignoring brackets inside strings
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    # Keep everything after the start if it is never closed (truncated output)
+    return text[start:]
+
+def _fix_tokens(text: str) -> str:
+    """
+    Single pass over the text outside string literals that drops trailing
+    commas, converts Python literals, and closes unterminated strings,
+    arrays and objects left by truncated output. A member cut off before
+    its value is dropped, and a literal or number cut off part-way is
+    completed or trimmed.
+    """
+    out = []
+    # Open containers as [closer, member state, where the current member starts in out]
+    stack = []
+    in_string = False
+    escaped = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                if stack and stack[-1][1] == _IN_KEY:
+                    stack[-1][1] = _AFTER_KEY
+            i += 1
+            continue
+
+        if stack and stack[-1][1] == _VALUE and not ch.isspace() and ch not in ",:}]":
+            stack[-1][1] = _DONE
+        if ch == '"':
+            in_string = True
+            if stack and stack[-1][1] == _KEY:
+                stack[-1][1] = _IN_KEY
+        elif ch in "{[":
+            out.append(ch)
+            stack.append(["}", _KEY, len(out)] if ch == "{" else ["]", None, len(out)])
+            i += 1
+            continue
+        elif ch in "}]":
+            # Drop a trailing comma before the closer
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+        elif ch == ":" and stack and stack[-1][1] == _AFTER_KEY:
+            stack[-1][1] = _VALUE
+        elif ch == "," and stack and stack[-1][0] == "}":
+            stack[-1][1] = _KEY
+            stack[-1][2] = len(out)
+        elif ch.isalpha():
+            match = re.match(r"[A-Za-z]+", text[i:])
+            word = match.group(0)
+            i += len(word)
+            if i == len(text):
+                # Output cut off inside a literal
+                word = next((full for full in _COMPLETIONS if full.startswith(word)), word)
+            out.extend(_LITERALS.get(word, word))
+            continue
+        out.append(ch)
+        i += 1
+
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    result = "".join(out).rstrip()
+    # A number cut off after its sign, decimal point or exponent
+    result = re.sub(r"(\d)[.eE+-]+$", r"\1", result)
+    result = re.sub(r"(^|[\s:,\[])-$", r"\1", result).rstrip()
+    if stack and stack[-1][0] == "}" and (stack[-1][1] != _DONE or result.endswith(":")):
+        # Drop a key whose value never arrived, with the comma before it
+        result = result[:stack[-1][2]]
+    # Drop a dangling comma before closing what is still open
+    result = result.rstrip().rstrip(",").rstrip()
+    return result + "".join(closer for closer, _, _ in reversed(stack))
+
+def repair_json(text: str) -> str:
+    """Return a best-effort repaired version of a model's JSON output."""
+    if '"' not in text:
+        # Curly quotes are only delimiters when no straight quotes are used
+        text = text.translate(_SMART_QUOTES)
+    text = _strip_wrapping(text)
+    return _fix_tokens(text)
+
+def parse_json(text: str) -> Any:
+    """
+    Parse JSON from a model response, repairing common defects locally.
+
+    Raises:
+        ValueError: If the text cannot be parsed even after repair
+    """
+    if text is None:
+        raise ValueError("Empty response from LLM service")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(repair_json(text))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON response from LLM: {str(e)}")
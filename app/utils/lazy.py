@@ -0,0 +1,31 @@
+from typing import Callable, List, TypeVar
+import functools
+import threading
+
+T = TypeVar("T")
+
+def lazy_singleton(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    Decorator turning a zero-argument factory into a shared-instance getter.
+
+    The instance is built on the first call only, even when several threads
+    make that call at once. If the factory raises, nothing is cached and the
+    next call tries again. The getter's reset() drops the instance.
+    """
+    lock = threading.Lock()
+    instance: List[T] = []
+
+    @functools.wraps(factory)
+    def get() -> T:
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    def reset() -> None:
+        with lock:
+            instance.clear()
+
+    get.reset = reset
+    return get
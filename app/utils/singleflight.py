@@ -0,0 +1,100 @@
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+import copy
+import hashlib
+import json
+import logging
+import re
+import threading
+
+from app.core.metrics import record_coalesced
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str, casefold: bool = False) -> str:
+    """Collapse whitespace (and optionally case) so trivially different inputs share a key."""
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.casefold() if casefold else text
+
+def flight_key(*parts: Any) -> str:
+    """Stable hash of JSON-serializable key parts."""
+    encoded = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class _Call:
+    """One in-flight computation and the outcome its followers wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent calls with the same key into one computation.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait and receive a copy of its result, or its
+    exception. Nothing is cached: once the leader finishes, the next call
+    for the key starts a new computation.
+    """
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, func: Callable[[], T]) -> T:
+        """
+        Run func, or wait for an identical in-flight call to finish.
+
+        Args:
+            key: Identity of the work, e.g. from flight_key()
+            func: Zero-argument callable computing the result
+
+        Returns:
+            The result of func, deep-copied for followers so callers never share mutable state
+        """
+        if not self.enabled:
+            return func()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.followers += 1
+                self.coalesced += 1
+
+        if not leader:
+            record_coalesced(self.name)
+            logger.debug("Joined in-flight %s call %s", self.name, key[:12])
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def metrics(self) -> Dict[str, int]:
+        """In-flight keys and how many calls ran versus joined another."""
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced}
@@ -7,7 +7,7 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from app.db.base import get_db
 from app.db.models import Document
-from app.services.vector_store import vector_store_service
+from app.services.vector_store import get_vector_store_service, document_metadata
 
 def generate_embeddings():
     """Generate embeddings for all documents in the database."""
@@ -17,18 +17,16 @@ def generate_embeddings():
     db = next(get_db())
     
     try:
-        # Get all documents
-        documents = db.query(Document).all()
-        print(f"Found {len(documents)} documents in the database.")
+        print(f"Found {db.query(Document).count()} documents in the database.")
         
-        # Process each document
-        for doc in documents:
+        # Process each document, loading a few at a time rather than the whole table
+        for doc in db.query(Document).yield_per(20):
             print(f"Processing document: {doc.title} (ID: {doc.id})")
             try:
-                vector_store_service.process_document(
+                get_vector_store_service().reindex_document(
                     document_id=str(doc.id),
                     content=doc.content,
-                    metadata={"title": doc.title}
+                    metadata=document_metadata(doc)
                 )
                 print(f"Successfully processed document: {doc.title}")
             except Exception as e:
@@ -0,0 +1,88 @@
+"""
+Copy a Chroma collection into a new one with shorter embeddings.
+
+text-embedding-3 vectors keep their meaning when truncated to a prefix and
+re-normalized, which is what the API does for the `dimensions` parameter,
+so existing chunks can be migrated without calling Azure again. The source
+collection is left untouched; point the app at the new one once done.
+
+Usage:
+    python assets/migrate_embeddings.py --target documents_256 --dimensions 256
+    # then set CHROMA_COLLECTION=documents_256 and AZURE_OPENAI_EMBEDDING_DIMENSIONS=256
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add the parent directory to the Python path so we can import from app
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services.vector_store import chroma_client
+
+def truncate(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """Keep the first `dimensions` components and re-normalize to unit length."""
+    shortened = vectors[:, :dimensions]
+    norms = np.linalg.norm(shortened, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return shortened / norms
+
+def migrate_embeddings(source: str, target: str, dimensions: int, batch_size: int) -> None:
+    """Copy every chunk from source to target with truncated embeddings."""
+    client = chroma_client()
+    source_collection = client.get_collection(source)
+    target_collection = client.get_or_create_collection(target, metadata=source_collection.metadata)
+
+    total = source_collection.count()
+    print(f"Migrating {total} chunks from '{source}' to '{target}' at {dimensions} dimensions...")
+
+    offset = 0
+    while True:
+        page = source_collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=batch_size,
+            offset=offset
+        )
+        if not page["ids"]:
+            break
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        if vectors.shape[1] < dimensions:
+            raise SystemExit(f"Source vectors have {vectors.shape[1]} dimensions, fewer than {dimensions}")
+        target_collection.upsert(
+            ids=page["ids"],
+            embeddings=truncate(vectors, dimensions),
+            documents=page["documents"],
+            metadatas=page["metadatas"]
+        )
+        offset += len(page["ids"])
+        print(f"  {offset}/{total}")
+
+    copied = target_collection.count()
+    if copied < total:
+        raise SystemExit(f"Target has {copied} chunks but the source has {total}")
+
+    print("\nMigration completed successfully!")
+    print(f"Set CHROMA_COLLECTION={target} and AZURE_OPENAI_EMBEDDING_DIMENSIONS={dimensions}, then restart.")
+    print(f"The '{source}' collection was kept and can be deleted once the new one is verified.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=settings.CHROMA_COLLECTION, help="Collection to read (default: CHROMA_COLLECTION)")
+    parser.add_argument("--target", required=True, help="Collection to create or update")
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        default=settings.AZURE_OPENAI_EMBEDDING_DIMENSIONS,
+        help="Target width (default: AZURE_OPENAI_EMBEDDING_DIMENSIONS)"
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if not args.dimensions:
+        parser.error("--dimensions is required when AZURE_OPENAI_EMBEDDING_DIMENSIONS is not set")
+    if args.source == args.target:
+        parser.error("--target must differ from --source")
+    migrate_embeddings(args.source, args.target, args.dimensions, args.batch_size)
@@ -0,0 +1,44 @@
+"""
+Compare the documents table with the vector index and repair differences.
+
+Reports documents without chunks, documents whose chunks are stale or
+incomplete, and chunks whose document no longer exists. Nothing is changed
+unless --apply is given.
+
+Usage:
+    python assets/reconcile.py             # dry run, prints the report
+    python assets/reconcile.py --apply     # re-index and delete orphans
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import from app
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.db.base import SessionLocal, create_tables
+from app.services.reconciler import reconcile
+from app.services.vector_store import get_vector_store_service
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="Re-index missing/stale documents and delete orphan chunks")
+    parser.add_argument(
+        "--max-reindex",
+        type=int,
+        default=settings.RECONCILE_MAX_REINDEX,
+        help="Documents to re-embed at most (default: RECONCILE_MAX_REINDEX)"
+    )
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        report = reconcile(db, get_vector_store_service(), dry_run=not args.apply, max_reindex=args.max_reindex)
+    finally:
+        db.close()
+    print(report.model_dump_json(indent=2))
+    if report.failed:
+        sys.exit(1)
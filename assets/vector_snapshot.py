@@ -0,0 +1,253 @@
+"""
+Export the Chroma collection to a snapshot directory, or restore one.
+
+A snapshot holds everything needed to serve search without calling Azure:
+
+    manifest.json    collection name and metadata, count, dimensions, embedding
+                     settings, chunk storage mode and file checksums
+    embeddings.npy   float32 matrix, one row per chunk (memory-mappable)
+    records.jsonl    one {"id", "document", "metadata"} line per row, same order
+
+Restoring loads the snapshot into a temporary collection, verifies it and
+only then swaps it in under the target name, so a failed restore leaves the
+live collection untouched. The replaced collection is kept as
+<name>_previous until the next restore.
+
+With CHUNK_STORAGE=reference, chunk text lives in the documents table, so
+pass --with-database to snapshot the SQLite database alongside the vectors.
+
+Usage:
+    python assets/vector_snapshot.py export --out snapshots/2024-06-01
+    python assets/vector_snapshot.py restore --snapshot snapshots/2024-06-01
+"""
+
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add the parent directory to the Python path so we can import from app
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services.vector_store import chroma_client
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+EMBEDDINGS = "embeddings.npy"
+RECORDS = "records.jsonl"
+DATABASE = "documents.db"
+
+def file_sha256(path: Path) -> str:
+    """Checksum of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def sqlite_path() -> Path:
+    """Database file from DATABASE_URL; only SQLite databases can be snapshotted."""
+    prefix = "sqlite:///"
+    if not settings.DATABASE_URL.startswith(prefix):
+        raise SystemExit("--with-database only supports SQLite DATABASE_URLs")
+    return Path(settings.DATABASE_URL[len(prefix):])
+
+def backup_database(source: Path, target: Path) -> None:
+    """Copy a SQLite database with the online backup API, consistent even while it is being written."""
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(target)
+    try:
+        source_connection.backup(target_connection)
+    finally:
+        source_connection.close()
+        target_connection.close()
+
+def _export_pages(collection, out: Path, count: int, batch_size: int) -> int:
+    """Write every row of the collection; returns the number of distinct ids written."""
+    embeddings = None
+    seen = set()
+    offset = 0
+    with open(out / RECORDS, "w", encoding="utf-8") as records:
+        while True:
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset
+            )
+            if not page["ids"]:
+                break
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(
+                    out / EMBEDDINGS, mode="w+", dtype=np.float32, shape=(count, vectors.shape[1])
+                )
+            if offset + len(page["ids"]) > count:
+                # Rows were added since counting; the caller retries
+                return -1
+            embeddings[offset:offset + len(page["ids"])] = vectors
+            for chunk_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                records.write(json.dumps({"id": chunk_id, "document": document, "metadata": metadata}) + "\n")
+                seen.add(chunk_id)
+            offset += len(page["ids"])
+            print(f"  {offset}/{count}")
+    if embeddings is None:
+        np.save(out / EMBEDDINGS, np.zeros((0, 0), dtype=np.float32))
+    else:
+        embeddings.flush()
+        del embeddings
+    return len(seen) if offset == count else -1
+
+def export_snapshot(collection_name: str, out: Path, batch_size: int, with_database: bool, attempts: int = 3) -> None:
+    """
+    Write a snapshot of the collection to out.
+
+    Chroma has no read snapshots, so the export pages through the collection
+    and then checks that the count did not change and every id was seen
+    exactly once; if writes interfered it starts over. Pause ingestion for
+    large collections that are written to continuously.
+    """
+    client = chroma_client()
+    collection = client.get_collection(collection_name)
+    out.mkdir(parents=True, exist_ok=True)
+
+    for attempt in range(1, attempts + 1):
+        count = collection.count()
+        print(f"Exporting {count} chunks from '{collection_name}' to {out} (attempt {attempt})...")
+        started = time.time()
+        if with_database:
+            backup_database(sqlite_path(), out / DATABASE)
+        written = _export_pages(collection, out, count, batch_size)
+        if written == count and collection.count() == count:
+            break
+        print("  The collection changed during the export; starting over")
+    else:
+        raise SystemExit(f"Could not take a consistent snapshot in {attempts} attempts; pause writes and retry")
+
+    dimensions = int(np.load(out / EMBEDDINGS, mmap_mode="r").shape[1]) if count else 0
+    files = [EMBEDDINGS, RECORDS] + ([DATABASE] if with_database else [])
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "collection": collection_name,
+        "collection_metadata": collection.metadata,
+        "count": count,
+        "dimensions": dimensions,
+        "embedding_deployment": settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+        "embedding_dimensions": settings.AZURE_OPENAI_EMBEDDING_DIMENSIONS,
+        "chunk_storage": settings.CHUNK_STORAGE,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started)),
+        "sha256": {name: file_sha256(out / name) for name in files},
+    }
+    (out / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    print(f"\nSnapshot of {count} chunks ({dimensions} dimensions) written to {out}")
+
+def _read_records(path: Path, batch_size: int):
+    """records.jsonl in lists of up to batch_size."""
+    batch = []
+    with open(path, encoding="utf-8") as records:
+        for line in records:
+            batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def restore_snapshot(snapshot: Path, collection_name: str, batch_size: int, with_database: bool) -> None:
+    """
+    Load a snapshot into a temporary collection, verify it, then swap it in.
+
+    Stop the API (or point it at another collection) while restoring: the
+    swap renames collections, which running processes do not follow.
+    """
+    manifest = json.loads((snapshot / MANIFEST).read_text())
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise SystemExit(f"Unsupported snapshot format {manifest.get('format_version')}")
+    for name, expected in manifest["sha256"].items():
+        if file_sha256(snapshot / name) != expected:
+            raise SystemExit(f"{name} does not match its checksum; the snapshot is damaged")
+    if manifest["embedding_dimensions"] != settings.AZURE_OPENAI_EMBEDDING_DIMENSIONS:
+        print(
+            f"Warning: the snapshot was embedded with dimensions={manifest['embedding_dimensions']}, "
+            f"but AZURE_OPENAI_EMBEDDING_DIMENSIONS is {settings.AZURE_OPENAI_EMBEDDING_DIMENSIONS}"
+        )
+
+    client = chroma_client()
+    # Chroma's own limit on rows per write
+    batch_size = min(batch_size, client.get_max_batch_size())
+    staging_name = f"{collection_name}_restore_{int(time.time())}"
+    staging = client.create_collection(staging_name, metadata=manifest["collection_metadata"])
+    embeddings = np.load(snapshot / EMBEDDINGS, mmap_mode="r")
+
+    print(f"Restoring {manifest['count']} chunks into '{staging_name}'...")
+    try:
+        offset = 0
+        for batch in _read_records(snapshot / RECORDS, batch_size):
+            staging.add(
+                ids=[record["id"] for record in batch],
+                embeddings=np.ascontiguousarray(embeddings[offset:offset + len(batch)]),
+                documents=[record["document"] for record in batch],
+                metadatas=[record["metadata"] for record in batch]
+            )
+            offset += len(batch)
+            print(f"  {offset}/{manifest['count']}")
+        if staging.count() != manifest["count"]:
+            raise SystemExit(f"Restored {staging.count()} chunks but the snapshot has {manifest['count']}")
+    except BaseException:
+        client.delete_collection(staging_name)
+        raise
+
+    previous_name = f"{collection_name}_previous"
+    if previous_name in [collection.name for collection in client.list_collections()]:
+        client.delete_collection(previous_name)
+    if collection_name in [collection.name for collection in client.list_collections()]:
+        client.get_collection(collection_name).modify(name=previous_name)
+    staging.modify(name=collection_name)
+
+    if with_database:
+        if DATABASE not in manifest["sha256"]:
+            raise SystemExit("The snapshot was taken without --with-database")
+        database = sqlite_path()
+        if database.exists():
+            backup_database(database, database.with_name(database.name + ".previous"))
+        # Through the backup API rather than a file copy, so the database's WAL file stays consistent
+        backup_database(snapshot / DATABASE, database)
+
+    print(f"\nRestore completed: '{collection_name}' now holds {manifest['count']} chunks.")
+    if collection_name != manifest["collection"]:
+        print(f"The snapshot was taken from '{manifest['collection']}'.")
+    print(f"The replaced collection was kept as '{previous_name}'.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write a snapshot of the collection")
+    export_parser.add_argument("--out", required=True, type=Path, help="Snapshot directory to create")
+
+    restore_parser = commands.add_parser("restore", help="Replace the collection with a snapshot")
+    restore_parser.add_argument("--snapshot", required=True, type=Path, help="Snapshot directory to read")
+
+    for command in (export_parser, restore_parser):
+        command.add_argument(
+            "--collection",
+            default=settings.CHROMA_COLLECTION,
+            help="Collection to export or replace (default: CHROMA_COLLECTION)"
+        )
+        command.add_argument("--batch-size", type=int, default=5000)
+        command.add_argument(
+            "--with-database",
+            action="store_true",
+            help="Also snapshot or restore the SQLite documents database"
+        )
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_snapshot(args.collection, args.out, args.batch_size, args.with_database)
+    else:
+        restore_snapshot(args.snapshot, args.collection, args.batch_size, args.with_database)
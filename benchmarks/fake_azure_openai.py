@@ -0,0 +1,257 @@
+"""
+Local stand-in for the Azure OpenAI REST API, for load tests that must not
+spend real quota.
+
+Serves chat completions and embeddings for any deployment with configurable
+latency, token generation rate and 429 injection. Embeddings are
+deterministic per input text; completions are canned responses shaped for
+each prompt template in the app, so the full extraction and FHIR pipelines
+run end to end.
+
+Usage:
+    python benchmarks/fake_azure_openai.py --port 8100 --latency-ms 200 --rate-limit-ratio 0.02
+"""
+
+from typing import Dict, Any, List
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+class FakeAzureConfig:
+    """Behaviour of the fake server; every field can be changed between runs."""
+
+    def __init__(
+        self,
+        latency_ms: float = 150.0,
+        latency_jitter_ms: float = 50.0,
+        tokens_per_second: float = 200.0,
+        embedding_latency_ms: float = 40.0,
+        rate_limit_ratio: float = 0.0,
+        retry_after_ms: int = 500,
+        embedding_dimensions: int = 3072,
+        seed: int = 0
+    ):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.tokens_per_second = tokens_per_second
+        self.embedding_latency_ms = embedding_latency_ms
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after_ms = retry_after_ms
+        self.embedding_dimensions = embedding_dimensions
+        self.random = random.Random(seed)
+
+def count_tokens(text: str) -> int:
+    """Approximate token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+def embed(text: str, dimensions: int) -> np.ndarray:
+    """Deterministic unit vector for a text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+CODE_IDENTIFICATION = {"icd_codes": ["E78.5", "E66.3", "Z00.00"], "rxnorm_codes": ["83367"]}
+
+CODE_MAPPINGS = {
+    "icd_mappings": [
+        {"code": "E78.5", "description": "Hyperlipidemia, unspecified", "category": "Endocrine"},
+        {"code": "E66.3", "description": "Overweight", "category": "Endocrine"},
+        {"code": "Z00.00", "description": "Encounter for general adult medical examination", "category": "Factors influencing health status"}
+    ],
+    "rxnorm_mappings": [
+        {"code": "83367", "description": "atorvastatin", "form": "Oral Tablet", "strength": "20 MG"}
+    ]
+}
+
+STRUCTURED_DATA = {
+    "patient_info": {"demographics": {"id": "patient--001", "sex": "male"}, "medical_history": ["Family history of hyperlipidemia"]},
+    "conditions": [
+        {"name": "Overweight", "status": "active", "severity": "mild", "icd_code": "E66.3", "description": "Overweight"},
+        {"name": "Hyperlipidemia", "status": "suspected", "severity": "mild", "icd_code": "E78.5", "description": "Hyperlipidemia, unspecified"}
+    ],
+    "medications": [
+        {"name": "Atorvastatin", "dosage": "20 mg", "frequency": "daily", "route": "oral", "rxnorm_code": "83367", "details": "atorvastatin 20 MG Oral Tablet"}
+    ],
+    "treatments": [{"procedure": "Influenza vaccination", "status": "completed", "date": "2023-10-26"}],
+    "observations": [
+        {"type": "Blood pressure", "value": "128/82", "unit": "mmHg", "date": "2023-10-26", "interpretation": "elevated"},
+        {"type": "BMI", "value": "27.5", "unit": "kg/m2", "date": "2023-10-26", "interpretation": "overweight"}
+    ],
+    "plan": [{"action": "Follow-up visit to review labs", "due_date": "2024-03-26", "status": "scheduled", "details": "Lipid panel review"}]
+}
+
+def fhir_resource(resource_type: str) -> Dict[str, Any]:
+    """Minimal FHIR resource of the requested type."""
+    subject = {"reference": "Patient/patient--001"}
+    resources = {
+        "Patient": {"resourceType": "Patient", "identifier": [{"value": "patient--001"}], "gender": "male"},
+        "Condition": {
+            "resourceType": "Condition",
+            "subject": subject,
+            "code": {"coding": [{"system": "http://hl7.org/fhir/sid/icd-10", "code": "E66.3", "display": "Overweight"}]}
+        },
+        "MedicationStatement": {
+            "resourceType": "MedicationStatement",
+            "status": "active",
+            "subject": subject,
+            "medicationCodeableConcept": {"coding": [{"system": "http://www.nlm.nih.gov/research/umls/rxnorm", "code": "83367"}]}
+        }
+    }
+    return resources.get(resource_type, {"resourceType": resource_type, "subject": subject})
+
+def canned_completion(system: str, prompt: str) -> str:
+    """Response text for a request, chosen by which prompt template produced it."""
+    if "code identification specialist" in system:
+        return json.dumps(CODE_IDENTIFICATION)
+    if "medical coding specialist" in system:
+        return json.dumps(CODE_MAPPINGS)
+    if "information extraction specialist" in system:
+        return json.dumps(STRUCTURED_DATA)
+    if "Return only the resource types" in system:
+        return "Patient, Condition, MedicationStatement"
+    if "Generate only valid FHIR JSON" in system:
+        match = re.search(r"Resource type:\s*(\w+)", prompt)
+        return json.dumps(fhir_resource(match.group(1) if match else "Patient"))
+    if "summarizes medical SOAP notes" in system and "Questions:" in prompt:
+        questions = re.findall(r"^(\d+)\. ", prompt.split("Questions:", 1)[1], re.MULTILINE)
+        return json.dumps({"answers": [
+            {"index": int(index), "answer": "Based on the provided notes, the patient was advised on diet and exercise."}
+            for index in questions
+        ]})
+    if "summarizes medical SOAP notes" in system:
+        return "Based on the provided notes, the patient was seen for an annual physical and advised on diet and exercise."
+    return "Summary: adult patient, generally healthy, overweight, family history of hyperlipidemia; labs ordered and follow-up scheduled."
+
+def create_app(config: FakeAzureConfig) -> FastAPI:
+    """Build the fake Azure OpenAI app."""
+    app = FastAPI(title="Fake Azure OpenAI")
+    app.state.config = config
+    app.state.stats = {"chat": 0, "embeddings": 0, "rate_limited": 0}
+
+    def rate_limited() -> JSONResponse:
+        app.state.stats["rate_limited"] += 1
+        return JSONResponse(
+            {"error": {"code": "429", "message": "Rate limit is exceeded. Try again later."}},
+            status_code=429,
+            headers={
+                "retry-after-ms": str(config.retry_after_ms),
+                "retry-after": str(max(1, round(config.retry_after_ms / 1000)))
+            }
+        )
+
+    def should_rate_limit() -> bool:
+        return config.rate_limit_ratio > 0 and config.random.random() < config.rate_limit_ratio
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request):
+        body = await request.json()
+        if should_rate_limit():
+            return rate_limited()
+        app.state.stats["chat"] += 1
+
+        messages: List[Dict[str, str]] = body.get("messages", [])
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        prompt = "\n".join(m["content"] for m in messages if m.get("role") == "user")
+        text = canned_completion(system, prompt)
+
+        prompt_tokens = count_tokens(system) + count_tokens(prompt)
+        completion_tokens = count_tokens(text)
+        # Pretend the static system prompt is served from the prefix cache
+        cached_tokens = (count_tokens(system) // 128) * 128
+
+        latency = config.latency_ms + config.random.uniform(-1, 1) * config.latency_jitter_ms
+        if config.tokens_per_second > 0:
+            latency += completion_tokens / config.tokens_per_second * 1000
+        await asyncio.sleep(max(0.0, latency) / 1000)
+
+        return {
+            "id": f"chatcmpl-{app.state.stats['chat']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+        }
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def embeddings(deployment: str, request: Request):
+        body = await request.json()
+        if should_rate_limit():
+            return rate_limited()
+        app.state.stats["embeddings"] += 1
+
+        texts = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        dimensions = body.get("dimensions") or config.embedding_dimensions
+        # The openai client asks for base64 unless a format is given
+        as_base64 = body.get("encoding_format") == "base64"
+
+        data = []
+        for index, text in enumerate(texts):
+            vector = embed(text, dimensions)
+            encoded = base64.b64encode(vector.tobytes()).decode("ascii") if as_base64 else vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": encoded})
+
+        await asyncio.sleep(config.embedding_latency_ms / 1000)
+        tokens = sum(count_tokens(text) for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": deployment,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="Base completion latency")
+    parser.add_argument("--latency-jitter-ms", type=float, default=50.0, help="Uniform jitter around the base latency")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Completion generation rate; 0 disables")
+    parser.add_argument("--embedding-latency-ms", type=float, default=40.0)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after-ms", type=int, default=500)
+    parser.add_argument("--embedding-dimensions", type=int, default=3072)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeAzureConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        embedding_latency_ms=args.embedding_latency_ms,
+        rate_limit_ratio=args.rate_limit_ratio,
+        retry_after_ms=args.retry_after_ms,
+        embedding_dimensions=args.embedding_dimensions,
+        seed=args.seed
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Load test for the API against the local Azure OpenAI stand-in.
+
+Starts the fake Azure OpenAI server and the app (in a scratch directory, so
+the local database and vector store are untouched), then drives document
+ingest, question answering, extraction and FHIR conversion with a note
+corpus built from assets/soap_*.txt. Reports p50/p95/p99 latency, RPS and
+errors per endpoint as JSON, and optionally compares against a baseline.
+
+Usage:
+    python benchmarks/load_test.py --requests 50 --concurrency 8 --output results.json
+    python benchmarks/load_test.py --baseline results.json --max-regression 0.2
+    python benchmarks/load_test.py --base-url http://localhost:8000   # existing app, no fake server
+"""
+
+from typing import Dict, Any, List, Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent))
+from fake_azure_openai import STRUCTURED_DATA
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+API_KEY = "benchmark-key"
+
+def build_corpus(size: int, seed: int = 0) -> List[str]:
+    """
+    Realistic notes from the SOAP samples, varied per copy.
+
+    Patient IDs and encounter dates are rewritten so every note embeds
+    differently, and about one note in five concatenates several encounters
+    to exercise chunked extraction.
+    """
+    samples = [path.read_text(encoding="utf-8", errors="replace") for path in sorted((REPO_ROOT / "assets").glob("soap_*.txt"))]
+    if not samples:
+        raise SystemExit("No assets/soap_*.txt notes found")
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(size):
+        count = rng.randint(2, 4) if rng.random() < 0.2 else 1
+        notes = []
+        for _ in range(count):
+            note = rng.choice(samples)
+            note = note.replace("patient--00", f"patient-{index:05d}-")
+            note = note.replace("2023-", f"{rng.randint(2019, 2024)}-")
+            notes.append(note)
+        corpus.append("\n\n".join(notes))
+    return corpus
+
+QUESTIONS = [
+    "What was the patient's blood pressure?",
+    "Which medications were prescribed?",
+    "What follow-up was scheduled?",
+    "Does the patient have a family history of hyperlipidemia?",
+    "What labs were ordered?",
+    "What vaccines were administered?",
+]
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def run_phase(
+    client: httpx.Client,
+    name: str,
+    requests: List[Callable[[httpx.Client], httpx.Response]],
+    concurrency: int
+) -> Dict[str, Any]:
+    """Issue requests concurrently and summarise latency and throughput."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    def issue(request: Callable[[httpx.Client], httpx.Response]) -> None:
+        start = time.perf_counter()
+        try:
+            status = str(request(client).status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(issue, requests))
+    elapsed = time.perf_counter() - start
+
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "endpoint": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 1),
+            "p95": round(percentile(latencies, 0.95), 1),
+            "p99": round(percentile(latencies, 0.99), 1),
+            "mean": round(statistics.fmean(latencies), 1),
+            "max": round(max(latencies), 1),
+        },
+    }
+
+def wait_until_up(url: str, timeout: float = 60.0) -> None:
+    """Poll a URL until it answers or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=2.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.25)
+    raise SystemExit(f"Timed out waiting for {url}")
+
+def start_servers(args, workdir: str) -> List[subprocess.Popen]:
+    """Start the fake Azure OpenAI server and the app."""
+    fake = subprocess.Popen([
+        sys.executable, str(Path(__file__).parent / "fake_azure_openai.py"),
+        "--port", str(args.fake_port),
+        "--latency-ms", str(args.latency_ms),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--rate-limit-ratio", str(args.rate_limit_ratio),
+    ])
+    wait_until_up(f"http://127.0.0.1:{args.fake_port}/stats")
+
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(REPO_ROOT),
+        "API_KEY": API_KEY,
+        "DATABASE_URL": f"sqlite:///{workdir}/documents.db",
+        "AZURE_OPENAI_ENDPOINT": f"http://127.0.0.1:{args.fake_port}",
+        "AZURE_OPENAI_API_KEY": "fake",
+        "AZURE_OPENAI_API_VERSION": "2024-08-01-preview",
+        "EXTRACT_ON_INGEST": "False",
+        "LOG_LEVEL": "WARNING",
+    }
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.app_port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env
+    )
+    return [fake, app]
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> bool:
+    """Print per-endpoint changes against a baseline; False if any regressed beyond the threshold."""
+    previous = {phase["endpoint"]: phase for phase in baseline["endpoints"]}
+    ok = True
+    for phase in results["endpoints"]:
+        before = previous.get(phase["endpoint"])
+        if before is None:
+            continue
+        p95_change = phase["latency_ms"]["p95"] / before["latency_ms"]["p95"] - 1 if before["latency_ms"]["p95"] else 0.0
+        rps_change = phase["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+        regressed = p95_change > max_regression or rps_change < -max_regression
+        ok = ok and not regressed
+        print(
+            f"{phase['endpoint']:<28} p95 {p95_change:+.1%}  rps {rps_change:+.1%}"
+            + ("  REGRESSION" if regressed else ""),
+            file=sys.stderr
+        )
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=30, help="Requests per endpoint")
+    parser.add_argument("--documents", type=int, default=30, help="Documents ingested before querying")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base-url", help="Benchmark an already running app instead of starting one")
+    parser.add_argument("--api-key", default=API_KEY, help="API key for document ingest with --base-url")
+    parser.add_argument("--app-port", type=int, default=8001)
+    parser.add_argument("--fake-port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="Fake completion base latency")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake completion generation rate")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Fraction of fake responses that are 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous results file")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95/RPS change before failing")
+    args = parser.parse_args()
+
+    processes: List[subprocess.Popen] = []
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    base_url = args.base_url
+    try:
+        if base_url is None:
+            processes = start_servers(args, workdir)
+            base_url = f"http://127.0.0.1:{args.app_port}"
+        wait_until_up(f"{base_url}/health")
+
+        rng = random.Random(args.seed)
+        corpus = build_corpus(max(args.documents, args.requests), args.seed)
+        headers = {"X-API-Key": args.api_key}
+        api = f"{base_url}/api/v1"
+
+        phases = [
+            ("POST /documents", [
+                lambda c, i=i: c.post(f"{api}/documents/", json={"title": f"note-{i}", "content": corpus[i]}, headers=headers)
+                for i in range(args.documents)
+            ]),
+            ("POST /answer_question", [
+                lambda c, q=rng.choice(QUESTIONS): c.post(f"{api}/answer_question", json={"question": q})
+                for _ in range(args.requests)
+            ]),
+            ("POST /extraction/extract", [
+                lambda c, i=i: c.post(f"{api}/extraction/extract", json={"text": corpus[i]})
+                for i in range(args.requests)
+            ]),
+            ("POST /fhir/to_fhir", [
+                lambda c: c.post(f"{api}/fhir/to_fhir", json={"structured_data": STRUCTURED_DATA})
+                for _ in range(args.requests)
+            ]),
+        ]
+
+        with httpx.Client(timeout=300.0, limits=httpx.Limits(max_connections=args.concurrency)) as client:
+            endpoints = []
+            for name, requests in phases:
+                print(f"Running {name} ({len(requests)} requests)...", file=sys.stderr)
+                endpoints.append(run_phase(client, name, requests, args.concurrency))
+
+            fake_stats = None
+            if not args.base_url:
+                fake_stats = client.get(f"http://127.0.0.1:{args.fake_port}/stats").json()
+
+        results = {
+            "config": {
+                "requests": args.requests,
+                "documents": args.documents,
+                "concurrency": args.concurrency,
+                "latency_ms": args.latency_ms,
+                "tokens_per_second": args.tokens_per_second,
+                "rate_limit_ratio": args.rate_limit_ratio,
+            },
+            "endpoints": endpoints,
+            "fake_azure": fake_stats,
+        }
+        print(json.dumps(results, indent=2))
+        if args.output:
+            Path(args.output).write_text(json.dumps(results, indent=2))
+
+        if args.baseline:
+            baseline = json.loads(Path(args.baseline).read_text())
+            if not compare(results, baseline, args.max_regression):
+                sys.exit(1)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Chunking throughput of the splitters available to VectorStoreService.process_document."""
+
+import pytest
+from langchain_text_splitters import CharacterTextSplitter, RecursiveCharacterTextSplitter
+
+from conftest import SIZES, CHUNK_SIZE, CHUNK_OVERLAP, measure_peak_memory
+from app.services.chunking import SOAPSectionSplitter
+
+# Candidate splitters; "soap" and "recursive" are the CHUNKING_STRATEGY options
+SPLITTERS = {
+    "soap": lambda: SOAPSectionSplitter(CHUNK_SIZE, CHUNK_OVERLAP),
+    "recursive": lambda: RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+    ),
+    "character": lambda: CharacterTextSplitter(
+        separator="\n",
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+    ),
+}
+
+@pytest.mark.parametrize("splitter_name", list(SPLITTERS))
+@pytest.mark.parametrize("chunks", SIZES)
+def bench_split_text(benchmark, corpus_cache, splitter_name, chunks):
+    text = corpus_cache(chunks)
+    splitter = SPLITTERS[splitter_name]()
+
+    result = measure_peak_memory(benchmark, splitter.split_text, text)
+    benchmark.extra_info["chunks"] = len(result)
+    benchmark.extra_info["input_mb"] = round(len(text) / 2**20, 2)
+
+    benchmark.pedantic(splitter.split_text, args=(text,), rounds=3 if chunks <= 10_000 else 1, iterations=1)
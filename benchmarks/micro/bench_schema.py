@@ -0,0 +1,76 @@
+"""Pydantic conversion of raw extraction output into StructuredMedicalData."""
+
+import pytest
+
+from conftest import SIZES, measure_peak_memory
+from app.schemas.extraction import (
+    ExtractionResponse,
+    StructuredMedicalData,
+    PatientInfo,
+    Condition,
+    Medication,
+    Treatment,
+    Observation,
+    PlanAction
+)
+
+# Entity counts per payload; the chunk sizes are far beyond any real note
+ENTITY_COUNTS = [size // 10 for size in SIZES]
+
+def raw_extraction(entities: int) -> dict:
+    """Agent-shaped output with the given number of entities spread across sections."""
+    per_section = max(1, entities // 5)
+    return {
+        "patient_info": {"demographics": {"id": "patient-0000001", "sex": "female"}, "medical_history": ["asthma"]},
+        "conditions": [
+            {"name": f"Condition {i}", "status": "active", "severity": "mild", "icd_code": "J45.909", "description": "Asthma"}
+            for i in range(per_section)
+        ],
+        "medications": [
+            {"name": f"Medication {i}", "dosage": "90 mcg", "frequency": "prn", "route": "inhaled", "rxnorm_code": "745679", "details": "albuterol"}
+            for i in range(per_section)
+        ],
+        "treatments": [{"procedure": f"Procedure {i}", "status": "completed", "date": "2023-10-26"} for i in range(per_section)],
+        "observations": [
+            {"type": f"Observation {i}", "value": "98", "unit": "%", "date": "2023-10-26", "interpretation": "normal"}
+            for i in range(per_section)
+        ],
+        "plan": [{"action": f"Action {i}", "due_date": "2024-01-01", "status": "scheduled", "details": "follow-up"} for i in range(per_section)],
+    }
+
+def explicit_construction(raw_data: dict) -> StructuredMedicalData:
+    """The per-model construction done in ExtractionService.extract_entities."""
+    return StructuredMedicalData(
+        patient_info=PatientInfo(**raw_data["patient_info"]),
+        conditions=[Condition(**c) for c in raw_data.get("conditions", [])],
+        medications=[Medication(**m) for m in raw_data.get("medications", [])],
+        treatments=[Treatment(**t) for t in raw_data.get("treatments", [])],
+        observations=[Observation(**o) for o in raw_data.get("observations", [])],
+        plan=[PlanAction(**p) for p in raw_data.get("plan", [])]
+    )
+
+CONSTRUCTORS = {
+    "explicit": explicit_construction,
+    "model_validate": StructuredMedicalData.model_validate,
+}
+
+@pytest.mark.parametrize("constructor", list(CONSTRUCTORS))
+@pytest.mark.parametrize("entities", ENTITY_COUNTS)
+def bench_structured_data(benchmark, constructor, entities):
+    raw_data = raw_extraction(entities)
+    build = CONSTRUCTORS[constructor]
+
+    measure_peak_memory(benchmark, build, raw_data)
+    benchmark(build, raw_data)
+
+@pytest.mark.parametrize("entities", ENTITY_COUNTS)
+def bench_extraction_response_json(benchmark, entities):
+    """Serializing the endpoint response."""
+    response = ExtractionResponse(
+        structured_data=explicit_construction(raw_extraction(entities)),
+        code_mappings={"icd_mappings": [], "rxnorm_mappings": []},
+        raw_codes={"icd_codes": [], "rxnorm_codes": []}
+    )
+
+    measure_peak_memory(benchmark, response.model_dump_json)
+    benchmark(response.model_dump_json)
@@ -0,0 +1,105 @@
+"""
+Similarity search latency in Chroma versus a brute-force NumPy baseline.
+
+Collections hold random unit vectors of BENCH_DIMENSIONS width and are built
+once per size in an in-memory Chroma client, the same engine the app uses.
+"""
+
+import uuid
+
+import numpy as np
+import pytest
+import chromadb
+
+from conftest import SIZES, DIMENSIONS, measure_peak_memory
+from app.services.vector_quantization import QuantizedIndex
+
+K = 3  # search_similar_chunks default
+BATCH_SIZE = 5_000
+QUERY_SEED = 0  # Size-seeded corpora never use seed 0
+
+def random_vectors(count: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@pytest.fixture(scope="module")
+def client():
+    return chromadb.EphemeralClient()
+
+@pytest.fixture(scope="module")
+def indexes(client):
+    """Chroma collection and raw matrix per size, built on first use."""
+    cache = {}
+
+    def get(size: int):
+        if size not in cache:
+            vectors = random_vectors(size, seed=size)
+            collection = client.create_collection(f"bench-{size}-{uuid.uuid4().hex[:8]}")
+            for start in range(0, size, BATCH_SIZE):
+                batch = vectors[start:start + BATCH_SIZE]
+                collection.add(
+                    ids=[f"chunk-{i}" for i in range(start, start + len(batch))],
+                    embeddings=batch,
+                    metadatas=[{"document_id": str(i // 10), "chunk_index": i % 10} for i in range(start, start + len(batch))]
+                )
+            cache[size] = (collection, vectors)
+        return cache[size]
+
+    return get
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_chroma_query(benchmark, indexes, size):
+    collection, _ = indexes(size)
+    query = random_vectors(1, seed=QUERY_SEED)
+
+    measure_peak_memory(benchmark, collection.query, query_embeddings=query, n_results=K)
+    benchmark(collection.query, query_embeddings=query, n_results=K)
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_chroma_query_filtered(benchmark, indexes, size):
+    """Search restricted to one document, as delete and scoped queries do."""
+    collection, _ = indexes(size)
+    query = random_vectors(1, seed=QUERY_SEED)
+
+    benchmark(collection.query, query_embeddings=query, n_results=K, where={"document_id": "7"})
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_numpy_bruteforce(benchmark, indexes, size):
+    """Exact top-k by dot product; the floor any index should beat at scale."""
+    _, vectors = indexes(size)
+    query = random_vectors(1, seed=QUERY_SEED)[0]
+
+    def search():
+        scores = vectors @ query
+        top = np.argpartition(-scores, K)[:K]
+        return top[np.argsort(-scores[top])]
+
+    measure_peak_memory(benchmark, search)
+    benchmark(search)
+
+@pytest.mark.parametrize("method", ["int8", "binary"])
+@pytest.mark.parametrize("size", SIZES)
+def bench_quantized_shortlist(benchmark, indexes, size, method):
+    """First-stage scan of VECTOR_QUANTIZATION codes for the default oversampled shortlist."""
+    collection, _ = indexes(size)
+    index = QuantizedIndex(collection, method, refresh_seconds=float("inf"))
+    index.load()
+    query = random_vectors(1, seed=QUERY_SEED)[0]
+    benchmark.extra_info.update(index.metrics())
+
+    measure_peak_memory(benchmark, index.search, query, K * 10)
+    benchmark(index.search, query, K * 10)
+
+@pytest.mark.parametrize("size", [size for size in SIZES if size <= 10_000])
+def bench_chroma_add(benchmark, client, size):
+    """Upsert throughput for one document-sized batch set."""
+    vectors = random_vectors(size, seed=size + 1)
+    ids = [f"chunk-{i}" for i in range(size)]
+
+    def add():
+        collection = client.create_collection(f"bench-add-{uuid.uuid4().hex[:8]}")
+        for start in range(0, size, BATCH_SIZE):
+            collection.add(ids=ids[start:start + BATCH_SIZE], embeddings=vectors[start:start + BATCH_SIZE])
+        client.delete_collection(collection.name)
+
+    benchmark.pedantic(add, rounds=3, iterations=1)
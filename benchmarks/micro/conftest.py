@@ -0,0 +1,85 @@
+"""
+Shared fixtures for the microbenchmarks: synthetic corpora, size limits and
+peak-memory measurement.
+
+Sizes range from 1k to 1M chunks. Only sizes up to BENCH_MAX_CHUNKS
+(default 10000) run, so a default run finishes in minutes; set it to
+1000000 for the full sweep.
+"""
+
+from typing import Any, Callable, List
+from pathlib import Path
+import os
+import random
+import sys
+import tracemalloc
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
+
+ALL_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+MAX_CHUNKS = int(os.getenv("BENCH_MAX_CHUNKS", "10000"))
+SIZES = [size for size in ALL_SIZES if size <= MAX_CHUNKS] or ALL_SIZES[:1]
+
+# Embedding width for vector benchmarks; text-embedding-3-large is 3072
+DIMENSIONS = int(os.getenv("BENCH_DIMENSIONS", "256"))
+
+# Mirrors VectorStoreService.text_splitter
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+def soap_notes() -> List[str]:
+    """The sample SOAP notes shipped in assets/."""
+    return [
+        path.read_text(encoding="utf-8", errors="replace")
+        for path in sorted((REPO_ROOT / "assets").glob("soap_*.txt"))
+    ]
+
+def synthetic_corpus(chunks: int, seed: int = 0) -> str:
+    """
+    Text that splits into roughly the given number of chunks.
+
+    Built by concatenating the sample notes with rewritten patient IDs, so
+    the separators and line structure match real input.
+    """
+    notes = soap_notes()
+    rng = random.Random(seed)
+    target = chunks * (CHUNK_SIZE - CHUNK_OVERLAP)
+    parts, length, index = [], 0, 0
+    while length < target:
+        note = rng.choice(notes).replace("patient--00", f"patient-{index:07d}-")
+        parts.append(note)
+        length += len(note) + 2
+        index += 1
+    return "\n\n".join(parts)
+
+def measure_peak_memory(benchmark, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run func once under tracemalloc, outside the timed rounds, and record
+    the peak Python heap allocation in the benchmark's extra_info.
+
+    Allocations made by native extensions that bypass the Python allocator
+    (e.g. Chroma's Rust core) are not counted.
+    """
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info["peak_memory_mb"] = round(peak / 2**20, 2)
+    return result
+
+@pytest.fixture(scope="session")
+def corpus_cache():
+    """Corpora by chunk count, built once per session."""
+    cache = {}
+
+    def get(chunks: int) -> str:
+        if chunks not in cache:
+            cache[chunks] = synthetic_corpus(chunks)
+        return cache[chunks]
+
+    return get
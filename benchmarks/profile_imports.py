@@ -0,0 +1,97 @@
+"""
+Import-time profile of the application.
+
+Imports app.main in a fresh interpreter with -X importtime (in a scratch
+directory, with no Azure configuration) and reports the total, the slowest
+modules by cumulative time and self time grouped by top-level package.
+With --budget-ms the script fails when the import exceeds the budget, so
+startup regressions can be caught in CI.
+
+Usage:
+    python benchmarks/profile_imports.py
+    python benchmarks/profile_imports.py --top 30 --budget-ms 1500
+"""
+
+from typing import Dict, List, Tuple
+from pathlib import Path
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+def profile(module: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) for every import, in import order."""
+    env = {key: value for key, value in os.environ.items() if not key.startswith("AZURE_OPENAI")}
+    env["PYTHONPATH"] = str(REPO_ROOT)
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=workdir,
+            env=env,
+            capture_output=True,
+            text=True
+        )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:   self |  cumulative | <indent>package.module"
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=20, help="Number of modules and packages to list")
+    parser.add_argument("--budget-ms", type=float, help="Fail if the total import time exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    rows = profile(args.module)
+    total_us = next(cumulative for name, _, cumulative, _ in rows if name == args.module)
+
+    packages: Dict[str, int] = {}
+    for name, self_us, _, _ in rows:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    report = {
+        "module": args.module,
+        "total_ms": round(total_us / 1000, 1),
+        "modules_imported": len(rows),
+        "slowest_modules": [
+            {"module": name, "cumulative_ms": round(cumulative / 1000, 1)}
+            for name, _, cumulative, _ in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]
+        ],
+        "packages": [
+            {"package": package, "self_ms": round(self_us / 1000, 1)}
+            for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        ],
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import {args.module}: {report['total_ms']} ms, {report['modules_imported']} modules\n")
+        print("Slowest modules (cumulative):")
+        for entry in report["slowest_modules"]:
+            print(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+        print("\nSelf time by top-level package:")
+        for entry in report["packages"]:
+            print(f"  {entry['self_ms']:>9.1f} ms  {entry['package']}")
+
+    if args.budget_ms is not None and report["total_ms"] > args.budget_ms:
+        print(f"\nImport time {report['total_ms']} ms exceeds budget of {args.budget_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Gunicorn configuration for running the API with several worker processes.
+
+Usage:
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Each worker is a separate uvicorn process with its own services, so the
+vector store must be a shared Chroma server (CHROMA_MODE=http) when more
+than one worker runs; an embedded persistent Chroma would be written to by
+several processes at once. In persistent mode the worker count is forced
+to 1.
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+
+logger = logging.getLogger("gunicorn.error")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+
+if workers > 1 and os.getenv("CHROMA_MODE", "persistent").lower() != "http":
+    logger.warning(
+        "CHROMA_MODE is not 'http'; an embedded Chroma index cannot be shared "
+        "between processes, so running 1 worker instead of %d", workers
+    )
+    workers = 1
+
+# Workers divide each deployment's TPM/RPM limits by this (LLM_RATE_LIMIT_PROCESSES)
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# LLM calls and extractions can take a while; recycle workers to bound memory growth
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+accesslog = "-"
+errorlog = "-"
+
+def on_starting(server):
+    """Prepare shared state once, in the master, before any worker starts."""
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        # Samples from a previous run would be added to this run's counters
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+    # Create tables here so workers do not race on DDL; only the database
+    # module is imported so the master starts no threads before forking
+    from app.db.base import create_tables
+    create_tables()
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges from the aggregated metrics."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,7 @@
+"""Make the app package importable when pytest is run from any directory."""
+
+from pathlib import Path
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
@@ -0,0 +1,132 @@
+"""Chunking of notes and locating chunks in their source text."""
+
+from pathlib import Path
+
+import pytest
+
+from app.services.chunking import (
+    SOAPSectionSplitter,
+    _make_recursive_splitter,
+    chunk_span,
+    section_metadata,
+    split_with_sections,
+)
+
+ASSETS = Path(__file__).resolve().parents[1] / "assets"
+
+NOTE = """Encounter 2024-03-01, patient 0042
+
+S: Cough for three days.
+O: Temp 38.1, BP: 128/82.
+A: Acute bronchitis.
+P: Rest and fluids.
+"""
+
+def squash(text):
+    return "".join(text.split())
+
+@pytest.mark.parametrize("text, chunk, start, expected", [
+    # Exact substring
+    ("S: cough\nP: rest", "P: rest", 0, (9, 16)),
+    # Parts joined by a blank line where the text has a single line break
+    ("S: cough\nO: afebrile", "S: cough\n\nO: afebrile", 0, (0, 20)),
+    # Surrounding whitespace stripped from the chunk
+    ("\n\n  S: cough  \n\n", "S: cough", 0, (4, 12)),
+    # Searching from start skips an earlier identical chunk
+    ("P: rest\nP: rest", "P: rest", 1, (8, 15)),
+    # The header first matches inside "BP:", which is too long to be the chunk
+    ("O: BP: 128/82\n\nP:\n\nrest", "P:\n\nrest", 0, (15, 23)),
+    ("O: BP: 128/82, HR 70\nP:\nrest and fluids", "P:\n\nrest and fluids", 0, (21, 39)),
+])
+def test_chunk_span(text, chunk, start, expected):
+    assert chunk_span(text, chunk, start) == expected
+    begin, end = expected
+    assert squash(text[begin:end]) == squash(chunk)
+
+@pytest.mark.parametrize("text, chunk", [
+    ("S: cough", "P: rest"),
+    ("P: rest", "P: rest and fluids"),
+    ("P: rest and fluids", "P:\n\nfluids"),
+])
+def test_chunk_span_not_found(text, chunk):
+    assert chunk_span(text, chunk) is None
+
+@pytest.mark.parametrize("path", sorted(ASSETS.glob("soap_*.txt")), ids=lambda path: path.name)
+def test_every_sample_chunk_is_located(path):
+    text = path.read_text()
+    start = 0
+    for chunk in SOAPSectionSplitter(1000, 200).split_text(text):
+        span = chunk_span(text, chunk, start)
+        assert span is not None, chunk[:40]
+        assert squash(text[span[0]:span[1]]) == squash(chunk)
+        start = span[0]
+
+@pytest.mark.parametrize("header, section", [
+    ("S:", "subjective"),
+    ("Subjective:", "subjective"),
+    ("  o :", "objective"),
+    ("OBJECTIVE:", "objective"),
+    ("A:", "assessment"),
+    ("A/P:", "assessment"),
+    ("Assessment and Plan:", "assessment"),
+    ("Assessment & Plan:", "assessment"),
+    ("P:", "plan"),
+    ("plan:", "plan"),
+])
+def test_section_headers(header, section):
+    assert SOAPSectionSplitter().sections(f"{header} text") == [(section, f"{header} text".strip())]
+
+@pytest.mark.parametrize("text", [
+    "Patient reports: cough",
+    "BP: 128/82",
+    "Sodium: 140",
+    "Plan of care to follow",
+])
+def test_text_that_is_not_a_header(text):
+    assert SOAPSectionSplitter().sections(text) == []
+
+def test_preamble_joins_the_first_section():
+    sections = SOAPSectionSplitter().sections(NOTE)
+    assert [name for name, _ in sections] == ["subjective", "objective", "assessment", "plan"]
+    assert sections[0][1] == "Encounter 2024-03-01, patient 0042\n\nS: Cough for three days."
+    # "BP:" inside a line is not a plan header
+    assert sections[1][1] == "O: Temp 38.1, BP: 128/82."
+
+def test_repeated_sections_are_merged():
+    sections = SOAPSectionSplitter().sections("P: Rest.\nP: Fluids.\nA: Bronchitis.\nA: Asthma.")
+    assert sections == [("plan", "P: Rest.\n\nP: Fluids."), ("assessment", "A: Bronchitis.\n\nA: Asthma.")]
+
+def test_whole_sections_are_packed_into_chunks():
+    chunks = SOAPSectionSplitter(chunk_size=60, chunk_overlap=0).split_sections(NOTE)
+    assert [sections for sections, _ in chunks] == [["subjective"], ["objective", "assessment"], ["plan"]]
+    assert chunks[1][1] == "O: Temp 38.1, BP: 128/82.\n\nA: Acute bronchitis."
+    assert all(len(chunk) <= 60 for _, chunk in chunks)
+
+def test_oversized_section_is_split_without_overlap():
+    body = "\n".join(f"Line {i} of a long plan." for i in range(20))
+    chunks = SOAPSectionSplitter(chunk_size=100, chunk_overlap=50).split_sections(f"S: Cough.\nP: {body}")
+    assert all(len(chunk) <= 100 for _, chunk in chunks)
+    assert all(sections == ["plan"] for sections, _ in chunks[1:])
+    # No overlap: every line appears exactly once
+    joined = "\n".join(chunk for _, chunk in chunks)
+    assert all(joined.count(f"Line {i} ") == 1 for i in range(20))
+
+def test_notes_without_headers_fall_back_to_recursive_splitting():
+    text = " ".join(f"Sentence {i} about the visit." for i in range(40))
+    splitter = SOAPSectionSplitter(chunk_size=200, chunk_overlap=50)
+    chunks = splitter.split_sections(text)
+    assert [sections for sections, _ in chunks] == [[]] * len(chunks)
+    assert [chunk for _, chunk in chunks] == _make_recursive_splitter(200, 50).split_text(text)
+
+def test_split_with_sections():
+    recursive = _make_recursive_splitter(1000, 0)
+    assert split_with_sections(recursive, NOTE) == [([], NOTE.strip())]
+    assert split_with_sections(SOAPSectionSplitter(), NOTE)[0][0] == ["subjective", "objective", "assessment", "plan"]
+
+def test_section_metadata():
+    assert section_metadata([]) == {}
+    assert section_metadata(["objective", "plan"]) == {
+        "sections": "objective,plan",
+        "section_objective": True,
+        "section_plan": True,
+    }
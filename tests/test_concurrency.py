@@ -0,0 +1,37 @@
+"""Running calls concurrently in the caller's context."""
+
+import contextvars
+import threading
+
+import pytest
+
+from app.utils.concurrency import map_in_context
+
+scope = contextvars.ContextVar("scope", default="unset")
+
+def test_results_keep_input_order_and_context():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def call(index, label):
+        # All three run at once, so order is restored rather than sequential
+        barrier.wait()
+        return index, label, scope.get()
+
+    token = scope.set("interactive")
+    try:
+        results = map_in_context(call, [0, 1, 2], "abc", max_workers=3)
+    finally:
+        scope.reset(token)
+    assert results == [(0, "a", "interactive"), (1, "b", "interactive"), (2, "c", "interactive")]
+
+def test_empty_input():
+    assert map_in_context(lambda item: item, [], max_workers=4) == []
+
+def test_exceptions_propagate():
+    def call(item):
+        if item == 2:
+            raise ValueError("bad item")
+        return item
+
+    with pytest.raises(ValueError, match="bad item"):
+        map_in_context(call, [1, 2, 3], max_workers=2)
@@ -0,0 +1,66 @@
+"""Merging of per-chunk extraction results."""
+
+import pytest
+
+from app.services.extraction_merge import merge_codes, merge_structured_data
+
+def chunk(**sections):
+    return {"patient_info": sections.pop("patient_info", {"demographics": {}, "medical_history": []}), **sections}
+
+def test_records_merge_by_key_in_chunk_order():
+    merged = merge_structured_data([
+        chunk(conditions=[
+            {"name": "Hypertension", "icd_code": "I10", "status": None},
+            {"name": "Asthma", "icd_code": None},
+        ]),
+        chunk(conditions=[
+            # Same ICD code: fills the empty status, keeps the first name
+            {"name": "Essential hypertension", "icd_code": "i10", "status": "active"},
+            {"name": "Type 2 diabetes", "icd_code": "E11.9"},
+            # Same name once normalized
+            {"name": "  ASTHMA ", "severity": "mild"},
+        ]),
+    ])
+    assert merged["conditions"] == [
+        {"name": "Hypertension", "icd_code": "I10", "status": "active"},
+        {"name": "Asthma", "icd_code": None, "severity": "mild"},
+        {"name": "Type 2 diabetes", "icd_code": "E11.9"},
+    ]
+
+@pytest.mark.parametrize("section, first, second, expected", [
+    # Different doses of one drug are kept apart
+    ("medications", {"name": "Metformin", "dosage": "500 mg"}, {"name": "metformin", "dosage": "1000 mg"}, 2),
+    ("medications", {"name": "Metformin", "dosage": "500 mg"}, {"name": "metformin", "dosage": "500 MG"}, 1),
+    ("treatments", {"procedure": "ECG", "date": "2024-01-01"}, {"procedure": "ECG", "date": "2024-02-01"}, 2),
+    ("observations", {"type": "BP", "value": "128/82"}, {"type": "bp", "value": "128/82"}, 1),
+    ("plan", {"action": "Follow up", "due_date": None}, {"action": "follow-up", "due_date": None}, 2),
+])
+def test_record_keys(section, first, second, expected):
+    merged = merge_structured_data([chunk(**{section: [first]}), chunk(**{section: [second]})])
+    assert len(merged[section]) == expected
+
+def test_records_without_a_key_or_not_dicts_are_skipped():
+    merged = merge_structured_data([chunk(conditions=[{"name": "", "icd_code": None}, "Asthma", None])])
+    assert merged["conditions"] == []
+
+def test_patient_info_keeps_first_non_empty_values():
+    merged = merge_structured_data([
+        chunk(patient_info={"demographics": {"age": "", "sex": "female"}, "medical_history": ["Asthma", "GERD"]}),
+        chunk(patient_info={"demographics": {"age": "54", "sex": "male"}, "medical_history": ["asthma", "Gout"]}),
+        chunk(),
+    ])
+    assert merged["patient_info"] == {
+        "demographics": {"age": "54", "sex": "female"},
+        "medical_history": ["Asthma", "GERD", "Gout"],
+    }
+
+def test_missing_sections_merge_to_empty_lists():
+    merged = merge_structured_data([{"patient_info": None}, {}])
+    assert merged["conditions"] == merged["medications"] == merged["plan"] == []
+
+def test_codes_are_deduplicated_in_order():
+    assert merge_codes([
+        {"icd_codes": ["I10", "E11.9"], "rxnorm_codes": ["860975"]},
+        {"icd_codes": ["i10", "J45"]},
+        {"rxnorm_codes": ["860975", "197361", ""]},
+    ]) == {"icd_codes": ["I10", "E11.9", "J45"], "rxnorm_codes": ["860975", "197361"]}
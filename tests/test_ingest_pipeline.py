@@ -0,0 +1,85 @@
+"""Claims on background extractions."""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.models import Document, DocumentExtraction
+from app.services import ingest_pipeline as pipeline_module
+from app.services.ingest_pipeline import IngestExtractionPipeline
+
+class FakeExtraction:
+    """Extraction service whose run can trigger something midway, like a concurrent update."""
+
+    def __init__(self):
+        self.during = None
+
+    def extract_entities(self, text):
+        if self.during is not None:
+            self.during()
+        return SimpleNamespace(model_dump=lambda: {"text": text}, structured_data=None)
+
+@pytest.fixture
+def setup(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'documents.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(pipeline_module, "SessionLocal", factory)
+    extraction = FakeExtraction()
+    monkeypatch.setattr(pipeline_module, "get_extraction_service", lambda: extraction)
+    monkeypatch.setattr(pipeline_module.settings, "EXTRACT_ON_INGEST_FHIR", False)
+    pipeline = IngestExtractionPipeline()
+    # Queue without starting the worker thread; tests call process_document directly
+    monkeypatch.setattr(pipeline, "start", lambda: None)
+
+    db = factory()
+    document = Document(title="note", content="S: cough")
+    db.add(document)
+    db.commit()
+    pipeline.enqueue(db, document.id)
+    yield pipeline, extraction, factory, document.id
+    db.close()
+
+def record(factory, document_id):
+    db = factory()
+    try:
+        return db.query(DocumentExtraction).filter(DocumentExtraction.document_id == document_id).one()
+    finally:
+        db.close()
+
+def test_result_is_stored_while_claim_holds(setup):
+    pipeline, _, factory, document_id = setup
+    pipeline.process_document(document_id)
+    stored = record(factory, document_id)
+    assert stored.status == "completed"
+    assert stored.extraction == {"text": "S: cough"}
+
+def test_result_is_discarded_after_update_and_reclaim(setup):
+    pipeline, extraction, factory, document_id = setup
+
+    def update_and_reclaim():
+        # The document is updated and another worker claims the new run
+        db = factory()
+        db.get(Document, document_id).content = "S: fever"
+        db.commit()
+        pipeline.enqueue(db, document_id)
+        assert pipeline._claim(db, document_id) is not None
+        db.close()
+
+    extraction.during = update_and_reclaim
+    pipeline.process_document(document_id)
+    stored = record(factory, document_id)
+    assert stored.status == "running"
+    assert stored.extraction is None
+
+def test_release_hands_the_claim_back(setup):
+    pipeline, _, factory, document_id = setup
+    db = factory()
+    token = pipeline._claim(db, document_id)
+    assert pipeline._claim(db, document_id) is None
+    pipeline._release(db, document_id, token)
+    db.close()
+    assert record(factory, document_id).status == "pending"
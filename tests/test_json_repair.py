@@ -0,0 +1,71 @@
+"""Repair of malformed JSON from language models."""
+
+import pytest
+
+from app.utils.json_repair import parse_json, repair_json
+
+@pytest.mark.parametrize("text, expected", [
+    # Markdown fences
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('```\n[1, 2]\n```', [1, 2]),
+    ('Here you go:\n```JSON\n{"a": 1}\n```\nLet me know.', {"a": 1}),
+    # Prose around the value
+    ('Sure! {"a": 1}', {"a": 1}),
+    ('{"a": 1} note: see {x}', {"a": 1}),
+    ('{"a": {"b": 2}} and then {"c": 3}', {"a": {"b": 2}}),
+    ('[{"a": "x]"}] and [1]', [{"a": "x]"}]),
+    ('{"a": "}"} trailing', {"a": "}"}),
+    ('{"a": "say \\"}\\""} more', {"a": 'say "}"'}),
+    # Trailing commas
+    ('{"a": 1,}', {"a": 1}),
+    ('[1, 2, ]', [1, 2]),
+    ('{"a": [1, 2,], "b": {"c": 3,},}', {"a": [1, 2], "b": {"c": 3}}),
+    ('{"a": "1,}"}', {"a": "1,}"}),
+    # Python literals
+    ('{"a": True, "b": False, "c": None}', {"a": True, "b": False, "c": None}),
+    ('[True, None]', [True, None]),
+    ('{"a": "True stays a string"}', {"a": "True stays a string"}),
+    # Smart quotes
+    ('{“a”: “b”}', {"a": "b"}),
+])
+def test_repairs_well_formed_content(text, expected):
+    assert parse_json(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    # Inside a string value
+    ('{"a": "unfinished', {"a": "unfinished"}),
+    ('{"a": "ends in escape\\', {"a": "ends in escape"}),
+    # Inside or right after a key
+    ('{"a": 1, "b', {"a": 1}),
+    ('{"a": 1, "b"', {"a": 1}),
+    ('{"a": 1, "b":', {"a": 1}),
+    ('{"a": 1, "b": ', {"a": 1}),
+    ('{"a', {}),
+    # After a comma
+    ('{"a": 1,', {"a": 1}),
+    ('[1, 2,', [1, 2]),
+    # Inside a literal or number
+    ('{"a": tru', {"a": True}),
+    ('{"a": fal', {"a": False}),
+    ('{"a": nu', {"a": None}),
+    ('{"a": Tr', {"a": True}),
+    ('[1, 2.', [1, 2]),
+    ('{"a": 1e-', {"a": 1}),
+    ('{"a": 1, "b": -', {"a": 1}),
+    # Nested containers
+    ('{"a": [1, 2', {"a": [1, 2]}),
+    ('{"a": {"b": [1, {"c": "d', {"a": {"b": [1, {"c": "d"}]}}),
+    ('{"a": {"b"', {"a": {}}),
+    ('[{"a": 1}, {"b"', [{"a": 1}, {}]),
+])
+def test_closes_truncated_output(text, expected):
+    assert parse_json(text) == expected
+
+def test_valid_json_is_unchanged():
+    text = '{"a": [1, 2, {"b": null}], "c": "d"}'
+    assert repair_json(text) == text
+
+@pytest.mark.parametrize("text", [None, "", "no json here", "{...}"])
+def test_unrepairable_text_raises_value_error(text):
+    with pytest.raises(ValueError):
+        parse_json(text)
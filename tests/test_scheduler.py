@@ -0,0 +1,116 @@
+"""Token-bucket budgets and retry handling of the LLM scheduler."""
+
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.services.llm.scheduler import RateLimitScheduler, RequestPriority
+
+def error_with_headers(headers):
+    return SimpleNamespace(response=SimpleNamespace(headers=headers))
+
+def rate_limit_error(headers=None):
+    request = httpx.Request("POST", "https://example.openai.azure.com")
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "1500"}, 1.5),
+    ({"retry-after": "7"}, 7.0),
+    ({"retry-after": "0.25"}, 0.25),
+    # Milliseconds win over seconds
+    ({"retry-after-ms": "200", "retry-after": "7"}, 0.2),
+    ({"retry-after-ms": "soon", "retry-after": "3"}, 3.0),
+    ({"retry-after": "not a date"}, None),
+    ({}, None),
+])
+def test_retry_after_headers(headers, expected):
+    assert RateLimitScheduler.retry_after(error_with_headers(headers)) == expected
+
+def test_retry_after_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = RateLimitScheduler.retry_after(error_with_headers({"retry-after": format_datetime(when, usegmt=True)}))
+    assert 28 <= delay <= 30
+
+def test_retry_after_past_http_date_is_zero():
+    when = datetime.now(timezone.utc) - timedelta(seconds=30)
+    assert RateLimitScheduler.retry_after(error_with_headers({"retry-after": format_datetime(when, usegmt=True)})) == 0.0
+
+def test_retry_after_without_response():
+    assert RateLimitScheduler.retry_after(ValueError("no response")) is None
+
+def test_token_budget_wait():
+    scheduler = RateLimitScheduler("test", tokens_per_minute=600)
+    now = scheduler._refilled_at
+    assert scheduler._wait_time(600, now) == 0
+    scheduler._tokens = 100
+    # 500 more tokens at 10 per second
+    assert scheduler._wait_time(600, now) == pytest.approx(50)
+    scheduler._refill(now + 20)
+    assert scheduler._tokens == pytest.approx(300)
+    assert scheduler._wait_time(600, now + 20) == pytest.approx(30)
+
+def test_request_budget_wait_and_refill_cap():
+    scheduler = RateLimitScheduler("test", requests_per_minute=60)
+    now = scheduler._refilled_at
+    scheduler._requests = 0.5
+    assert scheduler._wait_time(1, now) == pytest.approx(0.5)
+    scheduler._refill(now + 3600)
+    assert scheduler._requests == 60
+
+def test_blocked_deployment_waits():
+    scheduler = RateLimitScheduler("test")
+    now = scheduler._refilled_at
+    scheduler._blocked_until = now + 5
+    assert scheduler._wait_time(1, now) == pytest.approx(5)
+
+def test_run_consumes_budget_and_corrects_with_actual_usage():
+    scheduler = RateLimitScheduler("test", tokens_per_minute=1000, requests_per_minute=10)
+    result = SimpleNamespace(usage=SimpleNamespace(total_tokens=300))
+    assert scheduler.run(lambda: result, estimated_tokens=100, priority=RequestPriority.INTERACTIVE) is result
+    metrics = scheduler.metrics()
+    assert metrics["completed"] == 1
+    assert metrics["in_flight"] == 0
+    assert 695 <= metrics["tokens_available"] <= 705
+
+def test_run_retries_rate_limits_and_blocks_the_deployment():
+    scheduler = RateLimitScheduler("test", max_retries=2, backoff_base=0.001, backoff_max=0.001)
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) == 1:
+            raise rate_limit_error({"retry-after-ms": "10"})
+        return "ok"
+
+    assert scheduler.run(call, estimated_tokens=1) == "ok"
+    metrics = scheduler.metrics()
+    assert (metrics["rate_limited"], metrics["retries"], metrics["completed"]) == (1, 1, 1)
+
+def test_run_gives_up_after_max_retries():
+    scheduler = RateLimitScheduler("test", max_retries=1, backoff_base=0.001, backoff_max=0.001)
+
+    def call():
+        raise rate_limit_error({"retry-after-ms": "1"})
+
+    with pytest.raises(openai.RateLimitError):
+        scheduler.run(call, estimated_tokens=1)
+    metrics = scheduler.metrics()
+    assert (metrics["rate_limited"], metrics["retries"], metrics["failed"]) == (2, 1, 1)
+
+def test_run_does_not_retry_other_errors():
+    scheduler = RateLimitScheduler("test", max_retries=3)
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        scheduler.run(call, estimated_tokens=1)
+    assert len(calls) == 1
+    assert scheduler.metrics()["failed"] == 1
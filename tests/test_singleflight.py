@@ -0,0 +1,93 @@
+"""Coalescing of concurrent identical calls."""
+
+import threading
+import time
+
+import pytest
+
+from app.utils.singleflight import SingleFlight, flight_key, normalize_text
+
+FOLLOWERS = 3
+
+def run_concurrently(flight, key, func):
+    """Start a leader, wait until FOLLOWERS callers have joined it, then let it finish."""
+    release = threading.Event()
+    calls = []
+    outcomes = [None] * (FOLLOWERS + 1)
+
+    def leader_func():
+        calls.append(1)
+        release.wait(5)
+        return func()
+
+    def caller(index):
+        try:
+            outcomes[index] = ("result", flight.do(key, leader_func))
+        except Exception as e:
+            outcomes[index] = ("error", e)
+
+    threads = [threading.Thread(target=caller, args=(0,))]
+    threads[0].start()
+    while key not in flight._calls:
+        time.sleep(0.001)
+    for index in range(1, FOLLOWERS + 1):
+        threads.append(threading.Thread(target=caller, args=(index,)))
+        threads[-1].start()
+    while flight._calls[key].followers < FOLLOWERS:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return calls, outcomes
+
+def test_followers_receive_copies_of_the_leader_result():
+    flight = SingleFlight("test")
+    calls, outcomes = run_concurrently(flight, "key", lambda: {"codes": ["I10"]})
+
+    assert len(calls) == 1
+    results = [value for kind, value in outcomes]
+    assert all(kind == "result" for kind, _ in outcomes)
+    assert all(result == {"codes": ["I10"]} for result in results)
+    # Followers get deep copies, so no caller can mutate another's result
+    assert len({id(result) for result in results}) == len(results)
+    assert len({id(result["codes"]) for result in results}) == len(results)
+    assert flight.metrics() == {"in_flight": 0, "leaders": 1, "coalesced": FOLLOWERS}
+
+def test_followers_receive_the_leader_exception():
+    flight = SingleFlight("test")
+
+    def fail():
+        raise RuntimeError("upstream failed")
+
+    calls, outcomes = run_concurrently(flight, "key", fail)
+
+    assert len(calls) == 1
+    assert all(kind == "error" and str(error) == "upstream failed" for kind, error in outcomes)
+    assert flight.metrics()["in_flight"] == 0
+
+def test_results_are_not_cached():
+    flight = SingleFlight("test")
+    counter = iter(range(10))
+    assert flight.do("key", lambda: next(counter)) == 0
+    assert flight.do("key", lambda: next(counter)) == 1
+
+def test_disabled_runs_every_call():
+    flight = SingleFlight("test", enabled=False)
+    calls, outcomes = [], []
+    for _ in range(3):
+        outcomes.append(flight.do("key", lambda: calls.append(1) or len(calls)))
+    assert outcomes == [1, 2, 3]
+    assert flight.metrics()["leaders"] == 0
+
+@pytest.mark.parametrize("text, casefold, expected", [
+    ("  S: cough\n\n P:\trest ", False, "S: cough P: rest"),
+    ("S: Cough", True, "s: cough"),
+    ("S: Cough", False, "S: Cough"),
+])
+def test_normalize_text(text, casefold, expected):
+    assert normalize_text(text, casefold=casefold) == expected
+
+def test_flight_key_is_stable_and_distinguishes_parts():
+    assert flight_key("text", "auto", {"a": "1", "b": "2"}) == flight_key("text", "auto", {"b": "2", "a": "1"})
+    assert flight_key("text", "auto") != flight_key("text", "single")
+    assert len(flight_key("text")) == 64
@@ -0,0 +1,85 @@
+"""Hydration of chunks stored by reference in vector store search results."""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.models import Document
+from app.services import vector_store
+from app.services.vector_store import ContentCache, VectorStoreService
+
+class FakeCollection:
+    """Answers every query with the same chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def count(self):
+        return len(self.chunks)
+
+    def query(self, query_embeddings, n_results, where, include):
+        queries = len(query_embeddings)
+        return {
+            "documents": [[""] * len(self.chunks) for _ in range(queries)],
+            "metadatas": [[dict(metadata) for metadata in self.chunks] for _ in range(queries)],
+            "distances": [[0.1 * i for i in range(len(self.chunks))] for _ in range(queries)],
+        }
+
+@pytest.fixture
+def session_factory(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'documents.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(vector_store, "SessionLocal", factory)
+    return factory
+
+def make_service(chunks):
+    service = VectorStoreService.__new__(VectorStoreService)
+    service.content_cache = ContentCache(1024 * 1024)
+    service.quantized_index = None
+    service.embeddings = SimpleNamespace(embed_documents=lambda texts: [[0.0]] * len(texts))
+    service.vector_store = SimpleNamespace(_collection=FakeCollection(chunks))
+    return service
+
+def add_document(session_factory, content):
+    db = session_factory()
+    document = Document(title="note", content=content)
+    db.add(document)
+    db.commit()
+    document_id, content_hash = document.id, document.content_hash
+    db.close()
+    return document_id, content_hash
+
+def test_batch_search_hydrates_and_drops_stale_chunks(session_factory):
+    document_id, content_hash = add_document(session_factory, "S: cough. P: rest.")
+    chunks = [
+        {"document_id": str(document_id), "start": 0, "end": 9, "content_hash": content_hash},
+        # Written for content the document no longer has, e.g. during a re-index
+        {"document_id": str(document_id), "start": 10, "end": 18, "content_hash": "0" * 64},
+        {"document_id": str(document_id), "start": 10, "end": 18, "content_hash": content_hash},
+    ]
+    service = make_service(chunks)
+
+    batches = service.search_similar_chunks_batch(["cough", "rest"], k=3)
+
+    assert len(batches) == 2
+    for results in batches:
+        assert [result["content"] for result in results] == ["S: cough.", "P: rest."]
+        assert all(result["metadata"]["content_hash"] == content_hash for result in results)
+
+def test_hydration_reads_content_once_per_version(session_factory):
+    document_id, content_hash = add_document(session_factory, "S: cough. P: rest.")
+    service = make_service([{"document_id": str(document_id), "start": 0, "end": 9, "content_hash": content_hash}])
+
+    service.search_similar_chunks_batch(["cough"], k=1)
+    assert service.content_cache.get((document_id, content_hash)) == "S: cough. P: rest."
+
+    db = session_factory()
+    db.get(Document, document_id).content = "S: fever. P: fluids."
+    db.commit()
+    db.close()
+    # The old chunk no longer matches the document and is dropped rather than sliced from the new content
+    assert service.search_similar_chunks_batch(["cough"], k=1) == [[]]